@@ -1,16 +1,208 @@
 """
 FastAPI server for ML predictions
 Can run locally for testing or deploy to Railway for production
+
+Predictions run in-process: the model and a pooled async Supabase client are
+created once at startup. Student data is fetched on the event loop (queries run
+concurrently) and the CPU-bound scoring runs on a worker pool so the event loop
+stays free.
+
+Each request is logged as one JSON event with per-stage timings (see
+structured_log.py; LOG_LEVEL / LOG_SAMPLE_RATE). Requests with "debug": true
+also get the co-curricular inputs and calculation, in the log and in the
+response. GET /metrics serves per-stage latency histograms, request outcome
+counters, in-flight gauges and cache hit ratios in Prometheus format (see
+telemetry.py).
+
+Long-running work (retraining, rescoring a whole cohort, exports) is submitted
+as a background job with POST /jobs and polled with GET /jobs/{id}; jobs run
+on their own process pool and persist in SQLite across restarts (see
+job_queue.py).
+
+/predict results are cached per student under a fingerprint of the inputs, the
+profile analysis and the model version (see prediction_cache.py); the key is sent as the ETag, and
+a request with a matching If-None-Match gets 304 Not Modified.
+
+With SERVER_WORKERS > 1 the server runs pre-forked: a master process loads
+the model once and forks that many workers sharing it copy-on-write, restarts
+crashed workers and rolls them when the model changes (see prefork_server.py).
+
+With USE_FEATURE_STORE=true, /predict reads the student's pre-aggregated
+features from the incremental feature store (kept current by Supabase database
+webhooks posted to /feature-store/events, which requires the
+FEATURE_STORE_WEBHOOK_SECRET header) and only falls back to Supabase for
+students the store does not know.
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import subprocess
-import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+import functools
+import asyncio
+import secrets
+import threading
+import time
 import os
-import sys
 
-app = FastAPI(title="Student ML Prediction API")
+import predict_student
+import data_access
+import structured_log as log
+import telemetry
+from job_queue import JobQueue, JOB_KINDS, STATUSES, QueueFullError
+from course_features import CATEGORY_INDEX
+from feature_store import FeatureStore
+
+# Number of predictions that may run concurrently (per server process)
+ML_WORKERS = int(os.environ.get("ML_WORKERS", 4))
+# Server processes; above 1, a pre-forked master shares one loaded model (see prefork_server.py)
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", 1))
+# Predictions that may wait for a pool thread; beyond that requests get 503 instead of queueing
+ML_MAX_QUEUED = int(os.environ.get("ML_MAX_QUEUED", ML_WORKERS))
+# A timed-out request stops waiting, but its prediction keeps its pool thread until it finishes
+PREDICT_TIMEOUT = 60  # seconds
+BATCH_PREDICT_TIMEOUT = int(os.environ.get("BATCH_PREDICT_TIMEOUT", 600))  # seconds
+USE_FEATURE_STORE = os.environ.get("USE_FEATURE_STORE", "false").lower() == "true"
+# Shared secret expected in the X-Webhook-Secret header of feature store events
+# (without it /feature-store/events refuses every request)
+FEATURE_STORE_WEBHOOK_SECRET = os.environ.get("FEATURE_STORE_WEBHOOK_SECRET")
+
+executor: ThreadPoolExecutor | None = None
+data_client: data_access.SupabaseDataClient | None = None
+feature_store: FeatureStore | None = None
+job_queue: JobQueue | None = None
+# Set in pre-forked workers (prefork_server.py): the master already loaded the
+# model and tables, and jobs run in the master's job runner, not in the workers
+PRELOADED = False
+RUN_JOBS = True
+
+telemetry.install()
+telemetry.register_model(predict_student.MODEL_REGISTRY)
+telemetry.register_cache("profile_analysis", predict_student.PROFILE_CACHE.stats)
+telemetry.register_cache("course_category", CATEGORY_INDEX.stats)
+telemetry.register_cache("prediction", predict_student.PREDICTION_CACHE.stats)
+telemetry.EXECUTOR_IN_FLIGHT.set(0)
+
+
+@contextmanager
+def request_metrics(route: str):
+    """In-flight gauge, duration histogram and outcome counter of one request"""
+    start = time.perf_counter()
+    outcome = "failure"
+    telemetry.IN_FLIGHT.inc(route=route)
+    try:
+        yield
+        outcome = "success"
+    except HTTPException as e:
+        outcome = {504: "timeout", 503: "rejected"}.get(e.status_code, "failure")
+        raise
+    finally:
+        telemetry.IN_FLIGHT.dec(route=route)
+        telemetry.REQUEST_SECONDS.observe(time.perf_counter() - start, route=route)
+        telemetry.REQUESTS.inc(route=route, outcome=outcome)
+
+
+def instrumented(route: str):
+    def decorate(endpoint):
+        telemetry.IN_FLIGHT.set(0, route=route)
+
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            with request_metrics(route):
+                return await endpoint(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class PoolSaturatedError(Exception):
+    pass
+
+
+# Work submitted to the pool and not finished, including predictions whose request timed out
+pool_pending = 0
+pool_lock = threading.Lock()
+
+
+def _pool_done(future):
+    global pool_pending
+    with pool_lock:
+        pool_pending -= 1
+    telemetry.EXECUTOR_IN_FLIGHT.dec()
+
+
+async def run_in_pool(fn, *args):
+    """
+    Run CPU-bound work on the prediction pool, counted in ml_executor_in_flight
+    until it finishes. Raises PoolSaturatedError when ML_WORKERS are busy and
+    ML_MAX_QUEUED more are waiting, rather than queueing behind them.
+    """
+    global pool_pending
+    with pool_lock:
+        if pool_pending >= ML_WORKERS + ML_MAX_QUEUED:
+            raise PoolSaturatedError(f"All {ML_WORKERS} prediction workers are busy, try again later")
+        pool_pending += 1
+    telemetry.EXECUTOR_IN_FLIGHT.inc()
+    try:
+        future = executor.submit(fn, *args)
+    except BaseException:
+        _pool_done(None)
+        raise
+    future.add_done_callback(_pool_done)
+    return await asyncio.wrap_future(future)
+
+
+def pool_saturated(trace, e: PoolSaturatedError) -> HTTPException:
+    trace.finish("warning", success=False, error="pool_saturated")
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match check (weak comparison, RFC 9110)"""
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def preload():
+    """Load the model and warm the course-category index"""
+    try:
+        predict_student.load_model()
+        log.info("model_loaded", path=predict_student.MODEL_PATH)
+    except FileNotFoundError as e:
+        # Keep serving /health; /predict reports the missing model per request
+        log.warning("model_missing", error=str(e))
+    if CATEGORY_INDEX.load():
+        log.info("course_category_index_warmed", courses=CATEGORY_INDEX.stats()["size"])
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global executor, data_client, feature_store, job_queue
+    executor = ThreadPoolExecutor(max_workers=ML_WORKERS, thread_name_prefix="predict")
+    job_queue = JobQueue()
+    job_queue.start(dispatch=RUN_JOBS)
+    data_client = data_access.SupabaseDataClient()
+    if USE_FEATURE_STORE:
+        feature_store = FeatureStore()
+        log.info("feature_store_opened", **feature_store.stats())
+        if not FEATURE_STORE_WEBHOOK_SECRET:
+            log.warning("feature_store_events_disabled", reason="FEATURE_STORE_WEBHOOK_SECRET is not set")
+    if not PRELOADED:
+        preload()
+    yield
+    await data_client.aclose()
+    executor.shutdown(wait=True)
+    job_queue.shutdown(wait=False)
+    if telemetry.METRICS_DIR:
+        # Final totals of a pre-forked worker; the master archives them once it exits
+        telemetry.write_snapshot()
+    try:
+        CATEGORY_INDEX.save()
+    except OSError as e:
+        log.warning("course_category_index_save_failed", error=str(e))
+
+
+app = FastAPI(title="Student ML Prediction API", lifespan=lifespan)
 
 # Enable CORS for Vercel frontend
 app.add_middleware(
@@ -23,11 +215,31 @@ app.add_middleware(
 
 class PredictRequest(BaseModel):
     student_id: int
+    debug: bool = False  # trace the co-curricular calculation for this request
 
 class PredictResponse(BaseModel):
     success: bool
     scores: dict | None = None
     error: str | None = None
+    debug: dict | None = None  # stage timings and trace events (debug requests only)
+
+class BatchPredictRequest(BaseModel):
+    student_ids: list[int] | None = None
+    all: bool = False  # score every student in the database
+    write_back: bool = True
+    debug: bool = False
+
+class BatchPredictResponse(BaseModel):
+    success: bool
+    count: int = 0
+    written: int = 0
+    results: list[dict] = []
+    error: str | None = None
+    debug: dict | None = None
+
+class JobRequest(BaseModel):
+    kind: str  # retrain, rescore-cohort or export
+    params: dict = {}  # e.g. {"all": true} or {"student_ids": [...]} for rescore-cohort
 
 @app.get("/")
 def read_root():
@@ -36,85 +248,210 @@ def read_root():
         "status": "running",
         "endpoints": {
             "/predict": "POST - Predict student scores",
-            "/health": "GET - Health check"
+            "/predict/batch": "POST - Predict scores for many students",
+            "/jobs": "POST - Start a background job (retrain, rescore-cohort, export); GET - List jobs",
+            "/jobs/{id}": "GET - Job status, progress and result",
+            "/feature-store/events": "POST - Apply Supabase webhook row changes to the feature store",
+            "/health": "GET - Health check",
+            "/metrics": "GET - Prometheus metrics"
         }
     }
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "pid": os.getpid(),
+        "model_loaded": predict_student.MODEL_REGISTRY.loaded,
+        "model": predict_student.MODEL_REGISTRY.info(),
+        "course_category_cache": CATEGORY_INDEX.stats(),
+        "profile_cache": predict_student.PROFILE_CACHE.stats(),
+        "prediction_cache": predict_student.PREDICTION_CACHE.stats(),
+        "feature_store": feature_store.stats() if feature_store else None,
+        "jobs": job_queue.stats() if job_queue else None,
+    }
+
+@app.get("/metrics")
+def metrics():
+    return Response(telemetry.render(), media_type=telemetry.CONTENT_TYPE)
 
 @app.post("/predict", response_model=PredictResponse)
-async def predict(request: PredictRequest):
+@instrumented("predict")
+async def predict(request: PredictRequest, response: Response,
+                  if_none_match: str | None = Header(default=None)):
     """
     Run ML prediction for a student
     """
+    trace = log.start_trace("predict", debug=request.debug, student_id=request.student_id)
+
+    async def run():
+        try:
+            if feature_store is not None:
+                output = await run_in_pool(
+                    predict_student.predict_from_store, request.student_id, feature_store, trace
+                )
+                if output is not None:
+                    return output
+            with trace.stage("fetch"):
+                data = await data_client.fetch_student(request.student_id)
+            return await run_in_pool(predict_student.predict_from_data, request.student_id, data, trace)
+        except PoolSaturatedError:
+            raise
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
     try:
-        # Get the directory where this script is located
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        predict_script = os.path.join(script_dir, "predict_student.py")
-        
-        # Check if predict_student.py exists
-        if not os.path.exists(predict_script):
+        output = await asyncio.wait_for(run(), timeout=PREDICT_TIMEOUT)
+
+        if not output.get("success"):
+            trace.finish("error", success=False, error=output.get("error"))
             raise HTTPException(
-                status_code=500, 
-                detail=f"predict_student.py not found at {predict_script}"
+                status_code=400,
+                detail=output.get("error", "Prediction failed")
             )
-        
-        # Run the Python prediction script
-        result = subprocess.run(
-            [sys.executable, predict_script, str(request.student_id)],
-            capture_output=True,
-            text=True,
-            timeout=60,
-            cwd=script_dir
+
+        trace.finish(success=True)
+        # No ETag for a prediction made without the profile analysis (not cached)
+        if output.get("etag"):
+            etag = f'"{output["etag"]}"'
+            if if_none_match and etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers={"ETag": etag})
+            response.headers["ETag"] = etag
+        return PredictResponse(
+            success=True,
+            scores=output.get("scores"),
+            error=None,
+            debug=trace.summary() if request.debug else None
         )
-        
-        if result.returncode != 0:
-            error_msg = result.stderr or result.stdout
-            print(f"❌ PREDICTION FAILED:", file=sys.stderr)
-            print(f"Return code: {result.returncode}", file=sys.stderr)
-            print(f"STDOUT: {result.stdout}", file=sys.stderr)
-            print(f"STDERR: {result.stderr}", file=sys.stderr)
-            raise HTTPException(
-                status_code=500,
-                detail=f"Prediction failed: {error_msg}"
-            )
-        
-        # Parse the JSON output from predict_student.py
-        try:
-            output = json.loads(result.stdout.strip())
-            
-            if not output.get("success"):
-                raise HTTPException(
-                    status_code=400,
-                    detail=output.get("error", "Prediction failed")
-                )
-            
-            return PredictResponse(
-                success=True,
-                scores=output.get("scores"),
-                error=None
-            )
-            
-        except json.JSONDecodeError as e:
+
+    except HTTPException:
+        raise
+    except PoolSaturatedError as e:
+        raise pool_saturated(trace, e)
+    except asyncio.TimeoutError:
+        trace.finish("error", success=False, error="timeout")
+        raise HTTPException(
+            status_code=504,
+            detail=f"Prediction timed out (>{PREDICT_TIMEOUT}s)"
+        )
+    except Exception as e:
+        trace.finish("error", success=False, error=str(e))
+        raise HTTPException(
+            status_code=500,
+            detail=f"Unexpected error: {str(e)}"
+        )
+
+@app.post("/predict/batch", response_model=BatchPredictResponse)
+@instrumented("predict_batch")
+async def predict_batch(request: BatchPredictRequest):
+    """
+    Run ML prediction for a cohort of students in one pass
+    """
+    if not request.all and not request.student_ids:
+        raise HTTPException(status_code=400, detail="Provide student_ids or set all=true")
+
+    trace = log.start_trace("predict_batch", debug=request.debug)
+
+    async def run():
+        with trace.stage("fetch"):
+            if request.all:
+                student_ids = await data_client.fetch_all_student_ids()
+            else:
+                student_ids = list(dict.fromkeys(request.student_ids))
+            data = await data_client.fetch_students(student_ids)
+        output = await run_in_pool(predict_student.predict_batch_from_data, student_ids, data, trace)
+        if output["success"] and request.write_back:
+            with trace.stage("write"):
+                output["written"] = await data_client.update_scores(output["results"])
+        return output
+
+    try:
+        output = await asyncio.wait_for(run(), timeout=BATCH_PREDICT_TIMEOUT)
+
+        if not output.get("success"):
+            trace.finish("error", success=False, error=output.get("error"))
             raise HTTPException(
-                status_code=500,
-                detail=f"Failed to parse prediction output: {str(e)}\nOutput: {result.stdout}"
+                status_code=400,
+                detail=output.get("error", "Batch prediction failed")
             )
-    
-    except subprocess.TimeoutExpired:
+
+        trace.finish(success=True, students=output["count"], written=output["written"])
+        return BatchPredictResponse(**output, debug=trace.summary() if request.debug else None)
+
+    except HTTPException:
+        raise
+    except PoolSaturatedError as e:
+        raise pool_saturated(trace, e)
+    except asyncio.TimeoutError:
+        trace.finish("error", success=False, error="timeout")
         raise HTTPException(
             status_code=504,
-            detail="Prediction timed out (>60s)"
+            detail=f"Batch prediction timed out (>{BATCH_PREDICT_TIMEOUT}s)"
         )
     except Exception as e:
+        trace.finish("error", success=False, error=str(e))
         raise HTTPException(
             status_code=500,
             detail=f"Unexpected error: {str(e)}"
         )
 
+@app.post("/jobs", status_code=202)
+async def submit_job(request: JobRequest):
+    """
+    Queue a long-running job; poll GET /jobs/{id} for progress and the result
+    """
+    if request.kind not in JOB_KINDS:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind (expected one of {', '.join(JOB_KINDS)})")
+    if request.kind == "rescore-cohort" and not request.params.get("all") and not request.params.get("student_ids"):
+        raise HTTPException(status_code=400, detail="Provide params.student_ids or set params.all=true")
+    try:
+        return job_queue.submit(request.kind, request.params)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+@app.get("/jobs")
+def list_jobs(status: str | None = None, kind: str | None = None, limit: int = Query(default=50, ge=1, le=500)):
+    if status is not None and status not in STATUSES:
+        raise HTTPException(status_code=400, detail=f"Unknown status (expected one of {', '.join(STATUSES)})")
+    return {"jobs": job_queue.list(status, kind, limit)}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/feature-store/events")
+async def feature_store_events(payload: dict | list[dict], x_webhook_secret: str | None = Header(default=None)):
+    """
+    Apply Supabase database-webhook payloads (courses, student_comments,
+    cocurricular_activities, students) to the feature store
+    """
+    if feature_store is None:
+        raise HTTPException(status_code=404, detail="Feature store is disabled (set USE_FEATURE_STORE=true)")
+    if not FEATURE_STORE_WEBHOOK_SECRET:
+        # /predict serves these rows, so an open endpoint would let anyone rewrite scores
+        raise HTTPException(status_code=503, detail="Feature store events are disabled (set FEATURE_STORE_WEBHOOK_SECRET)")
+    if not secrets.compare_digest(x_webhook_secret or "", FEATURE_STORE_WEBHOOK_SECRET):
+        raise HTTPException(status_code=401, detail="Invalid webhook secret")
+
+    events = payload if isinstance(payload, list) else [payload]
+    try:
+        for event in events:
+            await run_in_pool(feature_store.apply_event, event)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+    return {"success": True, "applied": len(events)}
+
 if __name__ == "__main__":
-    import uvicorn
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    if SERVER_WORKERS > 1:
+        import prefork_server
+        prefork_server.serve(SERVER_WORKERS, "0.0.0.0", port)
+    else:
+        import uvicorn
+        uvicorn.run(app, host="0.0.0.0", port=port)
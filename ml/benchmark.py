@@ -0,0 +1,432 @@
+# ml/benchmark.py
+"""
+Benchmarks for the featurization, prediction and training hot paths.
+
+Datasets are generated once per (scale, seed) with dataset_generator.py into
+ml/benchmarks/data/ and read from there, so runs are reproducible and need no
+Supabase or profile-analysis API: single predictions get the same records
+fetch_student() would return, batches what fetch_students() would return.
+Generated students have no profile URLs, so analyze_profile() does no I/O.
+
+Benchmarks (each in a fresh process, so peak RSS is its own):
+    categorize        categorize_course() per course row
+    featurize_single  build_student_features() per student
+    featurize_bulk    build_features_bulk() per BATCH_ROWS students
+    predict_single    predict_from_data() per student
+    predict_batch     predict_batch_from_data() per BATCH_ROWS students
+    train             streaming load (training_loader.py) + forest fit on the dataset
+
+Single-student benchmarks time SAMPLES seeded random students; batch benchmarks
+cover the whole dataset. Prediction uses a model trained once on MODEL_SCALE
+students, so prediction timings do not depend on the deployed model.joblib.
+
+Each result has throughput (items/sec), p50/p95/p99 latency per call and
+peak RSS, and a run is written as JSON to ml/benchmarks/results/.
+
+Usage:
+    python benchmark.py                                  # 1k, 10k, 100k students
+    python benchmark.py --scales 1000 10000 --only predict_single predict_batch
+    python benchmark.py --compare results/before.json results/after.json
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import subprocess
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from datetime import datetime, timezone
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR = Path(os.environ.get("BENCH_DIR", os.path.join(SCRIPT_DIR, "benchmarks")))
+
+SCALES = (1_000, 10_000, 100_000)
+SEED = 42
+SAMPLES = 200          # students (or course rows) timed by the single-item benchmarks
+WARMUP = 3             # untimed calls before a single-item benchmark
+BATCH_ROWS = 1000      # students per featurize_bulk / predict_batch call
+MODEL_SCALE = 1_000    # students the prediction benchmarks' model is trained on
+REGRESSION_THRESHOLD = 0.10  # --compare flags changes worse than this fraction
+
+BENCHMARKS = ("categorize", "featurize_single", "featurize_bulk", "predict_single", "predict_batch", "train")
+
+COMMENT_TEXT = "Shows steady progress in lab work and communicates clearly with the project team. " * 8
+
+
+# ── Datasets ──────────────────────────────────────────────────────────
+
+def dataset_dir(scale: int, seed: int = SEED) -> Path:
+    return BENCH_DIR / "data" / f"{scale}-{seed}"
+
+
+def prepare_dataset(scale: int, seed: int = SEED) -> Path:
+    """Generate students/courses (dataset_generator.py) plus comments and activities, once"""
+    from dataset_generator import generate_dataset
+    from dataset_io import write_table
+
+    out = dataset_dir(scale, seed)
+    marker = out / "complete.json"
+    if marker.exists():
+        return out
+    out.mkdir(parents=True, exist_ok=True)
+    print(f"Generating benchmark dataset: {scale:,} students (seed {seed}) -> {out}")
+    generate_dataset(scale, "parquet", seed=seed, output_dir=out)
+
+    # The generator skips comments and activities; add seeded ones in student order
+    rng = np.random.default_rng([seed, scale])
+    ids = np.arange(1, scale + 1)
+    per_student = rng.choice([0, 0, 1, 2, 3, 5], size=scale)
+    owners = np.repeat(ids, per_student)
+    lengths = rng.integers(20, len(COMMENT_TEXT), size=len(owners))
+    write_table(pd.DataFrame({
+        "id": np.arange(1, len(owners) + 1),
+        "student_id": owners,
+        "content": [COMMENT_TEXT[:n] for n in lengths],
+    }), "student_comments", "parquet", out)
+
+    per_student = rng.choice([0, 0, 0, 1, 2, 4], size=scale)
+    owners = np.repeat(ids, per_student)
+    scores = rng.integers(0, 101, size=(len(owners), 3))
+    write_table(pd.DataFrame({
+        "id": np.arange(1, len(owners) + 1),
+        "student_id": owners,
+        "ai_impact_score": scores[:, 0],
+        "ai_leadership_score": scores[:, 1],
+        "ai_relevance_score": scores[:, 2],
+    }), "cocurricular_activities", "parquet", out)
+
+    marker.write_text(json.dumps({"scale": scale, "seed": seed}))
+    return out
+
+
+class OfflineData:
+    """A benchmark dataset in the shapes data_access.SupabaseDataClient returns"""
+
+    COLUMNS = {
+        "courses": ["id", "student_id", "course_code", "course_name", "grade", "credit_hour"],
+        "student_comments": ["id", "student_id", "content"],
+        "cocurricular_activities": ["id", "student_id", "ai_impact_score", "ai_leadership_score", "ai_relevance_score"],
+    }
+
+    def __init__(self, path: Path):
+        from dataset_io import read_table
+
+        self.path = path
+        self.ids = read_table("students", columns=["id"], output_dir=path)["id"].to_numpy(dtype=np.int64)
+        self.tables = {}
+        for table, columns in self.COLUMNS.items():
+            df = read_table(table, columns=columns, output_dir=path)
+            # Rows are in student order: a student's rows are one slice
+            self.tables[table] = (df, df["student_id"].to_numpy(dtype=np.int64))
+
+    def frame(self, table: str, first_id: int, last_id: int) -> pd.DataFrame:
+        df, owners = self.tables[table]
+        lo, hi = np.searchsorted(owners, [first_id, last_id + 1])
+        return df.iloc[lo:hi]
+
+    def records(self, table: str, first_id: int, last_id: int) -> list:
+        from dataset_io import plain_values
+        return plain_values(self.frame(table, first_id, last_id)).to_dict("records")
+
+    def fetch_student(self, student_id: int) -> dict:
+        return {
+            "courses": self.records("courses", student_id, student_id),
+            "comments": self.records("student_comments", student_id, student_id),
+            "profile": {"id": student_id, "github_url": None, "linkedin_url": None, "portfolio_url": None},
+            "activities": self.records("cocurricular_activities", student_id, student_id),
+        }
+
+    def fetch_students(self, student_ids: np.ndarray) -> dict:
+        """Data for a contiguous id range"""
+        first, last = int(student_ids[0]), int(student_ids[-1])
+        return {
+            "courses": self.records("courses", first, last),
+            "comments": self.records("student_comments", first, last),
+            "profiles": [{"id": int(sid), "github_url": None, "linkedin_url": None, "portfolio_url": None}
+                         for sid in student_ids],
+            "activities": self.records("cocurricular_activities", first, last),
+        }
+
+    def sample_ids(self, n: int, seed: int) -> np.ndarray:
+        rng = np.random.default_rng(seed)
+        return np.sort(rng.choice(self.ids, size=min(n, len(self.ids)), replace=False))
+
+    def batches(self, rows: int):
+        for i in range(0, len(self.ids), rows):
+            yield self.ids[i:i + rows]
+
+
+def prepare_model(seed: int = SEED) -> Path:
+    """Train (once) the model the prediction benchmarks use"""
+    path = BENCH_DIR / "data" / f"model-{MODEL_SCALE}-{seed}.joblib"
+    if not path.exists():
+        _in_process(_train_model, prepare_dataset(MODEL_SCALE, seed), path)
+    return path
+
+
+def _train_model(data_dir: Path, path: Path):
+    import joblib
+    from training_loader import load_training_frame
+    from train_and_upload import build_targets, build_model, set_n_jobs
+    from course_features import MODEL_FEATURES
+
+    frame, _ = load_training_frame(data_dir)
+    X = frame[MODEL_FEATURES]
+    model = build_model("multi").fit(X, build_targets(X, frame))
+    joblib.dump(set_n_jobs(model, None), path)
+
+
+# ── Benchmarks ────────────────────────────────────────────────────────
+
+def _timed(calls, warmup: int = 0) -> tuple:
+    """Run (fn, items) pairs; returns per-call seconds and items processed"""
+    if warmup:
+        calls = list(calls)
+        for fn, _ in calls[:warmup]:
+            fn()   # caches, lazy imports, first-call allocations
+    seconds, items = [], 0
+    for fn, n in calls:
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+        items += n
+    return seconds, items
+
+
+def bench_categorize(data: OfflineData, opts: dict):
+    from course_features import categorize_course
+
+    courses, _ = data.tables["courses"]
+    rows = np.random.default_rng(opts["seed"]).choice(len(courses), size=min(opts["samples"], len(courses)), replace=False)
+    pairs = list(zip(courses["course_code"].to_numpy()[rows], courses["course_name"].to_numpy()[rows]))
+    return _timed([((lambda c=code, n=name: categorize_course(c, n)), 1) for code, name in pairs], WARMUP)
+
+
+def bench_featurize_single(data: OfflineData, opts: dict):
+    from course_features import build_student_features
+
+    calls = []
+    for sid in data.sample_ids(opts["samples"], opts["seed"]):
+        student = data.fetch_student(int(sid))
+        courses, comments = student["courses"], student["comments"]
+        calls.append(((lambda s=int(sid), c=courses, m=comments: build_student_features(s, c, m)), 1))
+    return _timed(calls, WARMUP)
+
+
+def bench_featurize_bulk(data: OfflineData, opts: dict):
+    from course_features import build_features_bulk
+
+    def calls():
+        for ids in data.batches(opts["batch_rows"]):
+            batch = data.fetch_students(ids)
+            courses, comments = pd.DataFrame(batch["courses"]), pd.DataFrame(batch["comments"])
+            yield (lambda i=ids.tolist(), c=courses, m=comments: build_features_bulk(i, c, m)), len(ids)
+    return _timed(calls())
+
+
+def _use_model(path: str):
+    import predict_student
+    from model_registry import ModelRegistry
+
+    predict_student.MODEL_REGISTRY = ModelRegistry(path)
+    predict_student.load_model()
+
+
+def bench_predict_single(data: OfflineData, opts: dict):
+    import predict_student
+    from prediction_cache import PredictionCache
+
+    _use_model(opts["model_path"])
+    # Time the full pipeline: warm-up students would otherwise be answered from the result cache
+    predict_student.PREDICTION_CACHE = PredictionCache(max_size=0)
+    calls = [((lambda s=int(sid), d=data.fetch_student(int(sid)): predict_student.predict_from_data(s, d)), 1)
+             for sid in data.sample_ids(opts["samples"], opts["seed"])]
+    return _timed(calls, WARMUP)
+
+
+def bench_predict_batch(data: OfflineData, opts: dict):
+    import predict_student
+
+    _use_model(opts["model_path"])
+
+    def calls():
+        for ids in data.batches(opts["batch_rows"]):
+            batch = data.fetch_students(ids)
+            yield (lambda i=ids.tolist(), d=batch: predict_student.predict_batch_from_data(i, d)), len(ids)
+    return _timed(calls())
+
+
+def bench_train(data: OfflineData, opts: dict):
+    from training_loader import load_training_frame
+    from train_and_upload import build_targets, build_model
+    from course_features import MODEL_FEATURES
+
+    def train():
+        frame, _ = load_training_frame(data.path)
+        X = frame[MODEL_FEATURES]
+        build_model("multi", n_estimators=opts["train_trees"]).fit(X, build_targets(X, frame))
+    return _timed([(train, len(data.ids))])
+
+
+def _rss_mb() -> float:
+    """Current resident set size (Linux; 0 elsewhere)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return 0.0
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB on Linux
+
+
+def run_benchmark(name: str, scale: int, opts: dict) -> dict:
+    """One benchmark on one dataset (run in its own process by run())"""
+    bench = globals()[f"bench_{name}"]
+    data = OfflineData(dataset_dir(scale, opts["seed"]))
+    rss_before = _rss_mb()
+    with contextlib.redirect_stdout(sys.stderr):
+        seconds, items = bench(data, opts)
+    latencies = np.array(seconds) * 1000
+    total = float(np.sum(seconds))
+    return {
+        "benchmark": name,
+        "scale": scale,
+        "calls": len(seconds),
+        "items": items,
+        "seconds": round(total, 4),
+        "throughput": round(items / total, 2) if total > 0 else None,
+        "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 4),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 4),
+        "rss_before_mb": round(rss_before, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def _in_process(fn, *args):
+    """Run fn in a fresh (spawned) interpreter"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPT_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment() -> dict:
+    import sklearn
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+    }
+
+
+def run(scales=SCALES, benchmarks=BENCHMARKS, seed=SEED, samples=SAMPLES, batch_rows=BATCH_ROWS,
+        train_trees=None, output: Path | None = None) -> dict:
+    from train_and_upload import N_ESTIMATORS
+
+    opts = {"seed": seed, "samples": samples, "batch_rows": batch_rows, "train_trees": train_trees or N_ESTIMATORS}
+    if any(name.startswith("predict") for name in benchmarks):
+        opts["model_path"] = str(prepare_model(seed))
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "options": opts | {"scales": list(scales), "benchmarks": list(benchmarks)},
+        "results": [],
+    }
+    for scale in scales:
+        prepare_dataset(scale, seed)
+        for name in benchmarks:
+            result = _in_process(run_benchmark, name, scale, opts)
+            report["results"].append(result)
+            print(f"{name:<17}{scale:>9,}  {result['throughput'] or 0:>12,.1f}/s  p50 {result['p50_ms']:>10.3f} ms  "
+                  f"p95 {result['p95_ms']:>10.3f} ms  p99 {result['p99_ms']:>10.3f} ms  peak {result['peak_rss_mb']:>7.0f} MB")
+
+    if output is None:
+        output = BENCH_DIR / "results" / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print("Saved:", output)
+    return report
+
+
+# ── Comparison ────────────────────────────────────────────────────────
+
+# Metric -> +1 if higher is better, -1 if lower is better
+COMPARED = {"throughput": 1, "p50_ms": -1, "p95_ms": -1, "p99_ms": -1, "peak_rss_mb": -1}
+
+
+def compare(before: dict, after: dict, threshold: float = REGRESSION_THRESHOLD) -> list:
+    """
+    Per (benchmark, scale) present in both runs: relative change of each COMPARED metric
+    and whether it is a regression (worse by more than `threshold`).
+    """
+    old = {(r["benchmark"], r["scale"]): r for r in before["results"]}
+    rows = []
+    for r in after["results"]:
+        base = old.get((r["benchmark"], r["scale"]))
+        if base is None:
+            continue
+        for metric, direction in COMPARED.items():
+            if not base.get(metric) or r.get(metric) is None:
+                continue
+            change = (r[metric] - base[metric]) / base[metric]
+            rows.append({"benchmark": r["benchmark"], "scale": r["scale"], "metric": metric,
+                         "before": base[metric], "after": r[metric], "change": round(change, 4),
+                         "regression": change * direction < -threshold})
+    return rows
+
+
+def print_comparison(rows: list, threshold: float):
+    print(f"{'benchmark':<17}{'scale':>9}  {'metric':<12}{'before':>12}{'after':>12}{'change':>9}")
+    for row in rows:
+        flag = "  ⚠️ regression" if row["regression"] else ""
+        print(f"{row['benchmark']:<17}{row['scale']:>9,}  {row['metric']:<12}{row['before']:>12,.3f}"
+              f"{row['after']:>12,.3f}{row['change']:>+9.1%}{flag}")
+    regressions = sum(row["regression"] for row in rows)
+    print(f"\n{regressions} regression(s) beyond {threshold:.0%}")
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Benchmark featurization, prediction and training")
+    p.add_argument("--scales", type=int, nargs="+", default=list(SCALES), help="Dataset sizes (students)")
+    p.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS), help="Benchmarks to run")
+    p.add_argument("--seed", type=int, default=SEED, help="Dataset and sampling seed")
+    p.add_argument("--samples", type=int, default=SAMPLES, help="Students timed by single-student benchmarks")
+    p.add_argument("--batch-rows", type=int, default=BATCH_ROWS, help="Students per batch call")
+    p.add_argument("--train-trees", type=int, default=None, help="Trees per forest in the train benchmark")
+    p.add_argument("--output", type=Path, default=None, help="Results file (default: benchmarks/results/<time>.json)")
+    p.add_argument("--compare", nargs=2, type=Path, metavar=("BEFORE", "AFTER"),
+                   help="Compare two results files instead of running; exits 1 on regressions")
+    p.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                   help="Relative change counted as a regression in --compare")
+    args = p.parse_args()
+
+    if args.compare:
+        before, after = (json.loads(path.read_text()) for path in args.compare)
+        rows = compare(before, after, args.threshold)
+        print_comparison(rows, args.threshold)
+        sys.exit(1 if any(row["regression"] for row in rows) else 0)
+
+    run(args.scales, args.only, args.seed, args.samples, args.batch_rows, args.train_trees, args.output)
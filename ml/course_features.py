@@ -0,0 +1,496 @@
+# ml/course_features.py
+"""
+Course categorization and feature engineering shared by prediction and training.
+
+Courses are categorized by domain (ACM Computing Curricula guidelines) using
+keyword matching on course code + name. Two feature builders are provided:
+
+- build_features_bulk(): a whole cohort at once using columnar string matching
+  and groupby aggregations (no per-row Python work)
+- build_features(): one student, returns the model row + extended feature dict
+- build_student_features(): one student from fetched row dicts; transcripts up
+  to FAST_PATH_MAX_COURSES courses are built in plain Python (same features,
+  without the DataFrame overhead that dominates at that size)
+
+Course categories are memoized in CATEGORY_INDEX, keyed by the normalized
+(course_code, course_name) pair, and can be persisted to / warmed from disk.
+
+This module has no Supabase dependency so training scripts can import it.
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# Nilai University Grade Point System (4.0 scale)
+# Based on official transcript grade points per unit
+GRADE_POINTS = {
+    "A+": 4.0,   # 12.000 grade points for 3 units = 4.0 per unit
+    "A": 4.0,    # 12.000 grade points for 3 units = 4.0 per unit
+    "A-": 3.7,   # 11.100 grade points for 3 units = 3.7 per unit
+    "B+": 3.4,   # 10.200 grade points for 3 units = 3.4 per unit
+    "B": 3.1,    # 9.300 grade points for 3 units = 3.1 per unit
+    "B-": 2.7,   # 8.100 grade points for 3 units = 2.7 per unit
+    "C+": 2.4,   # 7.200 grade points for 3 units = 2.4 per unit
+    "C": 2.1,    # 6.300 grade points for 3 units = 2.1 per unit
+    "C-": 1.8,   # 5.400 grade points for 3 units = 1.8 per unit
+    "D+": 1.7,   # 5.100 grade points for 3 units = 1.7 per unit
+    "D": 1.0,    # 3.000 grade points for 3 units = 1.0 per unit
+    "F": 0.0     # 0.000 grade points
+}
+
+# Grade scale used to build the training set (train_and_upload.build_training_df)
+TRAINING_GRADE_POINTS = {
+    "A+": 4.0, "A": 4.0, "A-": 3.67,
+    "B+": 3.33, "B": 3.0, "B-": 2.67,
+    "C+": 2.33, "C": 2.0,
+    "D+": 1.33, "D": 1.0,
+    "F": 0.0
+}
+
+DOMAIN_KEYWORDS = {
+    # Programming courses (software development, coding)
+    "programming": [
+        "PROGRAMMING", "CODING", "PYTHON", "C PROG", "OBJECT ORIENTED",
+        "WEB DEVELOPMENT", "MOBILE APP", "SOFTWARE DEV", "BACK-END", "FRONT-END",
+        "DATA STRUCT", "ALGORITHM", "SOFTWARE DESIGN PATTERN"
+    ],
+    # Design courses (HCI, UX, architecture, modeling)
+    "design": [
+        "DESIGN", "HCI", "HUMAN COMPUTER", "INTERACTION", "USER EXPERIENCE",
+        "SOFTWARE ARCHITECT", "MODELING", "ANALYSIS", "UML", "UI"
+    ],
+    # IT Infrastructure courses (networks, OS, security, cloud, database)
+    "infrastructure": [
+        "NETWORK", "OPERATING SYSTEM", "SECURITY", "DATABASE", "CLOUD",
+        "DATA COMM", "COMPUTER ORG", "ARCHITECTURE", "INFRASTRUCTURE",
+        "SYSTEM ADMIN", "SERVER"
+    ],
+    # Soft skills & management (MPU, business, project management, communication)
+    "soft_skills": [
+        "MPU", "SPEAKING", "COMMUNICATION", "MANAGEMENT", "ENTREPRENEUR",
+        "BUSINESS", "PROJECT MANAGE", "PROFESSIONAL", "ETHICS", "PHILOSOPHY",
+        "CRITICAL THINKING", "PRESENTATION"
+    ],
+    # Theory/Math courses (calculus, discrete math, AI theory)
+    "theory": [
+        "CALCULUS", "MATHEMATICS", "DISCRETE", "ALGORITHM", "THEORY",
+        "ARTIFICIAL INT", "MACHINE LEARNING", "DATA MINING", "STATISTICS"
+    ],
+}
+
+DOMAINS = list(DOMAIN_KEYWORDS)
+LEVELS = {"diploma": 2, "degree": 3}
+
+# One alternation regex per domain: a match is equivalent to any(kw in text)
+DOMAIN_PATTERNS = {
+    domain: re.compile("|".join(re.escape(kw) for kw in keywords))
+    for domain, keywords in DOMAIN_KEYWORDS.items()
+}
+
+# Course level (2000 = diploma, 3000 = degree)
+LEVEL_PATTERN = re.compile(r'(\d)000')
+
+# Category flag columns produced for every course
+CATEGORY_FLAGS = [f"is_{domain}" for domain in DOMAINS]
+
+# Persisted course-category table and in-memory LRU bound
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CATEGORY_CACHE_PATH = os.environ.get(
+    "COURSE_CATEGORY_CACHE", os.path.join(SCRIPT_DIR, "course_categories.json")
+)
+CATEGORY_CACHE_SIZE = int(os.environ.get("COURSE_CATEGORY_CACHE_SIZE", 10000))
+# Largest transcript built without pandas by build_student_features()
+FAST_PATH_MAX_COURSES = int(os.environ.get("FEATURES_FAST_PATH_MAX_COURSES", 500))
+
+# Columns fed to the base model, in training order
+MODEL_FEATURES = ["total_units", "avg_grade_point", "num_courses", "comments_count", "comments_total_len"]
+
+# Extended features holding counts (all others are GPAs / sums)
+COUNT_FEATURES = {"num_courses", "comments_count", "comments_total_len"} | {
+    f"{group}_courses" for group in DOMAINS + list(LEVELS)
+}
+
+# Default (empty transcript) extended features
+DEFAULT_FEATURES = {
+    "total_units": 0,
+    "avg_grade_point": 0.0,
+    "num_courses": 0,
+    "comments_count": 0,
+    "comments_total_len": 0,
+    # Domain-specific features
+    "programming_gpa": 0,
+    "programming_courses": 0,
+    "design_gpa": 0,
+    "design_courses": 0,
+    "infrastructure_gpa": 0,
+    "infrastructure_courses": 0,
+    "soft_skills_gpa": 0,
+    "soft_skills_courses": 0,
+    "theory_gpa": 0,
+    "theory_courses": 0,
+    # Level progression
+    "diploma_gpa": 0,
+    "diploma_courses": 0,
+    "degree_gpa": 0,
+    "degree_courses": 0,
+}
+
+
+def categorize_course(course_code: str, course_name: str) -> dict:
+    """
+    Categorize course by domain based on code and name.
+    Based on ACM Computing Curricula guidelines and course content analysis.
+
+    Returns: dict with domain flags
+    """
+    code = str(course_code).upper() if course_code else ""
+    name = str(course_name).upper() if course_name else ""
+
+    # Extract course level (2000 = diploma, 3000 = degree)
+    level_match = LEVEL_PATTERN.search(code)
+    level = int(level_match.group(1)) if level_match else 2
+
+    combined = f"{code} {name}"
+
+    categories = {
+        f"is_{domain}": DOMAIN_PATTERNS[domain].search(combined) is not None
+        for domain in DOMAINS
+    }
+    categories["level"] = level
+
+    return categories
+
+
+def _keywords_fingerprint() -> str:
+    """Hash of the categorization rules; a persisted table is only valid for the same rules"""
+    rules = json.dumps({"keywords": DOMAIN_KEYWORDS, "level": LEVEL_PATTERN.pattern}, sort_keys=True)
+    return hashlib.sha256(rules.encode("utf-8")).hexdigest()[:16]
+
+
+class CourseCategoryIndex:
+    """
+    Memoized categorize_course() keyed by normalized (course_code, course_name).
+
+    A small catalogue of distinct courses repeats across every transcript, so
+    categories are computed once per distinct course and kept in a bounded LRU.
+    The table can be saved to disk and is discarded on load when the keyword
+    lists (or level pattern) have changed since it was written.
+    """
+
+    def __init__(self, path: str = CATEGORY_CACHE_PATH, max_size: int = CATEGORY_CACHE_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self.fingerprint = _keywords_fingerprint()
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, code: str, name: str) -> tuple:
+        """
+        Return (is_programming, ..., is_theory, level) for an upper-cased course.
+        """
+        key = (code, name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        categories = categorize_course(code, name)
+        entry = tuple(categories[flag] for flag in CATEGORY_FLAGS) + (categories["level"],)
+
+        with self._lock:
+            self._entries[key] = entry
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def warm(self, df_courses: pd.DataFrame):
+        """Populate the index with every distinct course in a courses frame"""
+        if not df_courses.empty:
+            categorize_courses(df_courses[["course_code", "course_name"]].copy(), index=self)
+
+    def load(self) -> bool:
+        """Load the persisted table; returns False if missing or built from other keyword lists"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                table = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+
+        if table.get("fingerprint") != self.fingerprint:
+            return False
+
+        with self._lock:
+            for code, name, *entry in table.get("entries", [])[-self.max_size:]:
+                self._entries[(code, name)] = tuple(entry)
+        return True
+
+    def save(self):
+        """Persist the in-memory table (atomically replaces the file)"""
+        with self._lock:
+            entries = [[code, name, *entry] for (code, name), entry in self._entries.items()]
+        # Per-process temp file: pre-forked server workers save on shutdown concurrently
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": self.fingerprint, "entries": entries}, f)
+        os.replace(tmp_path, self.path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+CATEGORY_INDEX = CourseCategoryIndex()
+
+
+def _upper_text(col: pd.Series) -> pd.Series:
+    # Missing values become "" (the scalar path turns NaN into "NAN", which
+    # cannot match any keyword or the level pattern, so the result is the same)
+    return col.astype(object).fillna("").astype(str).str.upper()
+
+
+def categorize_courses(df_courses: pd.DataFrame, index: CourseCategoryIndex | None = None) -> pd.DataFrame:
+    """
+    Columnar version of categorize_course for a whole courses frame.
+
+    Each distinct (course_code, course_name) pair is looked up once in the
+    category index and the result is broadcast back to every row.
+
+    Adds is_<domain> flag columns and a `level` column in place and returns the frame.
+    """
+    index = index or CATEGORY_INDEX
+    n = len(df_courses)
+    code = _upper_text(df_courses["course_code"]) if "course_code" in df_courses else pd.Series([""] * n, index=df_courses.index)
+    name = _upper_text(df_courses["course_name"]) if "course_name" in df_courses else pd.Series([""] * n, index=df_courses.index)
+
+    codes, uniques = pd.factorize(pd.MultiIndex.from_arrays([code, name]))
+    table = np.array([index.lookup(c, nm) for c, nm in uniques], dtype=np.int64).reshape(-1, len(CATEGORY_FLAGS) + 1)
+    rows = table[codes]
+
+    for i, flag in enumerate(CATEGORY_FLAGS):
+        df_courses[flag] = rows[:, i].astype(bool)
+
+    df_courses["level"] = rows[:, -1]
+
+    return df_courses
+
+
+def grade_points(grades: pd.Series) -> pd.Series:
+    """Map letter grades to grade points (NaN for CR, SC, EX and unknown grades)"""
+    return grades.astype(object).fillna("").str.upper().str.strip().map(GRADE_POINTS)
+
+
+def build_features(student_id: int, df_courses: pd.DataFrame, df_comments: pd.DataFrame):
+    """
+    Build comprehensive feature vector based on academic research.
+
+    Features include:
+    - Overall academic performance (GPA, units)
+    - Domain-specific performance (programming, design, infrastructure)
+    - Course level progression (diploma vs degree performance)
+    - Engagement indicators (comments, course diversity)
+
+    Based on educational data mining literature (Romero & Ventura, 2010)
+
+    Shares the cohort aggregation of build_features_bulk() so single and batch
+    predictions produce identical features.
+    """
+    if not df_courses.empty:
+        df_courses = df_courses.assign(student_id=student_id)
+    if not df_comments.empty:
+        df_comments = df_comments.assign(student_id=student_id)
+
+    X, features = build_features_bulk([student_id], df_courses, df_comments)
+
+    return X, features[student_id]
+
+
+def build_features_bulk(student_ids, df_courses: pd.DataFrame, df_comments: pd.DataFrame):
+    """
+    Build the extended feature dict for many students at once.
+
+    Courses for all students are categorized with columnar regex matching and
+    aggregated with groupby(student_id). Overall, domain and level features are
+    only filled for students with at least one countable grade (CR, SC, EX and
+    unknown grades are excluded from GPAs but still count as courses/units).
+
+    Returns: (X, features) where X is the model input with one row per entry of
+    `student_ids` (in order) and `features` maps student_id -> extended dict.
+    """
+    student_ids = list(student_ids)
+    index = pd.Index(student_ids, name="student_id")
+    out = pd.DataFrame(
+        {col: np.zeros(len(index), dtype=np.int64 if col in COUNT_FEATURES else np.float64)
+         for col in DEFAULT_FEATURES},
+        index=index
+    )
+
+    if not df_courses.empty:
+        courses = df_courses[df_courses["student_id"].isin(index)].copy()
+        courses["grade_point"] = grade_points(courses["grade"])
+        categorize_courses(courses)
+
+        # Students contribute overall/domain/level features only when at least
+        # one course has a countable grade
+        by_student = courses.groupby("student_id")
+        graded = by_student["grade_point"].count()
+        has_valid = graded[graded > 0].index
+
+        # An all-null credit_hour (or content) column sums to an object Series
+        units = by_student["credit_hour"].sum().loc[has_valid]
+        out.loc[has_valid, "total_units"] = units.fillna(0).astype(float)
+        out.loc[has_valid, "avg_grade_point"] = by_student["grade_point"].mean().loc[has_valid]
+        out.loc[has_valid, "num_courses"] = by_student.size().loc[has_valid]
+
+        valid = courses[courses["grade_point"].notna()]
+        groups = {domain: valid[f"is_{domain}"] for domain in DOMAINS}
+        groups.update({level: valid["level"] == code for level, code in LEVELS.items()})
+
+        for prefix, mask in groups.items():
+            stats = valid.loc[mask].groupby("student_id")["grade_point"].agg(["mean", "size"])
+            out.loc[stats.index, f"{prefix}_gpa"] = stats["mean"]
+            out.loc[stats.index, f"{prefix}_courses"] = stats["size"]
+
+    if not df_comments.empty and "content" in df_comments.columns:
+        comments = df_comments[df_comments["student_id"].isin(index)]
+        counts = comments.groupby("student_id").size()
+        lengths = comments["content"].str.len().groupby(comments["student_id"]).sum()
+        out.loc[counts.index, "comments_count"] = counts
+        out.loc[lengths.index, "comments_total_len"] = lengths.fillna(0).astype(np.int64)
+
+    X = out[MODEL_FEATURES].reset_index(drop=True)
+    features = out.to_dict("index")
+
+    return X, features
+
+
+def _kahan_sum(values) -> float:
+    """
+    Compensated float sum in input order, as pandas' groupby sum / mean compute
+    it, so the scalar path reproduces build_features_bulk() bit for bit.
+    """
+    total = compensation = 0.0
+    for value in values:
+        y = value - compensation
+        t = total + y
+        compensation = t - total - y
+        if compensation != compensation:  # inf - inf
+            compensation = 0.0
+        total = t
+    return total
+
+
+def _missing(value) -> bool:
+    return value is None or (type(value) is float and value != value)
+
+
+def _text(value):
+    """Upper-cased code/name as _upper_text() makes it; None for values left to pandas"""
+    if isinstance(value, str):
+        return value.upper()
+    return "" if _missing(value) else None
+
+
+def _course_rows(courses: list):
+    """
+    (grade point or None, credit hour or None, category entry) per course, or
+    None when a row holds types the DataFrame path would coerce differently
+    (numeric codes, non-string grades, string credit hours...)
+    """
+    rows = []
+    for course in courses:
+        if "grade" not in course or "credit_hour" not in course:
+            return None
+        code, name = _text(course.get("course_code")), _text(course.get("course_name"))
+        grade, units = course["grade"], course["credit_hour"]
+        if code is None or name is None:
+            return None
+        if isinstance(grade, str):
+            point = GRADE_POINTS.get(grade.upper().strip())
+        elif _missing(grade):
+            point = None
+        else:
+            return None
+        if _missing(units):
+            units = None
+        elif isinstance(units, bool) or not isinstance(units, (int, float)):
+            return None
+        rows.append((point, units, CATEGORY_INDEX.lookup(code, name)))
+    return rows
+
+
+def _comment_lengths(comments: list):
+    """Content lengths (None for missing content), or None if a row is not plain text"""
+    lengths = []
+    for comment in comments:
+        content = comment.get("content")
+        if isinstance(content, str):
+            lengths.append(len(content))
+        elif _missing(content):
+            lengths.append(None)
+        else:
+            return None
+    return lengths
+
+
+def build_student_features(student_id: int, courses: list, comments: list):
+    """
+    build_features() for one student's fetched rows (see
+    data_access.SupabaseDataClient.fetch_student).
+
+    Transcripts up to FAST_PATH_MAX_COURSES courses are aggregated in plain
+    Python into a preallocated feature row; larger ones, and rows with types
+    the DataFrame path coerces (e.g. numeric course codes), go through
+    build_features(). Both produce the same features.
+    """
+    rows = _course_rows(courses) if len(courses) <= FAST_PATH_MAX_COURSES else None
+    lengths = _comment_lengths(comments) if rows is not None else None
+    if rows is None or lengths is None:
+        return build_features(student_id, pd.DataFrame(courses), pd.DataFrame(comments))
+
+    features = {name: value if name in COUNT_FEATURES else float(value)
+                for name, value in DEFAULT_FEATURES.items()}
+
+    # Overall, domain and level features need at least one countable grade
+    graded = [(point, entry) for point, _, entry in rows if point is not None]
+    if graded:
+        features["total_units"] = _kahan_sum(units for _, units, _ in rows if units is not None)
+        features["avg_grade_point"] = _kahan_sum(point for point, _ in graded) / len(graded)
+        features["num_courses"] = len(rows)
+
+        # Category entries are (is_<domain> flags..., level)
+        groups = {domain: [point for point, entry in graded if entry[i]] for i, domain in enumerate(DOMAINS)}
+        groups.update({level: [point for point, entry in graded if entry[-1] == code]
+                       for level, code in LEVELS.items()})
+        for prefix, points in groups.items():
+            if points:
+                features[f"{prefix}_gpa"] = _kahan_sum(points) / len(points)
+                features[f"{prefix}_courses"] = len(points)
+
+    if comments and any("content" in comment for comment in comments):
+        features["comments_count"] = len(comments)
+        features["comments_total_len"] = sum(length for length in lengths if length is not None)
+
+    row = np.empty((1, len(MODEL_FEATURES)), dtype=np.float64)
+    row[0] = [features[name] for name in MODEL_FEATURES]
+    # Fitted estimators check feature names (and the SGD backend selects columns by name)
+    X = pd.DataFrame(row, columns=MODEL_FEATURES)
+
+    return X, features
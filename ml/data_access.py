@@ -0,0 +1,204 @@
+# ml/data_access.py
+"""
+Async, pooled data access for prediction.
+
+Talks to Supabase's PostgREST endpoint (`{SUPABASE_URL}/rest/v1`) over one
+shared httpx.AsyncClient so connections are reused. The queries a prediction
+needs (courses, comments, profile URLs, co-curricular activities) are issued
+concurrently and select only the columns used by feature building and
+scoring, so per-student wall time is roughly the slowest single query.
+
+Usable from the FastAPI server (one client for the app lifetime) and from the
+CLI via run(), which opens a client for the duration of one call.
+"""
+
+import os
+import random
+import asyncio
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SUPABASE_URL = os.environ.get("SUPABASE_URL")
+SERVICE_ROLE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+
+MAX_CONNECTIONS = int(os.environ.get("SUPABASE_MAX_CONNECTIONS", 20))
+REQUEST_TIMEOUT = float(os.environ.get("SUPABASE_TIMEOUT", 15))
+
+# Ids per `in.(...)` filter and rows per page (PostgREST default max is 1000)
+ID_CHUNK_SIZE = 200
+PAGE_SIZE = 1000
+# Concurrent chunk queries of a bulk fetch (kept below MAX_CONNECTIONS) and score write-backs
+FETCH_CONCURRENCY = 8
+WRITE_CONCURRENCY = 8
+# Retries for transient failures (connection errors, 429, 5xx) on bulk inserts
+MAX_RETRIES = int(os.environ.get("SUPABASE_MAX_RETRIES", 5))
+RETRY_BACKOFF = 0.5  # seconds, doubled per attempt (with jitter)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Only the columns used by course_features / calculate_scores
+COURSE_COLUMNS = "id,student_id,course_code,course_name,grade,credit_hour"
+COMMENT_COLUMNS = "id,student_id,content"
+PROFILE_COLUMNS = "id,github_url,linkedin_url,portfolio_url"
+ACTIVITY_COLUMNS = "id,student_id,ai_impact_score,ai_leadership_score,ai_relevance_score"
+
+
+class SupabaseDataClient:
+    def __init__(self, url: str | None = None, key: str | None = None,
+                 max_connections: int = MAX_CONNECTIONS, timeout: float = REQUEST_TIMEOUT,
+                 transport: httpx.AsyncBaseTransport | None = None):
+        url = url or SUPABASE_URL
+        key = key or SERVICE_ROLE_KEY
+        if not url or not key:
+            raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set")
+
+        self._client = httpx.AsyncClient(
+            base_url=f"{url.rstrip('/')}/rest/v1",
+            headers={"apikey": key, "Authorization": f"Bearer {key}"},
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+            transport=transport,
+        )
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def select(self, table: str, columns: str, filters: dict | None = None,
+                     limit: int | None = None, offset: int | None = None) -> list:
+        params = {"select": columns, "order": "id.asc", **(filters or {})}
+        if limit is not None:
+            params["limit"] = limit
+        if offset is not None:
+            params["offset"] = offset
+        res = await self._client.get(f"/{table}", params=params)
+        res.raise_for_status()
+        return res.json()
+
+    async def select_all(self, table: str, columns: str, filters: dict | None = None) -> list:
+        """Select every matching row, paging through PostgREST's row limit"""
+        rows = []
+        offset = 0
+        while True:
+            page = await self.select(table, columns, filters, limit=PAGE_SIZE, offset=offset)
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                return rows
+            offset += PAGE_SIZE
+
+    async def insert_rows(self, table: str, rows: list, returning: str | None = None,
+                          max_retries: int = MAX_RETRIES) -> list:
+        """
+        Insert `rows` with one bulk POST. With `returning` (e.g. "id") the inserted
+        rows' columns are returned in insert order, else an empty list.
+
+        Transient failures are retried with exponential backoff. A retry after a
+        lost response can duplicate the batch, so callers should keep batches
+        small enough to re-check if that matters.
+        """
+        headers = {"Prefer": "return=representation" if returning else "return=minimal"}
+        params = {"select": returning} if returning else None
+        for attempt in range(max_retries + 1):
+            try:
+                res = await self._client.post(f"/{table}", json=rows, params=params, headers=headers)
+                if res.status_code not in RETRY_STATUS:
+                    res.raise_for_status()
+                    return res.json() if returning else []
+                error = httpx.HTTPStatusError(f"{res.status_code} from {table}", request=res.request, response=res)
+            except httpx.TransportError as e:
+                error = e
+            if attempt == max_retries:
+                raise error
+            await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt) * (0.5 + random.random()))
+
+    async def fetch_student(self, student_id: int) -> dict:
+        """Fetch everything needed to score one student (queries run concurrently)"""
+        eq = f"eq.{student_id}"
+        courses, comments, profiles, activities = await asyncio.gather(
+            self.select_all("courses", COURSE_COLUMNS, {"student_id": eq}),
+            self.select_all("student_comments", COMMENT_COLUMNS, {"student_id": eq}),
+            self.select("students", PROFILE_COLUMNS, {"id": eq}),
+            self.select_all("cocurricular_activities", ACTIVITY_COLUMNS, {"student_id": eq}),
+        )
+        return {
+            "courses": courses,
+            "comments": comments,
+            "profile": profiles[0] if profiles else None,
+            "activities": activities,
+        }
+
+    async def _select_in(self, table: str, columns: str, key: str, student_ids: list,
+                         semaphore: asyncio.Semaphore) -> list:
+        async def select_chunk(chunk):
+            async with semaphore:
+                return await self.select_all(table, columns, {key: f"in.({','.join(str(sid) for sid in chunk)})"})
+
+        chunks = [student_ids[i:i + ID_CHUNK_SIZE] for i in range(0, len(student_ids), ID_CHUNK_SIZE)]
+        pages = await asyncio.gather(*(select_chunk(chunk) for chunk in chunks))
+        return [row for page in pages for row in page]
+
+    async def fetch_students(self, student_ids, concurrency: int = FETCH_CONCURRENCY) -> dict:
+        """
+        Fetch data for many students with chunked `in` filters. Tables and chunks
+        run concurrently, at most `concurrency` chunk queries at a time, so a large
+        cohort does not queue more requests than the pool can serve in time.
+        """
+        student_ids = list(student_ids)
+        semaphore = asyncio.Semaphore(concurrency)
+        courses, comments, profiles, activities = await asyncio.gather(
+            self._select_in("courses", COURSE_COLUMNS, "student_id", student_ids, semaphore),
+            self._select_in("student_comments", COMMENT_COLUMNS, "student_id", student_ids, semaphore),
+            self._select_in("students", PROFILE_COLUMNS, "id", student_ids, semaphore),
+            self._select_in("cocurricular_activities", ACTIVITY_COLUMNS, "student_id", student_ids, semaphore),
+        )
+        return {
+            "courses": courses,
+            "comments": comments,
+            "profiles": profiles,
+            "activities": activities,
+        }
+
+    async def fetch_all_student_ids(self) -> list:
+        return [row["id"] for row in await self.select_all("students", "id")]
+
+    async def update_scores(self, results: list, concurrency: int = WRITE_CONCURRENCY) -> int:
+        """
+        Write predicted scores back to the students table.
+
+        PostgREST has no multi-row UPDATE, and an upsert would need every NOT NULL
+        column of `students`, so rows are PATCHed individually with bounded concurrency.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def update_one(result):
+            async with semaphore:
+                res = await self._client.patch(
+                    "/students",
+                    params={"id": f"eq.{result['student_id']}"},
+                    json=result["scores"],
+                    headers={"Prefer": "return=minimal"},
+                )
+                res.raise_for_status()
+
+        rows = [r for r in results if r.get("success")]
+        await asyncio.gather(*(update_one(r) for r in rows))
+        return len(rows)
+
+
+def run(operation, **client_kwargs):
+    """
+    Run `operation(client)` to completion from synchronous code (CLI, scripts).
+
+    Example: run(lambda client: client.fetch_student(42))
+    """
+    async def runner():
+        async with SupabaseDataClient(**client_kwargs) as client:
+            return await operation(client)
+
+    return asyncio.run(runner())
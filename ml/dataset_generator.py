@@ -2,31 +2,32 @@
 """
 Synthetic dataset generator for Nilai University computing programmes.
 
-Outputs:
-- ml/output/students.csv
-- ml/output/courses.csv
-- ml/output/student_comments.csv
+Outputs (Parquet by default, CSV with --format csv; see dataset_io.py):
+- ml/output/students.parquet
+- ml/output/courses.parquet
+
+Rows are sampled as NumPy arrays in shards of SHARD_SIZE students, generated across
+processes (`--workers`) with per-shard seeds and appended to the output files as each
+shard completes, so `--num` can be in the millions without the data being held in memory.
 
 Optional: uploads to Supabase if environment variables SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY are set.
 """
 
 import os
-import random
-import csv
 import json
-from datetime import datetime, timedelta
+import time
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 from pathlib import Path
 from typing import List, Dict
+import numpy as np
+import pandas as pd
 from dotenv import load_dotenv
+from dataset_io import DEFAULT_FORMAT, FORMATS, TableWriter, plain_values, read_file
 load_dotenv(dotenv_path="ml/.env")
 
-# Optional supabase client upload
-try:
-    from supabase import create_client
-    SUPABASE_AVAILABLE = True
-except Exception:
-    SUPABASE_AVAILABLE = False
-
 # ---------- CONFIG ----------
 OUTPUT_DIR = Path("ml/output")
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
@@ -34,6 +35,10 @@ OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 NUM_STUDENTS = 500  # adjust large as you want
 RANDOM_SEED = 42
 
+# Bulk upload: rows per insert request and requests in flight
+UPLOAD_BATCH_SIZE = int(os.environ.get("UPLOAD_BATCH_SIZE", 1000))
+UPLOAD_CONCURRENCY = int(os.environ.get("UPLOAD_CONCURRENCY", 4))
+
 # Program list you provided
 PROGRAMS = [
     "Bachelor in Computer Science (Honours) (Artificial Intelligence)",
@@ -76,224 +81,282 @@ GRADE_CHOICES = ["A+", "A", "A-", "B+", "B", "B-", "C+", "C", "D+", "D", "F", "C
 GRADE_WEIGHTS = [0.06, 0.08, 0.07, 0.12, 0.20, 0.12, 0.10, 0.08, 0.06, 0.05, 0.03, 0.02, 0.01, 0.00]
 # Note: 'CR' appears for transfer/diploma; 'SC' internship special code; 'EX' exempt etc.
 
+FIRST_NAMES = ["Ahmad","Aisha","Lim","Chun","Siti","John","Mary","Ali","Nur","Hassan","Wei","Sofia","Ibrahim"]
+LAST_NAMES = ["Bin","Binti","Tan","Lim","Kumar","Smith","Lee","Wong","Ng","Hussein"]
+GENDERS = ["Male","Female","Other"]
+
+STUDENT_COLUMNS = ["id","name","gender","dob","image_url","description","analysis",
+                   "level","program","created_at","cgpa"]
+COURSE_COLUMNS = ["id","student_id","course_name","course_code","course_description",
+                  "grade","credit_hour","score","created_at"]
+
+# Students per shard: the unit of parallel work, of seeding and of memory (~47 course rows each)
+SHARD_SIZE = 10_000
+MAX_SEMESTERS = 12  # 4 years x 3 semesters
+
 # ---------- HELPERS ----------
-random.seed(RANDOM_SEED)
-
-def random_name(i):
-    first = ["Ahmad","Aisha","Lim","Chun","Siti","John","Mary","Ali","Nur","Hassan","Wei","Sofia","Ibrahim"]
-    last = ["Bin","Binti","Tan","Lim","Kumar","Smith","Lee","Wong","Ng","Hussein"]
-    return f"{random.choice(first)} {random.choice(last)}_{i}"
-
-def random_dob():
-    # ages between 19 and 30 for undergrad/diploma (approx)
-    age = random.randint(18, 28)
-    days = random.randint(0, 365)
-    d = datetime.now() - timedelta(days=age*365 + days)
-    return d.strftime("%Y-%m-%d")
-
-def pick_courses_for_student(program: str):
-    # Determine level and expected year length
-    is_diploma = program.lower().startswith("diploma")
-    courses = []
-    # diploma shorter: assume 2-3 years; degree 3-4 years
-    years = random.choice([2,3]) if is_diploma else random.choice([3,4])
-    semesters = years * 3  # 3 sems per year (2 long, 1 short)
-    for sem in range(1, semesters+1):
-        # long semesters -> 5-6 courses, short -> 3-4
-        if sem % 3 == 0:  # treat every 3rd as short
-            num = random.randint(3,4)
-        else:
-            num = random.randint(5,6) if not is_diploma else random.randint(4,6)
-        # draw from base course pool (degree vs diploma)
-        for _ in range(num):
-            base = random.choice(BASE_COURSES)
-            code_prefix, cname, credit_hour, is_degree_course = base
-            # If student is diploma, use 2000-level codes mostly:
-            if is_diploma:
-                # convert degree code to 2000-ish if needed
-                if code_prefix.startswith("EC3") or code_prefix.startswith("EC33") or code_prefix.startswith("EC32"):
-                    course_code = code_prefix.replace("3", "2", 1)  # rough conversion
-                else:
-                    course_code = code_prefix
-            else:
-                # degree: prefer 3000 series for many courses
-                if code_prefix.startswith("EC2") and random.random() < 0.5:
-                    course_code = code_prefix.replace("2", "3", 1)
-                else:
-                    course_code = code_prefix
-            # grade logic:
-            # - diploma courses in degree student's record often become CR (if transferred)
-            grade = random.choices(GRADE_CHOICES, weights=GRADE_WEIGHTS, k=1)[0]
-            # set 'CR' more likely if course_code starts with 2xx and student is degree and random
-            if not is_diploma and course_code.startswith(("BM","EC2","MPU")) and random.random() < 0.25:
-                grade = "CR"
-            # add interns & special codes rarely
-            courses.append({
-                "course_name": cname,
-                "course_code": course_code,
-                "grade": grade,
-                "credit_hour": float(credit_hour),
-            })
-    return courses
-
-def generate_students_and_courses(num_students: int):
-    students = []
-    courses = []
-    comments = []
-    sid = 1
-    for i in range(1, num_students+1):
-        program = random.choice(PROGRAMS)
-        name = random_name(i)
-        dob = random_dob()
-        gender = random.choice(["Male","Female","Other"])
-        image_url = f"https://api.example.com/avatar/{i}.jpg"  # default placeholder URL
-        created_at = datetime.now().isoformat()
-        analysis = {}  # empty until ML processes
-        level = "Diploma" if program.lower().startswith("diploma") else "Degree"
-        cgpa = None
-        students.append({
-            "id": sid,
-            "name": name,
-            "gender": gender,
-            "dob": dob,
-            "image_url": image_url,
-            "description": None,
-            "analysis": json.dumps(analysis),
-            "level": level,
-            "program": program,
-            "created_at": created_at,
-            "cgpa": None,
-        })
-        # generate course history
-        student_courses = pick_courses_for_student(program)
-        # allow duplicates for repeated courses if failed earlier
-        # convert to rows, assign unique course ids
-        for c in student_courses:
-            courses.append({
-                "id": len(courses) + 1,
-                "student_id": sid,
-                "course_name": c["course_name"],
-                "course_code": c["course_code"],
-                "course_description": None,
-                "grade": c["grade"],
-                "credit_hour": c["credit_hour"],
-                "score": None,
-                "created_at": datetime.now().isoformat()
-            })
-        # Skipping comments: commenter_id requires valid UUID from admin_users table
-        # Comments table has FK constraint on commenter_id -> admin_users(id)
-        # You can populate comments manually after creating admin users
-        sid += 1
-    return students, courses, comments
+def _course_tables():
+    """
+    Per BASE_COURSES entry: the code a diploma student gets, the degree 3000-series variant
+    (used half the time for EC2xxx codes) and the plain code, as indexes into COURSE_CODES,
+    plus whether the code can be upgraded / be a CR transfer.
+    """
+    codes = []
+
+    def index(code):
+        if code not in codes:
+            codes.append(code)
+        return codes.index(code)
+
+    plain, diploma, degree_up, can_upgrade, transfer = [], [], [], [], []
+    for code_prefix, _, _, _ in BASE_COURSES:
+        # diploma: convert degree code to 2000-ish (rough conversion)
+        plain.append(index(code_prefix))
+        diploma.append(index(code_prefix.replace("3", "2", 1) if code_prefix.startswith("EC3") else code_prefix))
+        degree_up.append(index(code_prefix.replace("2", "3", 1)))
+        can_upgrade.append(code_prefix.startswith("EC2"))
+        transfer.append(code_prefix.startswith(("BM", "EC2", "MPU")))
+    return (codes, np.array(plain), np.array(diploma), np.array(degree_up),
+            np.array(can_upgrade), np.array(transfer))
+
+COURSE_CODES, _PLAIN, _DIPLOMA, _DEGREE_UP, _CAN_UPGRADE, _TRANSFER = _course_tables()
+COURSE_NAMES = [c[1] for c in BASE_COURSES]
+_CREDIT_HOURS = np.array([float(c[2]) for c in BASE_COURSES])
+_GRADE_P = np.array(GRADE_WEIGHTS) / np.sum(GRADE_WEIGHTS)
+_CR = GRADE_CHOICES.index("CR")
+_IS_DIPLOMA = np.array([p.lower().startswith("diploma") for p in PROGRAMS])
+
+def _categorical(codes: np.ndarray, categories: list) -> pd.Categorical:
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+def generate_shard(shard: int, num_students: int, shard_size: int = SHARD_SIZE,
+                   seed: int = RANDOM_SEED, created_at: str = None):
+    """
+    Students shard*shard_size+1 .. +num_students and their courses, as DataFrames.
+
+    Same distributions as the original row-by-row generator (programme, 2-3 / 3-4 years of
+    3 semesters with 3-6 courses each, GRADE_WEIGHTS grades, CR for transferred 2000-level
+    courses), sampled as arrays. The shard's RNG is seeded from (seed, shard), so the output
+    depends only on seed and shard_size, not on how many processes generate it.
+    Course ids are assigned by the writer, which numbers rows across shards.
+    """
+    rng = np.random.default_rng([seed, shard])
+    n = num_students
+    ids = np.arange(shard * shard_size + 1, shard * shard_size + n + 1)
+    created_at = created_at or datetime.now().isoformat()
+
+    program = rng.integers(len(PROGRAMS), size=n)
+    is_diploma = _IS_DIPLOMA[program]
+
+    # ages between 18 and 28 (plus 0-365 days) for undergrad/diploma
+    age_days = rng.integers(18, 29, size=n) * 365 + rng.integers(0, 366, size=n)
+    dob = np.datetime64(datetime.now().date()) - age_days.astype("timedelta64[D]")
+
+    first = np.array(FIRST_NAMES, dtype=object)[rng.integers(len(FIRST_NAMES), size=n)]
+    last = np.array(LAST_NAMES, dtype=object)[rng.integers(len(LAST_NAMES), size=n)]
+    id_text = ids.astype(str).astype(object)
+
+    students = pd.DataFrame({
+        "id": ids,
+        "name": first + " " + last + "_" + id_text,
+        "gender": _categorical(rng.integers(len(GENDERS), size=n), GENDERS),
+        "dob": np.datetime_as_string(dob, unit="D").astype(object),
+        "image_url": "https://api.example.com/avatar/" + id_text + ".jpg",  # default placeholder URL
+        "description": None,
+        "analysis": json.dumps({}),  # empty until ML processes
+        "level": _categorical(is_diploma.astype(np.int8), ["Degree", "Diploma"]),
+        "program": _categorical(program, PROGRAMS),
+        "created_at": created_at,
+        "cgpa": np.nan,
+    })
+
+    # diploma 2-3 years, degree 3-4 years; 3 sems per year (2 long, 1 short)
+    semesters = (rng.integers(0, 2, size=n) + np.where(is_diploma, 2, 3)) * 3
+    sem = np.arange(1, MAX_SEMESTERS + 1)
+    short = sem % 3 == 0  # treat every 3rd as short
+    # long semesters -> 5-6 courses (diploma 4-6), short -> 3-4
+    low = np.where(short, 3, np.where(is_diploma[:, None], 4, 5))
+    high = np.where(short, 4, 6)
+    per_sem = rng.integers(low, high + 1, size=(n, MAX_SEMESTERS))
+    per_student = np.where(sem <= semesters[:, None], per_sem, 0).sum(axis=1)
+
+    owner = np.repeat(np.arange(n), per_student)
+    rows = len(owner)
+    base = rng.integers(len(BASE_COURSES), size=rows)
+    diploma_row = is_diploma[owner]
+    # degree: prefer 3000 series for many courses
+    upgrade = ~diploma_row & _CAN_UPGRADE[base] & (rng.random(rows) < 0.5)
+    course = np.where(diploma_row, _DIPLOMA[base], np.where(upgrade, _DEGREE_UP[base], _PLAIN[base]))
+
+    grade = rng.choice(len(GRADE_CHOICES), size=rows, p=_GRADE_P)
+    # set 'CR' more likely if course_code starts with 2xx and student is degree
+    transfer = ~diploma_row & ~upgrade & _TRANSFER[base] & (rng.random(rows) < 0.25)
+    grade = np.where(transfer, _CR, grade)
+
+    courses = pd.DataFrame({
+        "id": 0,
+        "student_id": ids[owner],
+        "course_name": _categorical(base, COURSE_NAMES),
+        "course_code": _categorical(course, COURSE_CODES),
+        "course_description": None,
+        "grade": _categorical(grade, GRADE_CHOICES),
+        "credit_hour": _CREDIT_HOURS[base],
+        "score": np.nan,
+        "created_at": created_at,
+    })
+    # Skipping comments: commenter_id requires valid UUID from admin_users table
+    # Comments table has FK constraint on commenter_id -> admin_users(id)
+    # You can populate comments manually after creating admin users
+    return students[STUDENT_COLUMNS], courses[COURSE_COLUMNS]
+
+def _generate_shard(args):
+    return generate_shard(*args)
+
+def generate_dataset(num_students: int, fmt: str = DEFAULT_FORMAT, workers: int = None,
+                     shard_size: int = SHARD_SIZE, seed: int = RANDOM_SEED, output_dir: Path = OUTPUT_DIR):
+    """
+    Generate `num_students` students in shards across `workers` processes, streaming each
+    shard to the students/courses files in shard order as it completes. At most
+    2 x workers shards are in flight, so memory does not grow with num_students.
+    Returns (students_path, courses_path).
+    """
+    workers = workers or os.cpu_count() or 1
+    created_at = datetime.now().isoformat()
+    num_shards = -(-num_students // shard_size)
+    tasks = [(shard, min(shard_size, num_students - shard * shard_size), shard_size, seed, created_at)
+             for shard in range(num_shards)]
+
+    def shards():
+        if workers == 1:
+            yield from map(_generate_shard, tasks)
+            return
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for task in tasks:
+                pending.append(pool.submit(_generate_shard, task))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    start = time.perf_counter()
+    with TableWriter("students", fmt, output_dir) as students_out, \
+            TableWriter("courses", fmt, output_dir) as courses_out:
+        for students, courses in shards():
+            courses["id"] = np.arange(courses_out.rows + 1, courses_out.rows + len(courses) + 1)
+            students_out.write(students)
+            courses_out.write(courses)
+            elapsed = time.perf_counter() - start
+            print(f"  {students_out.rows:,}/{num_students:,} students, {courses_out.rows:,} courses "
+                  f"({students_out.rows / elapsed:,.0f} students/sec)")
+
+    print("Saved:", students_out.path)
+    print("Saved:", courses_out.path)
+    return students_out.path, courses_out.path
 
 # ---------- MAIN ----------
-def save_csv(data: List[Dict], path: Path, fieldnames: List[str]):
-    with open(path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        for row in data:
-            # ensure all keys exist
-            out = {k: row.get(k, "") for k in fieldnames}
-            writer.writerow(out)
-    print("Saved:", path)
-
-def upload_to_supabase_if_configured(students_path, courses_path, comments_path):
-    if not SUPABASE_AVAILABLE:
-        print("Supabase client not installed, skipping upload.")
-        return
-
+async def bulk_insert(client, table: str, rows: List[Dict], batch_size: int, concurrency: int,
+                      returning: str = None) -> list:
+    """
+    Insert rows in batches of `batch_size`, at most `concurrency` batches in flight.
+    Returns the `returning` column of every inserted row, in input order.
+    """
+    batches = [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+    semaphore = asyncio.Semaphore(concurrency)
+    done = 0
+    start = time.perf_counter()
+
+    async def insert(batch):
+        nonlocal done
+        async with semaphore:
+            inserted = await client.insert_rows(table, batch, returning=returning)
+        done += len(batch)
+        elapsed = time.perf_counter() - start
+        print(f"  {table}: {done}/{len(rows)} rows ({done / elapsed:,.0f} rows/sec)")
+        return [r[returning] for r in inserted] if returning else []
+
+    results = await asyncio.gather(*(insert(batch) for batch in batches))
+    elapsed = time.perf_counter() - start
+    if rows:
+        print(f"Inserted {len(rows)} {table} rows in {elapsed:.2f}s ({len(rows) / elapsed:,.0f} rows/sec)")
+    return [value for batch in results for value in batch]
+
+def upload_to_supabase_if_configured(students_path, courses_path, comments_path,
+                                     batch_size=UPLOAD_BATCH_SIZE, concurrency=UPLOAD_CONCURRENCY):
     url = os.environ.get("SUPABASE_URL")
     key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
     if not url or not key:
         print("SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY missing — skipping upload.")
         return
 
-    supabase = create_client(url, key)
-    import pandas as pd
+    from data_access import SupabaseDataClient
 
-    print("Uploading CSVs to Supabase (batch insert with ID mapping)...")
+    print(f"Uploading dataset to Supabase (bulk insert, {batch_size} rows/batch, {concurrency} in flight)...")
 
-    df_students = pd.read_csv(students_path)
-    df_courses = pd.read_csv(courses_path)
+    # Upload plain values (the Parquet schema's categoricals/timestamps are not JSON)
+    df_students = plain_values(read_file(students_path))
+    df_courses = plain_values(read_file(courses_path))
 
     # Only read comments if path is provided
     df_comments = None
     if comments_path:
-        df_comments = pd.read_csv(comments_path)
-
-    def clean(row_dict):
-        for k, v in row_dict.items():
-            if isinstance(v, float) and (v != v):  # NaN
-                row_dict[k] = None
-        return row_dict
-
-    # Build old_id → new_id mapping
-    id_map = {}
-
-    # Insert students
-    print("Inserting students...")
-    for _, r in df_students.iterrows():
-        payload = clean(r.to_dict())
-        old_id = payload.pop("id", None)
-        result = supabase.table("students").insert(payload).execute()
-        if result.data and len(result.data) > 0:
-            new_id = result.data[0].get("id")
-            if new_id:
-                id_map[old_id] = new_id
-
-    print(f"Inserted {len(id_map)} students")
-
-    # Insert courses
-    print("Inserting courses...")
-    for _, r in df_courses.iterrows():
-        payload = clean(r.to_dict())
-        payload.pop("id", None)
-        old_sid = payload.get("student_id")
-        if old_sid in id_map:
-            payload["student_id"] = id_map[old_sid]
-        supabase.table("courses").insert(payload).execute()
-
-    # Insert comments only if CSV exists
-    if df_comments is not None:
-        print("Inserting comments...")
-        for _, r in df_comments.iterrows():
-            payload = clean(r.to_dict())
-            payload.pop("id", None)
-            old_sid = payload.get("student_id")
-            if old_sid in id_map:
-                payload["student_id"] = id_map[old_sid]
-            supabase.table("student_comments").insert(payload).execute()
-
-    print("✅ Upload done (batch with ID mapping).")
-
-
-
-def main(save_and_upload=False, num=NUM_STUDENTS):
+        df_comments = plain_values(read_file(comments_path))
+
+    def remap_students(df, id_map):
+        # old student id -> new id (ids the upload did not create are kept as is)
+        df = df.drop(columns=["id"], errors="ignore")
+        if "student_id" in df:
+            df["student_id"] = [id_map.get(sid, sid) for sid in df["student_id"]]
+        return df.to_dict("records")
+
+    async def upload():
+        async with SupabaseDataClient(url, key) as client:
+            # Insert students; new ids come back in insert order for the old -> new mapping
+            print("Inserting students...")
+            old_ids = df_students["id"].tolist()
+            new_ids = await bulk_insert(client, "students", df_students.drop(columns=["id"]).to_dict("records"),
+                                        batch_size, concurrency, returning="id")
+            id_map = dict(zip(old_ids, new_ids))
+            print(f"Inserted {len(id_map)} students")
+
+            # Courses and comments reference the new student ids
+            print("Inserting courses...")
+            await bulk_insert(client, "courses", remap_students(df_courses, id_map), batch_size, concurrency)
+
+            # Insert comments only if a comments file was given
+            if df_comments is not None:
+                print("Inserting comments...")
+                await bulk_insert(client, "student_comments", remap_students(df_comments, id_map),
+                                  batch_size, concurrency)
+
+    asyncio.run(upload())
+    print("✅ Upload done (bulk insert with ID mapping).")
+
+
+
+def main(save_and_upload=False, num=NUM_STUDENTS, fmt=DEFAULT_FORMAT,
+         batch_size=UPLOAD_BATCH_SIZE, concurrency=UPLOAD_CONCURRENCY,
+         workers=None, shard_size=SHARD_SIZE, seed=RANDOM_SEED):
     print("Generating synthetic dataset ...")
-    students, courses, comments = generate_students_and_courses(num)
-    s_path = OUTPUT_DIR / "students.csv"
-    c_path = OUTPUT_DIR / "courses.csv"
-    com_path = OUTPUT_DIR / "student_comments.csv"
-
-    save_csv(students, s_path, [
-        "id","name","gender","dob","image_url","description","analysis",
-        "level","program","created_at","cgpa"
-    ])
-    save_csv(courses, c_path, [
-        "id","student_id","course_name","course_code","course_description",
-        "grade","credit_hour","score","created_at"
-    ])
-    # Skip saving comments CSV since we don't have valid commenter_id UUIDs
-    # print("Skipped: ml/output/student_comments.csv (no valid admin_users)")
+    s_path, c_path = generate_dataset(num, fmt, workers, shard_size, seed)
+    # Skip saving comments since we don't have valid commenter_id UUIDs
 
     if save_and_upload:
         # Only upload students and courses; skip comments (no valid admin_users)
-        upload_to_supabase_if_configured(s_path, c_path, None)
+        upload_to_supabase_if_configured(s_path, c_path, None, batch_size, concurrency)
 
 if __name__ == "__main__":
     import argparse
     p = argparse.ArgumentParser()
     p.add_argument("--num", type=int, default=NUM_STUDENTS, help="Number of students to generate")
-    p.add_argument("--upload", action="store_true", help="Upload generated CSVs to Supabase (requires env vars & supabase lib)")
+    p.add_argument("--upload", action="store_true", help="Upload generated dataset to Supabase (requires env vars)")
+    p.add_argument("--format", choices=FORMATS, default=DEFAULT_FORMAT, help="Output file format")
+    p.add_argument("--batch-size", type=int, default=UPLOAD_BATCH_SIZE, help="Rows per bulk insert request")
+    p.add_argument("--concurrency", type=int, default=UPLOAD_CONCURRENCY, help="Insert requests in flight")
+    p.add_argument("--workers", type=int, default=None, help="Generator processes (default: CPU count)")
+    p.add_argument("--shard-size", type=int, default=SHARD_SIZE, help="Students per shard (changes the data)")
+    p.add_argument("--seed", type=int, default=RANDOM_SEED, help="Random seed")
     args = p.parse_args()
-    main(save_and_upload=args.upload, num=args.num)
+    main(save_and_upload=args.upload, num=args.num, fmt=args.format,
+         batch_size=args.batch_size, concurrency=args.concurrency,
+         workers=args.workers, shard_size=args.shard_size, seed=args.seed)
@@ -0,0 +1,237 @@
+# ml/dataset_io.py
+"""
+Reading and writing the ml/output dataset tables (students, courses, student_comments).
+
+Tables are stored as Parquet by default, with a declared schema:
+
+- grade, course_code, program, level, gender are dictionary-encoded (categorical)
+- created_at / last_summary_updated are UTC timestamps and dob a date, so they
+  are parsed once when written instead of on every read
+- analysis is kept as its JSON text
+
+Readers take a column projection, so e.g. training reads only
+`id, student_id, grade, credit_hour` from courses. CSV stays available for
+export (`--format csv`) and is read transparently; when both files of a table
+exist (e.g. after switching formats), the more recently written one is read.
+Parquet needs pyarrow (see requirements.txt).
+"""
+
+from pathlib import Path
+import pandas as pd
+import structured_log as log
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+OUTPUT_DIR = Path("ml/output")
+FORMATS = ("parquet", "csv")
+DEFAULT_FORMAT = "parquet" if PYARROW_AVAILABLE else "csv"
+
+CATEGORICAL = "category"
+TIMESTAMP = "timestamp"
+DATE = "date"
+
+# Declared column types per table (columns not listed are written as inferred)
+SCHEMAS = {
+    "students": {
+        "id": "int64",
+        "name": "string",
+        "gender": CATEGORICAL,
+        "dob": DATE,
+        "image_url": "string",
+        "description": "string",
+        "analysis": "string",
+        "level": CATEGORICAL,
+        "program": CATEGORICAL,
+        "created_at": TIMESTAMP,
+        "cgpa": "float64",
+        "programming_score": "float64",
+        "design_score": "float64",
+        "it_infrastructure_score": "float64",
+        "co_curricular_points": "float64",
+        "github_url": "string",
+        "linkedin_url": "string",
+        "portfolio_url": "string",
+        "last_summary_updated": TIMESTAMP,
+        "feedback_sentiment_score": "float64",
+        "professional_engagement_score": "float64",
+    },
+    "courses": {
+        "id": "int64",
+        "student_id": "int64",
+        "course_name": "string",
+        "course_code": CATEGORICAL,
+        "course_description": "string",
+        "grade": CATEGORICAL,
+        "credit_hour": "float64",
+        "score": "float64",
+        "created_at": TIMESTAMP,
+    },
+    "student_comments": {
+        "id": "int64",
+        "student_id": "int64",
+        "commenter_id": "string",
+        "commenter_name": "string",
+        "content": "string",
+        "created_at": TIMESTAMP,
+    },
+}
+
+# CSV dtypes for the same schema (timestamps are parsed separately)
+_CSV_DTYPES = {"int64": "Int64", "float64": "float64", "string": "object", CATEGORICAL: "category"}
+
+
+def dataset_path(table: str, fmt: str = DEFAULT_FORMAT, output_dir: Path = OUTPUT_DIR) -> Path:
+    return Path(output_dir) / f"{table}.{fmt}"
+
+
+def find_dataset(table: str, output_dir: Path = OUTPUT_DIR) -> Path:
+    """Existing file for a table; if both formats exist, the most recently modified (Parquet on ties)"""
+    candidates = [
+        path for fmt in FORMATS
+        if (path := dataset_path(table, fmt, output_dir)).exists() and (fmt != "parquet" or PYARROW_AVAILABLE)
+    ]
+    if not candidates:
+        raise FileNotFoundError(f"No {table}.parquet or {table}.csv in {output_dir}")
+    # max() keeps the first of equal mtimes, and FORMATS lists Parquet first
+    path = max(candidates, key=lambda p: p.stat().st_mtime)
+    if len(candidates) > 1:
+        log.info("dataset_selected", table=table, path=str(path),
+                 ignored=[str(p) for p in candidates if p != path])
+    else:
+        log.debug("dataset_selected", table=table, path=str(path))
+    return path
+
+
+def conform(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    """Cast a frame to the declared column types of `table`"""
+    df = df.copy()
+    for col, kind in SCHEMAS.get(table, {}).items():
+        if col not in df.columns:
+            continue
+        if kind == TIMESTAMP:
+            df[col] = pd.to_datetime(df[col], utc=True, errors="coerce", format="mixed")
+        elif kind == DATE:
+            df[col] = pd.to_datetime(df[col], errors="coerce").dt.date
+        elif kind == CATEGORICAL:
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype("string").astype("category")
+        elif kind == "string" and isinstance(df[col].dtype, pd.CategoricalDtype):
+            # str categories: expand to the plain str/None objects below without a per-row check
+            df[col] = df[col].astype(object).where(df[col].notna(), None)
+        elif kind == "string":
+            # Plain str/None objects (a pandas StringDtype would come back with pd.NA on read)
+            df[col] = df[col].astype(object).where(df[col].notna(), None).map(
+                lambda v: v if v is None or isinstance(v, str) else str(v))
+        elif kind == "int64":
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+        else:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(kind)
+    return df
+
+
+def write_table(df: pd.DataFrame, table: str, fmt: str = DEFAULT_FORMAT, output_dir: Path = OUTPUT_DIR) -> Path:
+    """Write a table as Parquet (declared schema) or CSV; returns the path"""
+    path = dataset_path(table, fmt, output_dir)
+    if fmt == "parquet":
+        if not PYARROW_AVAILABLE:
+            raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow) or use --format csv")
+        pq.write_table(pa.Table.from_pandas(conform(df, table), preserve_index=False), path)
+    elif fmt == "csv":
+        df.to_csv(path, index=False)
+    else:
+        raise ValueError(f"Unknown dataset format: {fmt}")
+    return path
+
+
+class TableWriter:
+    """
+    Append DataFrame chunks to one table file (Parquet row groups or CSV rows),
+    so a large table is written without ever being held in memory whole.
+    """
+
+    def __init__(self, table: str, fmt: str = DEFAULT_FORMAT, output_dir: Path = OUTPUT_DIR):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown dataset format: {fmt}")
+        if fmt == "parquet" and not PYARROW_AVAILABLE:
+            raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow) or use --format csv")
+        self.table = table
+        self.fmt = fmt
+        self.path = dataset_path(table, fmt, output_dir)
+        self.rows = 0
+        self._writer = None
+
+    def write(self, df: pd.DataFrame):
+        if self.fmt == "csv":
+            df.to_csv(self.path, mode="w" if self.rows == 0 else "a", header=self.rows == 0, index=False)
+        else:
+            chunk = pa.Table.from_pandas(conform(df, self.table), preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, chunk.schema)
+            self._writer.write_table(chunk.cast(self._writer.schema))
+        self.rows += len(df)
+
+    def close(self) -> Path:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_file(path, table: str | None = None, columns: list | None = None, **csv_kwargs) -> pd.DataFrame:
+    """Read one Parquet or CSV table file, optionally projecting `columns`"""
+    path = Path(path)
+    if path.suffix == ".parquet":
+        if columns is not None:
+            available = set(pq.read_schema(path).names)
+            columns = [c for c in columns if c in available]
+        return pd.read_parquet(path, columns=columns)
+
+    schema = SCHEMAS.get(table or path.stem, {})
+    usecols = (lambda c: c in set(columns)) if columns is not None else None
+    dtypes = {col: _CSV_DTYPES[kind] for col, kind in schema.items() if kind in _CSV_DTYPES}
+    return pd.read_csv(path, usecols=usecols, dtype=dtypes, **csv_kwargs)
+
+
+def read_table(table: str, columns: list | None = None, output_dir: Path = OUTPUT_DIR, **csv_kwargs) -> pd.DataFrame:
+    """Read a dataset table (Parquet if present, else CSV) with optional column projection"""
+    return read_file(find_dataset(table, output_dir), table, columns, **csv_kwargs)
+
+
+def iter_table(table: str, columns: list, chunk_rows: int, output_dir: Path = OUTPUT_DIR, **csv_kwargs):
+    """Yield a table in DataFrame chunks of at most `chunk_rows` rows (projected to `columns`)"""
+    path = find_dataset(table, output_dir)
+    if path.suffix == ".parquet":
+        parquet = pq.ParquetFile(path)
+        columns = [c for c in columns if c in parquet.schema_arrow.names]
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+        return
+
+    schema = SCHEMAS.get(table, {})
+    dtypes = {col: _CSV_DTYPES[schema[col]] for col in columns if schema.get(col) in _CSV_DTYPES}
+    yield from pd.read_csv(path, usecols=lambda c: c in set(columns), dtype=dtypes,
+                           chunksize=chunk_rows, **csv_kwargs)
+
+
+def plain_values(df: pd.DataFrame) -> pd.DataFrame:
+    """Object frame of JSON-friendly values (ISO strings for timestamps/dates, None for missing)"""
+    df = df.copy()
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.DatetimeTZDtype) or pd.api.types.is_datetime64_any_dtype(series):
+            df[col] = series.map(lambda v: v.isoformat() if pd.notna(v) else None)
+        elif series.dtype == object:
+            df[col] = series.map(lambda v: v.isoformat() if hasattr(v, "isoformat") else v)
+    df = df.astype(object)
+    return df.where(df.notna(), None)
@@ -2,13 +2,37 @@
 """
 Export actual data from Supabase for ML training.
 This exports real student data with AI-analyzed scores.
+
+Tables are written as Parquet by default (see dataset_io.py); pass
+`--format csv` for CSV files.
+
+The export is paginated and incremental:
+
+- rows are read in keyset pages (`id > last_id ORDER BY id LIMIT n`), so no
+  PostgREST row limit is hit and no OFFSET scan grows with the table
+- the tables are fetched concurrently over one pooled connection set
+- every page is spooled to ml/output/.export/<table>/ as it arrives, so
+  memory holds one page and an interrupted run resumes from its last page
+- ml/output/export_state.json keeps a watermark per table (highest id, latest
+  created_at); later runs only pull rows past it and merge them into the
+  existing tables (rows with the same id are replaced)
+
+courses and student_comments have no updated-at column, so edits/deletes of
+existing rows are only picked up by a `--full` export. students is small and
+its scores change in place, so it is re-read in full every run.
 """
 
 import os
+import sys
+import json
+import time
+import shutil
+import asyncio
 import pandas as pd
 from pathlib import Path
 from dotenv import load_dotenv
-from supabase import create_client
+from data_access import SupabaseDataClient
+from dataset_io import write_table, read_file, dataset_path, DEFAULT_FORMAT, FORMATS
 
 # Load environment variables
 load_dotenv(dotenv_path="ml/.env")
@@ -16,83 +40,212 @@ load_dotenv(dotenv_path="ml/.env")
 # Configuration
 OUTPUT_DIR = Path("ml/output")
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+STATE_PATH = OUTPUT_DIR / "export_state.json"
+SPOOL_DIR = OUTPUT_DIR / ".export"
+PAGE_SIZE = int(os.environ.get("EXPORT_PAGE_SIZE", 1000))
+
+# incremental: only rows past the watermark are fetched on later runs
+# changed_column: optional updated-at style column whose newer values are also re-fetched
+EXPORT_TABLES = {
+    "students": {"incremental": False, "changed_column": None},
+    "courses": {"incremental": True, "changed_column": None},
+    "student_comments": {"incremental": True, "changed_column": None},
+}
+
+
+def load_state() -> dict:
+    try:
+        with open(STATE_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_state(state: dict):
+    tmp_path = f"{STATE_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, STATE_PATH)
+
+
+def _latest(values: pd.Series, current: str | None) -> str | None:
+    """Latest timestamp among `values` and the `current` watermark (ISO 8601)"""
+    stamps = pd.to_datetime(values.dropna(), utc=True, errors="coerce", format="mixed").dropna()
+    if current:
+        stamps = pd.concat([stamps, pd.Series([pd.Timestamp(current)])])
+    return stamps.max().isoformat() if not stamps.empty else current
+
+
+class TableExport:
+    """Keyset-paginated download of one table into spool files"""
+
+    def __init__(self, table: str, fmt: str, state: dict, full: bool):
+        self.table = table
+        self.fmt = fmt
+        self.config = EXPORT_TABLES[table]
+        self.state = state.setdefault(table, {})
+        self.spool = SPOOL_DIR / table
+        self.rows = 0
+        self.seconds = 0.0
+
+        run = self.state.get("run")
+        if run is None or run.get("format") != fmt or run.get("full") != full:
+            # New run: freeze the watermark this run reads past
+            # (a missing table or a format switch needs a full export to merge into)
+            incremental = (self.config["incremental"] and not full and self.state.get("format") == fmt
+                           and dataset_path(table, fmt, OUTPUT_DIR).exists())
+            watermark = self.state.get("watermark", {}) if incremental else {}
+            run = {"format": fmt, "full": full, "since": watermark, "cursor": None, "parts": 0, "done": False}
+            shutil.rmtree(self.spool, ignore_errors=True)
+        elif not run.get("done"):
+            print(f"↻ Resuming {self.table} export after id {run['cursor']} ({run['parts']} pages spooled)")
+        self.run = run
+        self.state["run"] = run
+
+    def filters(self) -> dict:
+        filters = {}
+        if self.run["cursor"] is not None:
+            filters["id"] = f"gt.{self.run['cursor']}"
+        since = self.run["since"]
+        changed = self.config["changed_column"]
+        if since.get("id") is not None:
+            if changed and since.get("changed"):
+                filters["or"] = f'(id.gt.{since["id"]},{changed}.gt."{since["changed"]}")'
+            elif self.run["cursor"] is None or self.run["cursor"] < since["id"]:
+                filters["id"] = f"gt.{since['id']}"
+        return filters
+
+    async def fetch(self, client: SupabaseDataClient, on_page):
+        start = time.perf_counter()
+        self.spool.mkdir(parents=True, exist_ok=True)
+        while not self.run["done"]:
+            page = await client.select(self.table, "*", self.filters(), limit=PAGE_SIZE)
+            if page:
+                on_page(self, page)
+            if len(page) < PAGE_SIZE:
+                self.run["done"] = True
+                on_page(self, None)
+        self.seconds = time.perf_counter() - start
 
-def export_from_supabase():
-    """Export data from Supabase to CSV files."""
+    def write_page(self, page: list):
+        """Spool one page and advance the cursor (persisted so the run can resume)"""
+        self.run["parts"] += 1
+        part = self.spool / f"part-{self.run['parts']:06d}"
+        write_table(pd.DataFrame(page), self.table, self.fmt, part.parent)
+        os.replace(dataset_path(self.table, self.fmt, part.parent), f"{part}.{self.fmt}")
+        self.run["cursor"] = page[-1]["id"]
+        self.rows += len(page)
+
+    def merge(self) -> pd.DataFrame:
+        """Merge the spooled pages into the existing table (same id = replaced) and advance the watermark"""
+        parts = sorted(self.spool.glob(f"part-*.{self.fmt}"))
+        new = [read_file(p, self.table) for p in parts]
+        target = dataset_path(self.table, self.fmt, OUTPUT_DIR)
+
+        frames = []
+        if self.run["since"] and target.exists():
+            frames.append(read_file(target, self.table))
+        frames.extend(new)
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        if new and not df.empty:
+            df = df.drop_duplicates("id", keep="last").sort_values("id", ignore_index=True)
+            # Write next to the target and swap in, so a crash never leaves a partial table
+            tmp_dir = SPOOL_DIR / "tmp"
+            tmp_dir.mkdir(parents=True, exist_ok=True)
+            os.replace(write_table(df, self.table, self.fmt, tmp_dir), target)
+
+        watermark = dict(self.run["since"])
+        for page in new:
+            if page.empty:
+                continue
+            watermark["id"] = max(int(page["id"].max()), watermark.get("id") or 0)
+            if "created_at" in page:
+                watermark["created_at"] = _latest(page["created_at"], watermark.get("created_at"))
+            changed = self.config["changed_column"]
+            if changed and changed in page:
+                watermark["changed"] = _latest(page[changed], watermark.get("changed"))
+        self.state["watermark"] = watermark
+        self.state["format"] = self.fmt
+        self.state["exported_at"] = pd.Timestamp.now(tz="UTC").isoformat()
+        self.state.pop("run", None)
+        shutil.rmtree(self.spool, ignore_errors=True)
+        return df
+
+
+async def _fetch_tables(exports: list, url: str, key: str, state: dict):
+    def on_page(export: TableExport, page):
+        if page is not None:
+            export.write_page(page)
+        save_state(state)
+
+    async with SupabaseDataClient(url, key) as client:
+        await asyncio.gather(*(export.fetch(client, on_page) for export in exports))
+
+
+def export_from_supabase(fmt=DEFAULT_FORMAT, full=False):
+    """Export data from Supabase to Parquet (default) or CSV files; returns the row count per table."""
     url = os.environ.get("SUPABASE_URL")
     key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
-    
+
     if not url or not key:
         raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set in ml/.env")
-    
+
     print("Connecting to Supabase...")
-    supabase = create_client(url, key)
-    
-    # Export students
-    print("Exporting students...")
-    students_response = supabase.table("students").select("*").execute()
-    students_data = students_response.data
-    print(f"Found {len(students_data)} students")
-    
-    # Export courses
-    print("Exporting courses...")
-    courses_response = supabase.table("courses").select("*").execute()
-    courses_data = courses_response.data
-    print(f"Found {len(courses_data)} courses")
-    
-    # Export comments (excluding deleted ones for stats)
-    print("Exporting comments...")
-    comments_response = supabase.table("student_comments").select("*").execute()
-    comments_data = comments_response.data
-    print(f"Found {len(comments_data)} comments")
-    
-    # Convert to DataFrames
-    df_students = pd.DataFrame(students_data)
-    df_courses = pd.DataFrame(courses_data)
-    df_comments = pd.DataFrame(comments_data) if comments_data else pd.DataFrame()
-    
-    # Save to CSV
-    students_path = OUTPUT_DIR / "students.csv"
-    courses_path = OUTPUT_DIR / "courses.csv"
-    comments_path = OUTPUT_DIR / "student_comments.csv"
-    
-    df_students.to_csv(students_path, index=False)
-    print(f"✅ Saved: {students_path}")
-    
-    df_courses.to_csv(courses_path, index=False)
-    print(f"✅ Saved: {courses_path}")
-    
-    if not df_comments.empty:
-        df_comments.to_csv(comments_path, index=False)
-        print(f"✅ Saved: {comments_path}")
-    else:
-        print("⚠️ No comments to export")
-    
+    state = load_state()
+    exports = [TableExport(table, fmt, state, full) for table in EXPORT_TABLES]
+    save_state(state)
+
+    # Fetch all tables concurrently; pages are spooled to disk as they arrive
+    print(f"Exporting {', '.join(EXPORT_TABLES)} ({'full' if full else 'incremental'}, {PAGE_SIZE} rows/page)...")
+    asyncio.run(_fetch_tables(exports, url, key, state))
+
+    tables = {}
+    for export in exports:
+        rate = export.rows / export.seconds if export.seconds > 0 else 0.0
+        print(f"Fetched {export.rows} {export.table} rows in {export.seconds:.2f}s ({rate:,.0f} rows/sec)")
+        df = export.merge()
+        save_state(state)
+        tables[export.table] = df
+        if df.empty:
+            print(f"⚠️ No {export.table} to export")
+        else:
+            print(f"✅ Saved: {dataset_path(export.table, fmt, OUTPUT_DIR)} ({len(df)} rows)")
+
+    df_students = tables["students"]
+    df_courses = tables["courses"]
+    df_comments = tables["student_comments"]
+
     # Display summary statistics
     print("\n📊 Data Summary:")
     print(f"Total Students: {len(df_students)}")
     print(f"Total Courses: {len(df_courses)}")
     print(f"Total Comments: {len(df_comments)}")
-    
+
     if not df_students.empty:
         # Show how many students have AI-analyzed scores
         has_feedback = df_students['feedback_sentiment_score'].notna().sum()
         has_engagement = df_students['professional_engagement_score'].notna().sum()
-        
+
         print(f"\nAI-Analyzed Scores:")
         print(f"  - Feedback Sentiment: {has_feedback} students")
         print(f"  - Professional Engagement: {has_engagement} students")
-        
+
         if has_feedback > 0:
             avg_sentiment = df_students['feedback_sentiment_score'].mean()
             print(f"  - Average Feedback Sentiment: {avg_sentiment:.2f}")
-    
+
     print("\n✅ Export complete! Ready for ML training.")
     print("Next step: Run 'python train_and_upload.py' to train the model")
+    return {table: len(df) for table, df in tables.items()}
 
 if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser()
+    p.add_argument("--format", choices=FORMATS, default=DEFAULT_FORMAT, help="Output file format")
+    p.add_argument("--full", action="store_true", help="Ignore watermarks and re-export every row")
+    args = p.parse_args()
     try:
-        export_from_supabase()
+        export_from_supabase(fmt=args.format, full=args.full)
     except Exception as e:
         print(f"❌ Export failed: {e}")
-        exit(1)
+        sys.exit(1)
@@ -0,0 +1,489 @@
+# ml/feature_store.py
+"""
+Materialized per-student feature store, maintained incrementally.
+
+Prediction used to rebuild features from a student's full transcript, and
+training re-read and re-aggregated every CSV. The store keeps, per student,
+the running sums and counts behind both feature sets:
+
+- the build_features() extended dict (overall / domain / level GPAs and counts,
+  comment count and length)
+- the build_training_df() aggregates (all-course units and count, training-scale
+  GPA, comments excluding "[Comment deleted]")
+- co-curricular activity totals and the profile URLs / AI label scores
+
+Every source row's contribution is stored next to the aggregates, so an
+INSERT / UPDATE / DELETE of one course, comment or activity subtracts the old
+contribution and adds the new one: the cost of an update is the size of the
+change, not the size of the history. GPAs are derived on read from the sums.
+
+Sums are kept as integers (grade points, credit hours and activity scores in
+hundredths) so repeated add/subtract never drifts.
+
+Usage:
+    python feature_store.py rebuild            # from Supabase
+    python feature_store.py rebuild --local    # from ml/output (Parquet or CSV)
+    python feature_store.py show 1276
+"""
+
+import os
+import sys
+import json
+import asyncio
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+from course_features import (
+    DOMAINS, LEVELS, DEFAULT_FEATURES, MODEL_FEATURES, TRAINING_GRADE_POINTS,
+    categorize_courses, grade_points,
+)
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+FEATURE_STORE_PATH = os.environ.get("FEATURE_STORE_PATH", os.path.join(SCRIPT_DIR, "feature_store.sqlite3"))
+
+DELETED_COMMENT = "[Comment deleted]"
+# Fixed-point scale for grade points, credit hours and activity scores
+SCALE = 100
+
+# Aggregate columns per source table (each is a plain integer sum)
+COURSE_COLUMNS = [
+    "num_courses", "units", "graded", "gp",
+    *[f"{group}_{kind}" for group in DOMAINS + list(LEVELS) for kind in ("n", "gp")],
+    "train_graded", "train_gp",
+]
+COMMENT_COLUMNS = ["comments_count", "comments_len", "train_comments_count", "train_comments_len"]
+ACTIVITY_COLUMNS = ["activity_count", "impact", "leadership", "relevance"]
+
+SOURCES = {
+    "courses": COURSE_COLUMNS,
+    "student_comments": COMMENT_COLUMNS,
+    "cocurricular_activities": ACTIVITY_COLUMNS,
+}
+AGG_COLUMNS = COURSE_COLUMNS + COMMENT_COLUMNS + ACTIVITY_COLUMNS
+PROFILE_COLUMNS = [
+    "github_url", "linkedin_url", "portfolio_url",
+    "feedback_sentiment_score", "professional_engagement_score",
+]
+# Fields an INSERT / UPDATE event record must carry, per table (ids must be integers)
+REQUIRED_FIELDS = {
+    "students": ["id"],
+    "courses": ["id", "student_id", "grade", "credit_hour"],
+    "student_comments": ["id", "student_id"],
+    "cocurricular_activities": ["id", "student_id"],
+}
+
+
+def _fixed(values) -> np.ndarray:
+    return np.round(pd.to_numeric(values, errors="coerce").fillna(0).to_numpy(dtype=np.float64) * SCALE).astype(np.int64)
+
+
+def course_contributions(df_courses: pd.DataFrame) -> pd.DataFrame:
+    """Per-row aggregate contributions for a courses frame (columns: id, student_id, COURSE_COLUMNS)"""
+    courses = df_courses[["id", "student_id"]].copy()
+    cats = categorize_courses(df_courses[[c for c in ("course_code", "course_name") if c in df_courses]].copy())
+    gp = grade_points(df_courses["grade"])
+    graded = gp.notna().to_numpy()
+    gp_fixed = _fixed(gp)
+
+    courses["num_courses"] = 1
+    courses["units"] = _fixed(df_courses["credit_hour"])
+    courses["graded"] = graded.astype(np.int64)
+    courses["gp"] = gp_fixed
+
+    groups = {domain: cats[f"is_{domain}"].to_numpy() for domain in DOMAINS}
+    groups.update({level: cats["level"].to_numpy() == code for level, code in LEVELS.items()})
+    for group, mask in groups.items():
+        in_group = mask & graded
+        courses[f"{group}_n"] = in_group.astype(np.int64)
+        courses[f"{group}_gp"] = np.where(in_group, gp_fixed, 0)
+
+    train_gp = df_courses["grade"].astype(object).fillna("").str.upper().str.strip().map(TRAINING_GRADE_POINTS)
+    courses["train_graded"] = train_gp.notna().astype(np.int64).to_numpy()
+    courses["train_gp"] = _fixed(train_gp)
+    return courses
+
+
+def comment_contributions(df_comments: pd.DataFrame) -> pd.DataFrame:
+    comments = df_comments[["id", "student_id"]].copy()
+    content = df_comments["content"] if "content" in df_comments else pd.Series([None] * len(df_comments), index=df_comments.index)
+    length = content.astype(object).fillna("").astype(str).str.len().to_numpy(dtype=np.int64)
+    active = (content != DELETED_COMMENT).to_numpy()
+    comments["comments_count"] = 1
+    comments["comments_len"] = length
+    comments["train_comments_count"] = active.astype(np.int64)
+    comments["train_comments_len"] = np.where(active, length, 0)
+    return comments
+
+
+def activity_contributions(df_activities: pd.DataFrame) -> pd.DataFrame:
+    activities = df_activities[["id", "student_id"]].copy()
+    activities["activity_count"] = 1
+    for col, source in (("impact", "ai_impact_score"), ("leadership", "ai_leadership_score"),
+                        ("relevance", "ai_relevance_score")):
+        activities[col] = _fixed(df_activities[source]) if source in df_activities else 0
+    return activities
+
+
+CONTRIBUTIONS = {
+    "courses": course_contributions,
+    "student_comments": comment_contributions,
+    "cocurricular_activities": activity_contributions,
+}
+
+
+class FeatureStore:
+    def __init__(self, path: str = FEATURE_STORE_PATH):
+        self.path = path
+        self.events = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        for source, columns in SOURCES.items():
+            cols = ", ".join(f"{c} INTEGER NOT NULL DEFAULT 0" for c in columns)
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS contrib_{source} ("
+                f" row_id INTEGER PRIMARY KEY, student_id INTEGER NOT NULL, {cols})"
+            )
+        cols = ", ".join(f"{c} INTEGER NOT NULL DEFAULT 0" for c in AGG_COLUMNS)
+        self._db.execute(f"CREATE TABLE IF NOT EXISTS student_features (student_id INTEGER PRIMARY KEY, {cols})")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS student_profile ("
+            " student_id INTEGER PRIMARY KEY, github_url TEXT, linkedin_url TEXT, portfolio_url TEXT,"
+            " feedback_sentiment_score REAL, professional_engagement_score REAL)"
+        )
+        # Change sequence per student, so incremental learners can read only what changed
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS student_changes (student_id INTEGER PRIMARY KEY, seq INTEGER NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS student_changes_seq ON student_changes (seq)")
+        self._db.commit()
+        self.seq = self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM student_changes").fetchone()[0]
+
+    # ── Incremental updates ────────────────────────────────────────────
+
+    def _touch(self, student_ids):
+        self.seq += 1
+        self._db.executemany(
+            "INSERT OR REPLACE INTO student_changes (student_id, seq) VALUES (?, ?)",
+            [(int(s), self.seq) for s in student_ids]
+        )
+
+    def _add(self, student_id: int, columns: list, values: list, sign: int):
+        self._touch([student_id])
+        assignments = ", ".join(f"{c} = {c} + excluded.{c}" for c in columns)
+        self._db.execute(
+            f"INSERT INTO student_features (student_id, {', '.join(columns)})"
+            f" VALUES (?, {', '.join('?' * len(columns))})"
+            f" ON CONFLICT(student_id) DO UPDATE SET {assignments}",
+            [student_id, *(sign * int(v) for v in values)]
+        )
+
+    def _apply_row(self, source: str, row_id: int, contribution: dict | None):
+        """Replace the stored contribution of one source row (None = row deleted)"""
+        columns = SOURCES[source]
+        old = self._db.execute(
+            f"SELECT student_id, {', '.join(columns)} FROM contrib_{source} WHERE row_id = ?", (row_id,)
+        ).fetchone()
+        if old is not None:
+            self._add(old[0], columns, old[1:], -1)
+            self._db.execute(f"DELETE FROM contrib_{source} WHERE row_id = ?", (row_id,))
+        if contribution is not None:
+            values = [int(contribution[c]) for c in columns]
+            self._db.execute(
+                f"INSERT INTO contrib_{source} (row_id, student_id, {', '.join(columns)})"
+                f" VALUES (?, ?, {', '.join('?' * len(columns))})",
+                [row_id, int(contribution["student_id"]), *values]
+            )
+            self._add(int(contribution["student_id"]), columns, values, 1)
+
+    def upsert_rows(self, source: str, records: list):
+        """Insert or update source rows (dicts shaped like the Supabase table)"""
+        if not records:
+            return
+        contributions = CONTRIBUTIONS[source](pd.DataFrame(records)).to_dict("records")
+        with self._lock:
+            for contribution in contributions:
+                self._apply_row(source, int(contribution["id"]), contribution)
+            self._db.commit()
+            self.events += len(contributions)
+
+    def delete_rows(self, source: str, row_ids: list):
+        with self._lock:
+            for row_id in row_ids:
+                self._apply_row(source, int(row_id), None)
+            self._db.commit()
+            self.events += len(row_ids)
+
+    def upsert_students(self, records: list):
+        with self._lock:
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO student_profile (student_id, {', '.join(PROFILE_COLUMNS)})"
+                f" VALUES (?, {', '.join('?' * len(PROFILE_COLUMNS))})",
+                [[int(r["id"]), *(None if pd.isna(r.get(c)) else r.get(c) for c in PROFILE_COLUMNS)] for r in records]
+            )
+            self._touch(r["id"] for r in records)
+            self._db.commit()
+            self.events += len(records)
+
+    def delete_students(self, student_ids: list):
+        """Remove every stored row of the students: profile, aggregates, row contributions and change log"""
+        ids = [(int(s),) for s in student_ids]
+        with self._lock:
+            for table in ["student_profile", "student_features", "student_changes",
+                          *(f"contrib_{source}" for source in SOURCES)]:
+                self._db.executemany(f"DELETE FROM {table} WHERE student_id = ?", ids)
+            self._db.commit()
+            self.events += len(student_ids)
+
+    def apply_event(self, event: dict):
+        """
+        Apply one Supabase database-webhook payload:
+        {"type": "INSERT" | "UPDATE" | "DELETE", "table": ..., "record": {...}, "old_record": {...}}
+        """
+        table, kind = event.get("table"), str(event.get("type", "")).upper()
+        record, old_record = event.get("record"), event.get("old_record")
+        if table != "students" and table not in SOURCES:
+            raise ValueError(f"Unsupported table for feature store event: {table}")
+        if kind not in ("INSERT", "UPDATE", "DELETE"):
+            raise ValueError(f"Unsupported event type: {kind}")
+        if kind != "DELETE":
+            self._validate_record(table, record)
+
+        if kind == "DELETE":
+            row = old_record or record
+            row_id = row.get("id") if isinstance(row, dict) else None
+            if row_id is None:
+                raise ValueError("DELETE event without a row id")
+            self._check_id(table, "id", row_id)
+            if table == "students":
+                self.delete_students([row_id])
+            else:
+                self.delete_rows(table, [row_id])
+        elif table == "students":
+            self.upsert_students([record])
+        else:
+            self.upsert_rows(table, [record])
+
+    @staticmethod
+    def _validate_record(table: str, record):
+        if not isinstance(record, dict):
+            raise ValueError(f"{table} event without a record")
+        missing = [field for field in REQUIRED_FIELDS[table] if field not in record]
+        if missing:
+            raise ValueError(f"{table} record is missing {', '.join(missing)}")
+        for field in ("id", "student_id"):
+            if field in record:
+                FeatureStore._check_id(table, field, record[field])
+
+    @staticmethod
+    def _check_id(table: str, field: str, value):
+        if isinstance(value, bool) or not isinstance(value, (int, str)) or not str(value).strip().isdigit():
+            raise ValueError(f"{table} record has a non-integer {field}: {value!r}")
+
+    # ── Full rebuild ───────────────────────────────────────────────────
+
+    def rebuild(self, students: pd.DataFrame, sources: dict):
+        """
+        Replace the store contents from full tables.
+        `sources` maps table name (courses / student_comments / cocurricular_activities) to a DataFrame.
+        """
+        with self._lock:
+            self._db.execute("DELETE FROM student_features")
+            self._db.execute("DELETE FROM student_profile")
+            totals = []
+            for source, columns in SOURCES.items():
+                self._db.execute(f"DELETE FROM contrib_{source}")
+                df = sources.get(source)
+                if df is None or df.empty:
+                    continue
+                contrib = CONTRIBUTIONS[source](df)[["id", "student_id", *columns]].astype(np.int64)
+                self._db.executemany(
+                    f"INSERT OR REPLACE INTO contrib_{source} (row_id, student_id, {', '.join(columns)})"
+                    f" VALUES (?, ?, {', '.join('?' * len(columns))})",
+                    contrib.itertuples(index=False, name=None)
+                )
+                # Later duplicates of a row id replace earlier ones, as in the table above
+                totals.append(contrib.drop_duplicates("id", keep="last").groupby("student_id")[columns].sum())
+
+            if totals:
+                agg = pd.concat(totals, axis=1).reindex(columns=AGG_COLUMNS).fillna(0).astype(np.int64)
+                self._db.executemany(
+                    f"INSERT INTO student_features (student_id, {', '.join(AGG_COLUMNS)})"
+                    f" VALUES (?, {', '.join('?' * len(AGG_COLUMNS))})",
+                    agg.reset_index().itertuples(index=False, name=None)
+                )
+
+            profile = students.reindex(columns=["id", *PROFILE_COLUMNS])
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO student_profile (student_id, {', '.join(PROFILE_COLUMNS)})"
+                f" VALUES (?, {', '.join('?' * len(PROFILE_COLUMNS))})",
+                [[int(r[0]), *(None if pd.isna(v) else v for v in r[1:])]
+                 for r in profile.itertuples(index=False, name=None)]
+            )
+            self._db.execute("DELETE FROM student_changes")
+            self._touch(profile["id"])
+            self._db.commit()
+
+    # ── Reads ──────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _extended(agg: dict) -> dict:
+        """Same semantics as course_features.build_features_bulk()"""
+        features = dict(DEFAULT_FEATURES)
+        if agg["graded"] > 0:
+            features["total_units"] = agg["units"] / SCALE
+            features["avg_grade_point"] = agg["gp"] / SCALE / agg["graded"]
+            features["num_courses"] = agg["num_courses"]
+            for group in DOMAINS + list(LEVELS):
+                n = agg[f"{group}_n"]
+                if n > 0:
+                    features[f"{group}_gpa"] = agg[f"{group}_gp"] / SCALE / n
+                    features[f"{group}_courses"] = n
+        features["comments_count"] = agg["comments_count"]
+        features["comments_total_len"] = agg["comments_len"]
+        return features
+
+    def features(self, student_id: int) -> dict | None:
+        """
+        Return {"extended": build_features()-style dict, "activities": totals,
+        "profile": URLs / label scores} for a student, or None if the store does not know it.
+        """
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(AGG_COLUMNS)} FROM student_features WHERE student_id = ?", (student_id,)
+            ).fetchone()
+            profile = self._db.execute(
+                f"SELECT {', '.join(PROFILE_COLUMNS)} FROM student_profile WHERE student_id = ?", (student_id,)
+            ).fetchone()
+        if row is None and profile is None:
+            return None
+
+        agg = dict(zip(AGG_COLUMNS, row or [0] * len(AGG_COLUMNS)))
+        return {
+            "extended": self._extended(agg),
+            "activities": {
+                "count": agg["activity_count"],
+                "impact": agg["impact"] / SCALE,
+                "leadership": agg["leadership"] / SCALE,
+                "relevance": agg["relevance"] / SCALE,
+            },
+            "profile": dict(zip(PROFILE_COLUMNS, profile or [None] * len(PROFILE_COLUMNS))),
+        }
+
+    def student_ids(self) -> list:
+        with self._lock:
+            return [sid for (sid,) in self._db.execute("SELECT student_id FROM student_profile ORDER BY student_id")]
+
+    _TRAINING_QUERY = (
+        "SELECT p.student_id AS id, p.feedback_sentiment_score, p.professional_engagement_score, "
+        "COALESCE(f.units, 0) AS units, COALESCE(f.num_courses, 0) AS num_courses, "
+        "COALESCE(f.train_graded, 0) AS train_graded, COALESCE(f.train_gp, 0) AS train_gp, "
+        "COALESCE(f.train_comments_count, 0) AS comments_count, "
+        "COALESCE(f.train_comments_len, 0) AS comments_total_len "
+        "FROM student_profile p LEFT JOIN student_features f ON f.student_id = p.student_id "
+    )
+
+    @staticmethod
+    def _training_columns(df: pd.DataFrame) -> pd.DataFrame:
+        df["total_units"] = df["units"] / SCALE
+        df["avg_grade_point"] = np.where(df["train_graded"] > 0, df["train_gp"] / SCALE / df["train_graded"].clip(lower=1), 0.0)
+        return df.set_index("id")[MODEL_FEATURES + ["feedback_sentiment_score", "professional_engagement_score"]]
+
+    def training_frame(self) -> pd.DataFrame:
+        """
+        build_training_df() inputs for every student in the store: the model
+        feature columns plus the AI label scores, indexed by student id.
+        """
+        with self._lock:
+            df = pd.read_sql_query(self._TRAINING_QUERY + "ORDER BY p.student_id", self._db)
+        return self._training_columns(df)
+
+    def iter_training_frames(self, batch_rows: int, since: int = 0):
+        """
+        training_frame() in pages of `batch_rows` students (keyset on student id), limited to
+        students changed after change sequence `since` (0 = all). Only one page is in memory.
+        """
+        last_id = None
+        while True:
+            joins, conditions, params = "", [], []
+            if since:
+                joins = "JOIN student_changes c ON c.student_id = p.student_id "
+                conditions.append("c.seq > ?")
+                params.append(since)
+            if last_id is not None:
+                conditions.append("p.student_id > ?")
+                params.append(last_id)
+            where = joins + (f"WHERE {' AND '.join(conditions)} " if conditions else "")
+            with self._lock:
+                df = pd.read_sql_query(
+                    self._TRAINING_QUERY + where + "ORDER BY p.student_id LIMIT ?", self._db,
+                    params=[*params, batch_rows]
+                )
+            if df.empty:
+                return
+            last_id = int(df["id"].iloc[-1])
+            yield self._training_columns(df)
+            if len(df) < batch_rows:
+                return
+
+    def stats(self) -> dict:
+        with self._lock:
+            (students,) = self._db.execute("SELECT COUNT(*) FROM student_profile").fetchone()
+            rows = {
+                source: self._db.execute(f"SELECT COUNT(*) FROM contrib_{source}").fetchone()[0]
+                for source in SOURCES
+            }
+        return {"students": students, "rows": rows, "events": self.events, "seq": self.seq}
+
+
+def load_sources_from_supabase():
+    """Fetch the full tables used by the store from Supabase"""
+    import data_access
+
+    async def fetch(client):
+        return await asyncio.gather(
+            client.select_all("students", "id," + ",".join(PROFILE_COLUMNS)),
+            client.select_all("courses", data_access.COURSE_COLUMNS),
+            client.select_all("student_comments", data_access.COMMENT_COLUMNS),
+            client.select_all("cocurricular_activities", data_access.ACTIVITY_COLUMNS),
+        )
+
+    students, courses, comments, activities = data_access.run(fetch)
+    return pd.DataFrame(students), {
+        "courses": pd.DataFrame(courses),
+        "student_comments": pd.DataFrame(comments),
+        "cocurricular_activities": pd.DataFrame(activities),
+    }
+
+
+def load_sources_from_files():
+    """Read the exported tables in ml/output (activities are not exported)"""
+    from train_and_upload import load_dataset
+    students, courses, comments = load_dataset({
+        "students": ["id", *PROFILE_COLUMNS],
+        "courses": ["id", "student_id", "course_code", "course_name", "grade", "credit_hour"],
+        "student_comments": ["id", "student_id", "content"],
+    })
+    return students, {"courses": courses, "student_comments": comments}
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description="Materialized student feature store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild = sub.add_parser("rebuild", help="Rebuild the store from full tables")
+    rebuild.add_argument("--local", action="store_true", help="Read the ml/output tables instead of Supabase")
+    show = sub.add_parser("show", help="Print the stored features of one student")
+    show.add_argument("student_id", type=int)
+    args = parser.parse_args()
+
+    store = FeatureStore()
+    if args.command == "rebuild":
+        start = time.perf_counter()
+        students, sources = load_sources_from_files() if args.local else load_sources_from_supabase()
+        store.rebuild(students, sources)
+        print(f"✅ Feature store rebuilt in {time.perf_counter() - start:.2f}s: {store.stats()}", file=sys.stderr)
+    else:
+        print(json.dumps(store.features(args.student_id), indent=2))
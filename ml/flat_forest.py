@@ -0,0 +1,202 @@
+# ml/flat_forest.py
+"""
+Compact, memory-mappable export format for the random forest model.
+
+A fitted forest (MultiOutputRegressor of RandomForestRegressor, or a single
+multi-output RandomForestRegressor) is flattened into a few NumPy arrays that
+hold every node of every tree:
+
+    feature    int32    split feature per node (-1 for leaves)
+    threshold  float64  split threshold per node
+    left/right int32    global index of the child nodes
+    value      float64  leaf values (nodes x outputs per tree)
+    roots      int32    root node index per tree
+
+The arrays are written back-to-back (64-byte aligned) after a small JSON
+header into a single file. Loading maps the file read-only, so cold start is
+milliseconds and several worker processes share one copy of the pages.
+FlatForest.predict traverses all trees at once with NumPy and reproduces
+the sklearn predictions exactly.
+"""
+
+import os
+import json
+import struct
+import numpy as np
+import pandas as pd
+
+MAGIC = b"FLATFRST"
+FORMAT_VERSION = 1
+ALIGN = 64
+# Rows traversed per step (bounds the samples x trees working arrays)
+PREDICT_CHUNK_ROWS = 1024
+
+
+def _forests(model):
+    """Return [(estimator, first_output_column)] for the supported model types"""
+    if hasattr(model, "estimators_") and hasattr(model.estimators_[0], "estimators_"):
+        # MultiOutputRegressor: one single-output forest per target
+        return [(est, i) for i, est in enumerate(model.estimators_)]
+    if hasattr(model, "estimators_") and hasattr(model.estimators_[0], "tree_"):
+        # Native (multi-output) forest
+        return [(model, 0)]
+    raise TypeError(f"Unsupported model type for flat export: {type(model).__name__}")
+
+
+def export_forest(model, path: str):
+    """Flatten a fitted forest model into a memory-mappable file at `path` (written atomically)"""
+    forests = _forests(model)
+
+    feature, threshold, left, right, value, roots = [], [], [], [], [], []
+    forest_tree_start = [0]
+    forest_output = []
+    forest_width = []
+    offset = 0
+
+    for forest, output_col in forests:
+        width = forest.estimators_[0].tree_.value.shape[1]
+        for est in forest.estimators_:
+            tree = est.tree_
+            is_leaf = tree.children_left < 0
+            roots.append(offset)
+            feature.append(np.where(is_leaf, -1, tree.feature).astype(np.int32))
+            threshold.append(tree.threshold.astype(np.float64))
+            left.append(np.where(is_leaf, -1, tree.children_left + offset).astype(np.int32))
+            right.append(np.where(is_leaf, -1, tree.children_right + offset).astype(np.int32))
+            value.append(tree.value[:, :, 0].astype(np.float64))
+            offset += tree.node_count
+        forest_tree_start.append(len(roots))
+        forest_output.append(output_col)
+        forest_width.append(width)
+
+    if len(set(forest_width)) != 1:
+        raise ValueError("All forests must have the same number of outputs per tree")
+
+    arrays = {
+        "feature": np.concatenate(feature),
+        "threshold": np.concatenate(threshold),
+        "left": np.concatenate(left),
+        "right": np.concatenate(right),
+        "value": np.concatenate(value),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "forest_tree_start": np.asarray(forest_tree_start, dtype=np.int32),
+        "forest_output": np.asarray(forest_output, dtype=np.int32),
+    }
+
+    feature_names = getattr(model, "feature_names_in_", None)
+    header = {
+        "version": FORMAT_VERSION,
+        "n_features": int(getattr(model, "n_features_in_", forests[0][0].n_features_in_)),
+        "n_outputs": int(max(o + w for o, w in zip(forest_output, forest_width))),
+        "feature_names": [str(n) for n in feature_names] if feature_names is not None else None,
+        "arrays": {},
+    }
+
+    # Lay out arrays after the header, each aligned for direct memory mapping
+    header_room = 4096
+    while True:
+        pos = len(MAGIC) + 8 + header_room
+        layout = {}
+        for name, arr in arrays.items():
+            pos = (pos + ALIGN - 1) // ALIGN * ALIGN
+            layout[name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": pos}
+            pos += arr.nbytes
+        header["arrays"] = layout
+        header_bytes = json.dumps(header).encode("utf-8")
+        if len(header_bytes) <= header_room:
+            break
+        header_room *= 2
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", header_room))
+        f.write(header_bytes.ljust(header_room, b" "))
+        for name, arr in arrays.items():
+            f.seek(layout[name]["offset"])
+            f.write(np.ascontiguousarray(arr).tobytes())
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_forest(path: str) -> "FlatForest":
+    """Memory-map a flat forest file (read-only)"""
+    buf = np.memmap(path, dtype=np.uint8, mode="r")
+    if bytes(buf[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f"{path} is not a flat forest file")
+    (header_room,) = struct.unpack("<Q", bytes(buf[len(MAGIC):len(MAGIC) + 8]))
+    start = len(MAGIC) + 8
+    header = json.loads(bytes(buf[start:start + header_room]).decode("utf-8"))
+    if header["version"] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported flat forest version {header['version']}")
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"]))
+        arrays[name] = np.frombuffer(buf, dtype=dtype, count=count, offset=spec["offset"]).reshape(spec["shape"])
+
+    return FlatForest(header, arrays)
+
+
+class FlatForest:
+    """Predictor over the flattened arrays; drop-in for model.predict"""
+
+    def __init__(self, header: dict, arrays: dict):
+        self.n_features_in_ = header["n_features"]
+        self.n_outputs = header["n_outputs"]
+        names = header.get("feature_names")
+        self.feature_names_in_ = np.asarray(names, dtype=object) if names else None
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.forest_tree_start = arrays["forest_tree_start"]
+        self.forest_output = arrays["forest_output"]
+
+    def _validate(self, X) -> np.ndarray:
+        if isinstance(X, pd.DataFrame) and self.feature_names_in_ is not None:
+            X = X[list(self.feature_names_in_)]
+        # sklearn trees compare float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got shape {X.shape}")
+        if not np.isfinite(X).all():
+            raise ValueError("Input contains NaN or infinity")
+        return X.astype(np.float64)
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Leaf node index reached in every tree: (n_samples, n_trees)"""
+        n_samples, n_trees = X.shape[0], len(self.roots)
+        flat_X = X.ravel()
+        nodes = np.tile(self.roots, n_samples)
+        # Positions (sample, tree) still at an internal node; shrinks every level
+        active = np.arange(nodes.size)
+        base = (active // n_trees) * X.shape[1]
+        while active.size:
+            current = nodes[active]
+            feat = self.feature[current]
+            internal = feat >= 0
+            active, base, current, feat = active[internal], base[internal], current[internal], feat[internal]
+            go_left = flat_X[base + feat] <= self.threshold[current]
+            nodes[active] = np.where(go_left, self.left[current], self.right[current])
+        return nodes.reshape(n_samples, n_trees)
+
+    def predict(self, X) -> np.ndarray:
+        X = self._validate(X)
+        width = self.value.shape[1]
+        out = np.zeros((X.shape[0], self.n_outputs), dtype=np.float64)
+
+        for start in range(0, X.shape[0], PREDICT_CHUNK_ROWS):
+            chunk = X[start:start + PREDICT_CHUNK_ROWS]
+            leaf_values = self.value[self.apply(chunk)]  # (rows, trees, width)
+            for f in range(len(self.forest_output)):
+                first, last = self.forest_tree_start[f], self.forest_tree_start[f + 1]
+                # Sum trees in order (cumsum is sequential) to match sklearn's accumulation
+                total = np.cumsum(leaf_values[:, first:last], axis=1)[:, -1]
+                col = self.forest_output[f]
+                out[start:start + len(chunk), col:col + width] = total / (last - first)
+
+        return out
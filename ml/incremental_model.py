@@ -0,0 +1,169 @@
+# ml/incremental_model.py
+"""
+Incremental (out-of-core) model backend.
+
+The random forest is refitted from scratch on the whole training matrix every
+time train_and_upload.py runs. IncrementalModel is a linear model per target
+(SGDRegressor) updated with partial_fit on mini-batches, so
+
+- training streams the per-student rows in batches (from the feature store,
+  page by page, or from the ml/output tables) and never holds the full matrix
+- an update reads only the students the feature store saw change since the
+  last update (new or edited transcripts, comments, labels), applies one
+  partial_fit pass and saves the artifact, which a running API server then
+  hot-reloads (see model_registry.py)
+
+Features and targets are standardized with scalers fitted on the first
+training pass and then kept fixed, so later updates do not shift the scale
+the weights were learned on.
+
+Students whose id is a multiple of HOLDOUT_EVERY are never trained on; they
+are the evaluation set for both training and updates.
+
+Usage (through the trainer):
+    python train_and_upload.py --model sgd --source store [--compare-forest]
+    python train_and_upload.py --model sgd --update
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDRegressor
+from sklearn.multioutput import MultiOutputRegressor
+from sklearn.preprocessing import StandardScaler
+from course_features import MODEL_FEATURES
+
+BATCH_ROWS = 1000
+EPOCHS = 5
+HOLDOUT_EVERY = 5
+# Holdout rows kept in memory for evaluation
+EVAL_ROWS = 100_000
+
+
+class IncrementalModel:
+    """Standardized per-target SGDRegressor, trained and updated with partial_fit"""
+
+    def __init__(self, alpha: float = 1e-6, eta0: float = 0.01, random_state: int = 42):
+        self.x_scaler = StandardScaler()
+        self.y_scaler = StandardScaler()
+        self.model = MultiOutputRegressor(
+            SGDRegressor(alpha=alpha, eta0=eta0, learning_rate="invscaling", random_state=random_state)
+        )
+        self.targets = None
+        self.samples_seen = 0
+        self.updates = 0
+        self.store_seq = 0   # feature store change sequence the model has been updated to
+
+    def fit_scalers(self, X: pd.DataFrame, y: pd.DataFrame):
+        """First pass: accumulate feature / target statistics from one batch"""
+        self.x_scaler.partial_fit(X[MODEL_FEATURES])
+        self.y_scaler.partial_fit(y)
+        self.targets = list(y.columns)
+
+    def partial_fit(self, X: pd.DataFrame, y: pd.DataFrame):
+        self.model.partial_fit(self.x_scaler.transform(X[MODEL_FEATURES]), self.y_scaler.transform(y[self.targets]))
+        self.samples_seen += len(X)
+        return self
+
+    def predict(self, X) -> np.ndarray:
+        if not isinstance(X, pd.DataFrame):
+            X = pd.DataFrame(X, columns=MODEL_FEATURES)
+        return self.y_scaler.inverse_transform(self.model.predict(self.x_scaler.transform(X[MODEL_FEATURES])))
+
+
+def training_batches(frames):
+    """(X, y) mini-batches from per-student training frames (see FeatureStore.training_frame)"""
+    from train_and_upload import build_targets
+
+    for frame in frames:
+        X = frame[MODEL_FEATURES]
+        yield X, build_targets(X, frame)
+
+
+def _split(X: pd.DataFrame, y: pd.DataFrame):
+    holdout = np.asarray(X.index) % HOLDOUT_EVERY == 0
+    return X[~holdout], y[~holdout], X[holdout], y[holdout]
+
+
+def _append(parts: list, frame: pd.DataFrame, kept: int) -> int:
+    if kept < EVAL_ROWS and len(frame):
+        frame = frame.iloc[:EVAL_ROWS - kept]
+        parts.append(frame)
+        kept += len(frame)
+    return kept
+
+
+def train_incremental(source: str = "store", batch_rows: int = BATCH_ROWS, epochs: int = EPOCHS,
+                      keep_training_rows: bool = False):
+    """
+    Train a new IncrementalModel: one streaming pass for the scalers, then `epochs`
+    partial_fit passes. Returns (model, X_test, y_test, seconds, training rows if
+    `keep_training_rows` else None).
+    """
+    start = time.perf_counter()
+    model = IncrementalModel()
+    if source == "store":
+        from feature_store import FeatureStore
+        store = FeatureStore()
+        model.store_seq = store.seq
+        frames = lambda: store.iter_training_frames(batch_rows)
+    else:
+        # ml/output tables: per-student rows from the streaming loader (one row per student)
+        from training_loader import load_training_frame
+        frame, _ = load_training_frame()
+        frames = lambda: (frame.iloc[i:i + batch_rows] for i in range(0, len(frame), batch_rows))
+
+    test_X, test_y, train_X, train_y, kept = [], [], [], [], 0
+    for X, y in training_batches(frames()):
+        X_train, y_train, X_test, y_test = _split(X, y)
+        if len(X_train):
+            model.fit_scalers(X_train, y_train)
+            if keep_training_rows:
+                train_X.append(X_train)
+                train_y.append(y_train)
+        _append(test_y, y_test, kept)
+        kept = _append(test_X, X_test, kept)
+
+    if model.targets is None:
+        raise ValueError("No training rows (every student is in the holdout or the source is empty)")
+
+    for _ in range(epochs):
+        for X, y in training_batches(frames()):
+            X_train, y_train, _, _ = _split(X, y)
+            if len(X_train):
+                model.partial_fit(X_train, y_train)
+    seconds = time.perf_counter() - start
+
+    training_rows = (pd.concat(train_X), pd.concat(train_y)) if keep_training_rows else None
+    if not test_X:
+        return model, None, None, seconds, training_rows
+    return model, pd.concat(test_X), pd.concat(test_y), seconds, training_rows
+
+
+def update_incremental(model: IncrementalModel, batch_rows: int = BATCH_ROWS, store=None):
+    """
+    One partial_fit pass over the students the feature store saw change since the
+    model's last update. Returns (model, X_test, y_test, changed students, seconds);
+    the test rows are the changed holdout students.
+    """
+    if store is None:
+        from feature_store import FeatureStore
+        store = FeatureStore()
+
+    start = time.perf_counter()
+    seq = store.seq
+    test_X, test_y, kept, changed = [], [], 0, 0
+    for X, y in training_batches(store.iter_training_frames(batch_rows, since=model.store_seq)):
+        X_train, y_train, X_test, y_test = _split(X, y)
+        if len(X_train):
+            model.partial_fit(X_train, y_train)
+        _append(test_y, y_test, kept)
+        kept = _append(test_X, X_test, kept)
+        changed += len(X)
+    model.store_seq = seq
+    model.updates += 1
+    seconds = time.perf_counter() - start
+
+    if not test_X:
+        return model, None, None, changed, seconds
+    return model, pd.concat(test_X), pd.concat(test_y), changed, seconds
@@ -0,0 +1,338 @@
+# ml/job_queue.py
+"""
+Persistent background jobs for long-running work (retraining, cohort
+rescoring, exports).
+
+Request handlers only ever answer from memory or run a single prediction;
+anything that can take minutes is submitted here instead and polled:
+
+- jobs are rows in a local SQLite file (JOBS_DB_PATH), so their status,
+  progress and results survive restarts
+- they run on a bounded pool of JOB_WORKERS processes, separate from the
+  prediction pool, so a retrain never holds a request-serving worker (or the
+  GIL) and a crash in a job cannot take the server down
+- at most JOB_MAX_PENDING jobs may be queued or running at once
+- on startup, jobs that were queued or running when the server stopped are
+  queued again (up to JOB_MAX_ATTEMPTS runs each)
+- with several server processes (prefork_server.py) only one process runs
+  jobs: the others start their queue with dispatch=False and just insert
+  rows, which the running queue claims every JOB_POLL_INTERVAL seconds
+  (dispatch_queued)
+
+Each kind is a function run in the worker process as fn(params, progress)
+returning a JSON-serializable result; progress(fraction, message) updates the
+job row.
+
+Usage:
+    queue = JobQueue()
+    queue.start()
+    job = queue.submit("rescore-cohort", {"all": True})
+    queue.get(job["id"])
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import structured_log as log
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+JOBS_DB_PATH = os.environ.get("JOBS_DB_PATH", os.path.join(SCRIPT_DIR, "jobs.sqlite3"))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 1))
+JOB_MAX_PENDING = int(os.environ.get("JOB_MAX_PENDING", 20))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", 1))  # seconds between dispatch_queued passes
+# Students per predict_batch call of a rescore-cohort job
+RESCORE_CHUNK_SIZE = int(os.environ.get("RESCORE_CHUNK_SIZE", 1000))
+
+STATUSES = ("queued", "running", "succeeded", "failed")
+JSON_FIELDS = ("params", "result")
+
+
+class QueueFullError(Exception):
+    pass
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    return db
+
+
+def _update(path: str, job_id: str, **fields):
+    """Update a job row (used by the worker processes, each with its own connection)"""
+    fields["updated_at"] = time.time()
+    db = _connect(path)
+    try:
+        db.execute(f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+                   (*fields.values(), job_id))
+        db.commit()
+    finally:
+        db.close()
+
+
+# ─────────────────────────────────────────────
+# Job kinds (run in the worker processes)
+# ─────────────────────────────────────────────
+
+def retrain_job(params: dict, progress):
+    """Retrain the forest; the API server's model registry hot-reloads the new artifact"""
+    from train_and_upload import train_local_model
+
+    progress(0.0, "training")
+    _, results = train_local_model(model_format=params.get("format", "joblib"),
+                                   source=params.get("source", "csv"),
+                                   kind=params.get("model", "multi"),
+                                   warm_start=int(params.get("warm_start", 0)))
+    return results
+
+
+def rescore_cohort_job(params: dict, progress):
+    """predict_batch over the cohort in chunks, writing scores back to Supabase"""
+    import predict_student
+
+    if params.get("all"):
+        progress(0.0, "fetching student ids")
+        student_ids = predict_student.fetch_all_student_ids()
+    else:
+        student_ids = list(dict.fromkeys(int(sid) for sid in params.get("student_ids") or []))
+    if not student_ids:
+        raise ValueError("Provide student_ids or set all=true")
+
+    write_back = params.get("write_back", True)
+    chunk_size = int(params.get("chunk_size", RESCORE_CHUNK_SIZE))
+    scored = written = 0
+    failed = []
+    for start in range(0, len(student_ids), chunk_size):
+        chunk = student_ids[start:start + chunk_size]
+        output = predict_student.predict_batch(chunk, write_back=write_back)
+        if not output["success"]:
+            raise RuntimeError(output["error"])
+        for result in output["results"]:
+            if result["success"]:
+                scored += 1
+            else:
+                failed.append(result["student_id"])
+        written += output["written"]
+        progress((start + len(chunk)) / len(student_ids), f"{start + len(chunk)}/{len(student_ids)} students")
+
+    return {"count": len(student_ids), "scored": scored, "written": written, "failed": failed}
+
+
+def export_job(params: dict, progress):
+    """Export the Supabase tables to ml/output (incremental unless full=true)"""
+    from export_data import export_from_supabase
+    from dataset_io import DEFAULT_FORMAT
+
+    progress(0.0, "exporting")
+    return {"rows": export_from_supabase(params.get("format", DEFAULT_FORMAT), bool(params.get("full")))}
+
+
+JOB_KINDS = {
+    "retrain": retrain_job,
+    "rescore-cohort": rescore_cohort_job,
+    "export": export_job,
+}
+
+
+def run_job(path: str, job_id: str, kind: str, params: dict):
+    """Worker-process entry point: run one job and record its outcome in the job row"""
+    def progress(fraction: float, message: str = None):
+        _update(path, job_id, progress=round(min(max(fraction, 0.0), 1.0), 4), message=message)
+
+    _update(path, job_id, status="running", started_at=time.time())
+    start = time.perf_counter()
+    try:
+        result = JOB_KINDS[kind](params, progress)
+    except Exception as e:
+        _update(path, job_id, status="failed", error=f"{type(e).__name__}: {e}", finished_at=time.time())
+        log.error("job_failed", job_id=job_id, kind=kind, error=str(e))
+        return
+    _update(path, job_id, status="succeeded", progress=1.0, result=json.dumps(result, default=str),
+            finished_at=time.time())
+    log.info("job_succeeded", job_id=job_id, kind=kind, seconds=round(time.perf_counter() - start, 3))
+
+
+# ─────────────────────────────────────────────
+# Queue (API server process)
+# ─────────────────────────────────────────────
+
+class JobQueue:
+    def __init__(self, path: str = JOBS_DB_PATH, workers: int = JOB_WORKERS,
+                 max_pending: int = JOB_MAX_PENDING, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.path = path
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self._executor = None
+        self.dispatching = False
+        self._futures = {}       # job id -> future, while dispatched to this process's pool
+        self._lock = threading.Lock()
+        self._db = _connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, kind TEXT NOT NULL, params TEXT NOT NULL,"
+            " status TEXT NOT NULL, progress REAL NOT NULL DEFAULT 0, message TEXT,"
+            " result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL, started_at REAL, finished_at REAL, updated_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs(created_at)")
+        self._db.commit()
+
+    def _new_executor(self):
+        # spawn: workers must not inherit the server's event loop, threads or sockets
+        self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+
+    def start(self, resume: bool = True, dispatch: bool = True):
+        """
+        Start the worker pool and resume the jobs interrupted by the last shutdown. With
+        dispatch=False no pool is started: submit() only records jobs for the process that runs them.
+        """
+        self.dispatching = dispatch
+        if not dispatch:
+            return
+        self._new_executor()
+        if not resume:
+            return
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, kind, params, attempts FROM jobs WHERE status IN ('queued', 'running')"
+                " ORDER BY created_at"
+            ).fetchall()
+        for job_id, kind, params, attempts in rows:
+            if attempts >= self.max_attempts:
+                self._set(job_id, status="failed", error=f"Interrupted after {attempts} attempts",
+                          finished_at=time.time())
+                continue
+            self._set(job_id, status="queued", progress=0.0, message="resumed after restart")
+            self._dispatch(job_id, kind, json.loads(params))
+        if rows:
+            log.info("jobs_resumed", jobs=len(rows))
+
+    def dispatch_queued(self) -> int:
+        """Run the queued jobs this process has not dispatched yet (submitted by other processes)"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, kind, params FROM jobs WHERE status = 'queued' ORDER BY created_at"
+            ).fetchall()
+        claimed = 0
+        for job_id, kind, params in rows:
+            if job_id not in self._futures:
+                self._dispatch(job_id, kind, json.loads(params))
+                claimed += 1
+        return claimed
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stop the pool. Jobs that had not started are cancelled and marked queued
+        ("interrupted"), so the next start resumes them; a running job left behind
+        (wait=False) is resumed from its 'running' row the same way.
+        """
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        for job_id, future in list(self._futures.items()):
+            if future.cancelled():
+                # Not a failed attempt: it never ran
+                self._db_execute(
+                    "UPDATE jobs SET status = 'queued', message = 'interrupted', attempts = MAX(attempts - 1, 0),"
+                    " updated_at = ? WHERE id = ? AND status = 'queued'", (time.time(), job_id))
+        self._futures.clear()
+
+    def submit(self, kind: str, params: dict | None = None) -> dict:
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind {kind!r} (expected one of {', '.join(JOB_KINDS)})")
+        params = params or {}
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            # Count and insert in one statement, so the cap holds across server processes
+            inserted = self._db.execute(
+                "INSERT INTO jobs (id, kind, params, status, created_at, updated_at)"
+                " SELECT ?, ?, ?, 'queued', ?, ?"
+                " WHERE (SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')) < ?",
+                (job_id, kind, json.dumps(params), now, now, self.max_pending),
+            ).rowcount
+            self._db.commit()
+        if not inserted:
+            raise QueueFullError(f"{self.max_pending} jobs are already queued or running")
+        if self.dispatching:
+            self._dispatch(job_id, kind, params)
+        log.info("job_queued", job_id=job_id, kind=kind)
+        return self.get(job_id)
+
+    def _dispatch(self, job_id: str, kind: str, params: dict):
+        self._db_execute("UPDATE jobs SET attempts = attempts + 1 WHERE id = ?", (job_id,))
+        try:
+            future = self._executor.submit(run_job, self.path, job_id, kind, params)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory) and took the pool with it
+            log.warning("job_pool_restarted")
+            self._new_executor()
+            future = self._executor.submit(run_job, self.path, job_id, kind, params)
+        self._futures[job_id] = future
+        future.add_done_callback(lambda f: self._on_done(job_id, f))
+
+    def _on_done(self, job_id: str, future):
+        # run_job records its own outcome; this only catches the worker dying mid-job.
+        # Cancelled futures are put back in the queue by shutdown()
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self._set(job_id, status="failed", error=f"Worker failed: {type(error).__name__}: {error}",
+                      finished_at=time.time())
+            log.error("job_worker_failed", job_id=job_id, error=str(error))
+        # Only once the row is final, so dispatch_queued() cannot pick the job up again
+        self._futures.pop(job_id, None)
+
+    def _db_execute(self, sql: str, args=()):
+        with self._lock:
+            self._db.execute(sql, args)
+            self._db.commit()
+
+    def _set(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        self._db_execute(f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+                         (*fields.values(), job_id))
+
+    @staticmethod
+    def _row(cursor, row) -> dict:
+        job = {col[0]: value for col, value in zip(cursor.description, row)}
+        for field in JSON_FIELDS:
+            if job[field] is not None:
+                job[field] = json.loads(job[field])
+        return job
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            cursor = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+            return self._row(cursor, row) if row else None
+
+    def list(self, status: str = None, kind: str = None, limit: int = 50) -> list[dict]:
+        """Most recent jobs first (results omitted)"""
+        where, args = [], []
+        if status:
+            where.append("status = ?")
+            args.append(status)
+        if kind:
+            where.append("kind = ?")
+            args.append(kind)
+        sql = ("SELECT id, kind, status, progress, message, error, attempts, created_at, started_at, finished_at"
+               f" FROM jobs {'WHERE ' + ' AND '.join(where) if where else ''} ORDER BY created_at DESC LIMIT ?")
+        with self._lock:
+            cursor = self._db.execute(sql, (*args, limit))
+            return [{col[0]: value for col, value in zip(cursor.description, row)} for row in cursor.fetchall()]
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {"workers": self.workers, "path": self.path, **{s: counts.get(s, 0) for s in STATUSES}}
@@ -0,0 +1,131 @@
+# ml/model_registry.py
+"""
+Process-wide model registry with hot reload.
+
+The model artifact is deserialized once and shared by every prediction. When
+the file on disk changes (new mtime/size and a different content hash) the
+first caller to notice loads the new artifact and swaps it in atomically while
+other callers keep using the current one; requests already holding the
+previous model finish with it, so retraining takes effect without restarting
+the API server.
+"""
+
+import os
+import time
+import hashlib
+import threading
+import joblib
+import structured_log as log
+
+# Minimum seconds between checks of the artifact on disk
+RELOAD_CHECK_INTERVAL = float(os.environ.get("MODEL_RELOAD_INTERVAL", 2.0))
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def save_model(model, path: str):
+    """
+    Write a model artifact atomically (temp file + rename) so a running
+    registry never loads a partially written file.
+    """
+    tmp_path = f"{path}.tmp"
+    joblib.dump(model, tmp_path)
+    os.replace(tmp_path, path)
+
+
+class ModelRegistry:
+    def __init__(self, path: str, check_interval: float = RELOAD_CHECK_INTERVAL, loader=joblib.load):
+        self.path = path
+        self.check_interval = check_interval
+        self.loader = loader
+        self.model = None
+        self.version = None      # content hash of the loaded artifact
+        self.loaded_at = None
+        self.reloads = 0
+        self.load_seconds = None  # hash + load time of the current artifact
+        self._signature = None   # (mtime_ns, size) of the loaded artifact
+        self._last_check = 0.0
+        self._load_lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.model is not None
+
+    def get(self):
+        """
+        Return the current model, loading or reloading it if the artifact changed.
+
+        Raises FileNotFoundError if no model has ever been loaded and the file is missing.
+        """
+        now = time.monotonic()
+        if self.model is not None and now - self._last_check < self.check_interval:
+            return self.model
+
+        if self.model is None:
+            # First load: every caller must wait for a model
+            with self._load_lock:
+                if self.model is None:
+                    self._reload_if_changed()
+        elif self._load_lock.acquire(blocking=False):
+            # Reload check: callers that lose the race keep using the current model
+            try:
+                self._reload_if_changed()
+            finally:
+                self._load_lock.release()
+
+        if self.model is None:
+            raise FileNotFoundError(
+                f"Model file not found at {self.path}. Please train the model first."
+            )
+        return self.model
+
+    def _reload_if_changed(self):
+        self._last_check = time.monotonic()
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+
+        signature = (st.st_mtime_ns, st.st_size)
+        if signature == self._signature:
+            return
+
+        start = time.perf_counter()
+        try:
+            version = file_sha256(self.path)
+            if version == self.version:
+                # Touched but identical content
+                self._signature = signature
+                return
+            model = self.loader(self.path)
+        except Exception as e:
+            # e.g. a partially written artifact; keep serving the current model
+            log.warning("model_reload_failed", version=(self.version or "none")[:12], error=str(e))
+            return
+
+        previous = self.version
+        # Single reference assignment: readers see either the old or the new model
+        self.model = model
+        self.version = version
+        self._signature = signature
+        self.loaded_at = time.time()
+        self.load_seconds = time.perf_counter() - start
+        if previous is not None:
+            self.reloads += 1
+            log.info("model_reloaded", previous=previous[:12], version=version[:12])
+
+    def info(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "path": self.path,
+            "version": self.version[:12] if self.version else None,
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "load_seconds": round(self.load_seconds, 4) if self.load_seconds is not None else None,
+        }
@@ -136,235 +136,360 @@ This ensures predictions are both data-driven AND academically justified.
 import os
 import sys
 import json
-import joblib
+import time
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 import re
 from dotenv import load_dotenv
-from supabase import create_client, Client
+import data_access
+import score_rules
+import structured_log as log
+import telemetry
+from structured_log import NULL_TRACE
+from course_features import build_student_features, build_features_bulk, MODEL_FEATURES
+from model_registry import ModelRegistry
+from flat_forest import load_forest
+from profile_cache import ProfileAnalysisCache
+from prediction_cache import PredictionCache, fingerprint
 
 # Load environment variables
 load_dotenv()
 
-SUPABASE_URL = os.environ.get("SUPABASE_URL")
-SERVICE_ROLE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
-
 # Get the directory where this script is located
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-MODEL_PATH = os.path.join(SCRIPT_DIR, "model.joblib")
+# MODEL_FORMAT=flat serves the memory-mapped flat forest written by `train_and_upload.py --format flat`
+MODEL_FORMAT = os.environ.get("MODEL_FORMAT", "joblib")
+MODEL_PATH = os.path.join(SCRIPT_DIR, "model.forest" if MODEL_FORMAT == "flat" else "model.joblib")
+
+# Model is loaded once per process and hot-reloaded when the artifact changes
+if MODEL_FORMAT == "flat":
+    MODEL_REGISTRY = ModelRegistry(MODEL_PATH, loader=load_forest)
+else:
+    MODEL_REGISTRY = ModelRegistry(MODEL_PATH)
+
 
-# Initialize Supabase client
-supabase: Client = create_client(SUPABASE_URL, SERVICE_ROLE_KEY)
+# Profile analysis API (Next.js route) and its persistent result cache
+PROFILE_ANALYSIS_URL = os.environ.get("PROFILE_ANALYSIS_URL", "http://localhost:3000/api/analyze-profile")
+PROFILE_CACHE = ProfileAnalysisCache()
+# Profile analyses in flight at once while scoring a cohort
+PROFILE_CONCURRENCY = int(os.environ.get("PROFILE_ANALYSIS_CONCURRENCY", 8))
+# Results of unchanged inputs under the same model (see prediction_cache.py)
+PREDICTION_CACHE = PredictionCache()
+
+
+def load_model():
+    """Return the current model (raises FileNotFoundError if it has not been trained)"""
+    return MODEL_REGISTRY.get()
 
 
 def fetch_student_data(student_id: int):
     """Fetch courses and comments for a specific student from Supabase"""
-    
-    # Fetch courses
-    courses_response = supabase.table("courses").select("*").eq("student_id", student_id).execute()
-    courses = pd.DataFrame(courses_response.data) if courses_response.data else pd.DataFrame()
-    
-    # Fetch comments
-    comments_response = supabase.table("student_comments").select("*").eq("student_id", student_id).execute()
-    comments = pd.DataFrame(comments_response.data) if comments_response.data else pd.DataFrame()
-    
-    return courses, comments
+    data = data_access.run(lambda client: client.fetch_student(student_id))
+    return pd.DataFrame(data["courses"]), pd.DataFrame(data["comments"])
+
+
+def request_profile_analysis(github_url: str, linkedin_url: str, portfolio_url: str):
+    """Call the profile analysis API; returns the analysis dict or None on a non-200 response"""
+    import requests
+
+    start = time.perf_counter()
+    analysis_res = requests.post(
+        PROFILE_ANALYSIS_URL,
+        json={
+            "github_url": github_url,
+            "linkedin_url": linkedin_url,
+            "portfolio_url": portfolio_url,
+        },
+        timeout=15
+    )
+    telemetry.PROFILE_API_SECONDS.observe(time.perf_counter() - start)
+
+    if analysis_res.status_code == 200:
+        return analysis_res.json()
+    return None
 
 
-def categorize_course(course_code: str, course_name: str) -> dict:
+def analyze_profile(github_url: str, linkedin_url: str, portfolio_url: str, fetch=None) -> dict:
     """
-    Categorize course by domain based on code and name.
-    Based on ACM Computing Curricula guidelines and course content analysis.
-    
-    Returns: dict with domain flags
+    Analyze a student's GitHub / LinkedIn / portfolio URLs (cached, see profile_cache.py)
+    and convert the result into score bonuses. `fetch` (default request_profile_analysis) is
+    called on a cache miss; pass one returning None to use cached analyses only.
+
+    When the analysis is unavailable (API error or no usable result) the bonuses are 0
+    and "degraded" is True, so the prediction is not cached (see predict_from_data).
     """
-    code = str(course_code).upper() if course_code else ""
-    name = str(course_name).upper() if course_name else ""
-    
-    # Extract course level (2000 = diploma, 3000 = degree)
-    level_match = re.search(r'(\d)000', code)
-    level = int(level_match.group(1)) if level_match else 2
-    
-    categories = {
-        "is_programming": False,
-        "is_design": False,
-        "is_infrastructure": False,
-        "is_soft_skills": False,
-        "is_theory": False,
-        "level": level
+    profile = {
+        "github_bonus": 0,
+        "portfolio_bonus": 0,
+        "linkedin_bonus": 0,
+        "computing_relevance": 0,
+        "degraded": False,
     }
-    
-    # Programming courses (software development, coding)
-    programming_keywords = [
-        "PROGRAMMING", "CODING", "PYTHON", "C PROG", "OBJECT ORIENTED",
-        "WEB DEVELOPMENT", "MOBILE APP", "SOFTWARE DEV", "BACK-END", "FRONT-END",
-        "DATA STRUCT", "ALGORITHM", "SOFTWARE DESIGN PATTERN"
-    ]
-    
-    # Design courses (HCI, UX, architecture, modeling)
-    design_keywords = [
-        "DESIGN", "HCI", "HUMAN COMPUTER", "INTERACTION", "USER EXPERIENCE",
-        "SOFTWARE ARCHITECT", "MODELING", "ANALYSIS", "UML", "UI"
-    ]
-    
-    # IT Infrastructure courses (networks, OS, security, cloud, database)
-    infrastructure_keywords = [
-        "NETWORK", "OPERATING SYSTEM", "SECURITY", "DATABASE", "CLOUD",
-        "DATA COMM", "COMPUTER ORG", "ARCHITECTURE", "INFRASTRUCTURE",
-        "SYSTEM ADMIN", "SERVER"
-    ]
-    
-    # Soft skills & management (MPU, business, project management, communication)
-    soft_skills_keywords = [
-        "MPU", "SPEAKING", "COMMUNICATION", "MANAGEMENT", "ENTREPRENEUR",
-        "BUSINESS", "PROJECT MANAGE", "PROFESSIONAL", "ETHICS", "PHILOSOPHY",
-        "CRITICAL THINKING", "PRESENTATION"
-    ]
-    
-    # Theory/Math courses (calculus, discrete math, AI theory)
-    theory_keywords = [
-        "CALCULUS", "MATHEMATICS", "DISCRETE", "ALGORITHM", "THEORY",
-        "ARTIFICIAL INT", "MACHINE LEARNING", "DATA MINING", "STATISTICS"
+
+    if not (github_url or linkedin_url or portfolio_url):
+        return profile
+
+    try:
+        analysis = PROFILE_CACHE.get(github_url, linkedin_url, portfolio_url, fetch or request_profile_analysis)
+
+        if analysis is None:
+            profile["degraded"] = True
+        else:
+            profile["computing_relevance"] = analysis.get("computingRelevance", 0)
+
+            # GitHub bonus: based on projects and languages
+            if analysis.get("github"):
+                github_data = analysis["github"]
+                num_projects = len(github_data.get("projects", []))
+                num_languages = len(github_data.get("languages", []))
+                profile["github_bonus"] = min(20, num_projects * 3 + num_languages * 2)
+
+            # Portfolio bonus: based on skills detected
+            if analysis.get("portfolio"):
+                portfolio_data = analysis["portfolio"]
+                num_skills = len(portfolio_data.get("skills", []))
+                profile["portfolio_bonus"] = min(15, num_skills * 2)
+
+            # LinkedIn bonus: basic presence
+            if analysis.get("linkedin"):
+                profile["linkedin_bonus"] = 15
+
+    except Exception as e:
+        log.warning("profile_analysis_failed", error=str(e))
+        # Continue without profile data
+        profile["degraded"] = True
+
+    return profile
+
+
+def analyze_profiles(url_triples, concurrency: int = PROFILE_CONCURRENCY) -> dict:
+    """
+    analyze_profile() for many distinct (github, linkedin, portfolio) URL triples,
+    at most `concurrency` at a time, so a cohort of cache misses does not wait on
+    each 15 s API call in turn. Returns triple -> profile bonuses.
+    """
+    url_triples = list(url_triples)
+    if len(url_triples) <= 1 or concurrency <= 1:
+        return {urls: analyze_profile(*urls) for urls in url_triples}
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(url_triples)), thread_name_prefix="profile") as pool:
+        return dict(zip(url_triples, pool.map(lambda urls: analyze_profile(*urls), url_triples)))
+
+
+def calculate_scores(extended_features: dict, activities: list, profile: dict, trace=NULL_TRACE,
+                     activity_totals: dict | None = None):
+    """
+    Apply the research-backed domain formulas (see module header) to a student's
+    extended features, co-curricular activities and profile analysis. The formulas
+    and weights are the rule table in score_rules.py, the same one predict_batch()
+    evaluates column-wise over a cohort.
+
+    `activity_totals` ({"count", "impact", "leadership", "relevance"}, as kept by
+    the feature store) can be passed instead of the individual activities.
+    With a debug `trace` (see structured_log.py) the co-curricular inputs and
+    calculation are recorded on it.
+
+    Returns: (scores, has_degree_courses, has_diploma_courses)
+    """
+    # Determine if student has degree-level courses (3000) or diploma-level (2000)
+    has_degree_courses = extended_features["degree_courses"] > 0
+    has_diploma_courses = extended_features.get("diploma_courses", 0) > 0
+
+    # Co-curricular inputs: AI-analyzed activity scores, summed in record order
+    if activity_totals is None:
+        activity_totals = {"count": len(activities or []), "impact": 0, "leadership": 0, "relevance": 0}
+        for activity in activities or []:
+            impact = activity.get("ai_impact_score", 0)
+            leadership = activity.get("ai_leadership_score", 0)
+            relevance = activity.get("ai_relevance_score", 0)
+            if trace.debug:
+                trace.event("activity", impact=impact, leadership=leadership, relevance=relevance)
+            activity_totals["impact"] += impact
+            activity_totals["leadership"] += leadership
+            activity_totals["relevance"] += relevance
+
+    if trace.debug:
+        trace.event("activity_totals", **activity_totals)
+
+    row = {
+        **extended_features,
+        "activity_count": activity_totals["count"],
+        **{column: activity_totals[column] for column in ("impact", "leadership", "relevance")},
+        **{column: profile[column] for column in score_rules.PROFILE_COLUMNS},
+    }
+    scores = score_rules.score_row(row)
+
+    if trace.debug:
+        terms = score_rules.formula_terms(row, "co_curricular_points")
+        trace.event("co_curricular", **{column: round(value, 2) for column, value in terms.items()},
+                    total=scores["co_curricular_points"])
+
+    return scores, has_degree_courses, has_diploma_courses
+
+
+def summarize_features(X: pd.DataFrame, extended_features: dict, has_degree_courses: bool, has_diploma_courses: bool) -> dict:
+    """Feature summary returned alongside the scores"""
+    return {
+        "total_units": float(X["total_units"].iloc[0]),
+        "avg_grade_point": float(X["avg_grade_point"].iloc[0]),
+        "num_courses": int(X["num_courses"].iloc[0]),
+        "comments_total_len": int(X["comments_total_len"].iloc[0]),
+        "programming_courses": extended_features["programming_courses"],
+        "design_courses": extended_features["design_courses"],
+        "infrastructure_courses": extended_features["infrastructure_courses"],
+        "degree_gpa": extended_features["degree_gpa"],
+        "diploma_gpa": extended_features.get("diploma_gpa", 0),
+        "has_degree_courses": has_degree_courses,
+        "has_diploma_courses": has_diploma_courses,
+    }
+
+
+def prediction_inputs(data: dict) -> list:
+    """
+    The parts of fetched rows (see data_access.SupabaseDataClient.fetch_student) that
+    feed the features and score rules, in fetch order (float sums depend on it).
+    Row ids, profile URLs and comment text beyond its length do not change a prediction.
+    """
+    return [
+        [[course.get("course_code"), course.get("course_name"), course.get("grade"), course.get("credit_hour")]
+         for course in data["courses"]],
+        # False: no content column (comments are then not counted, see build_student_features)
+        [len(comment["content"]) if isinstance(comment.get("content"), str) else comment.get("content", False)
+         for comment in data["comments"]],
+        [[activity.get(column, 0) for column in ("ai_impact_score", "ai_leadership_score", "ai_relevance_score")]
+         for activity in data["activities"]],
     ]
+
+
+def cached_prediction(student_id: int, inputs, profile: dict, trace=NULL_TRACE):
+    """
+    (key, cached output or None) for a prediction from `inputs` (prediction_inputs() or the
+    feature-store aggregates) and the profile bonuses they map to. Debug traces skip the
+    lookup so the calculation is recorded.
+    """
+    bonuses = {column: profile[column] for column in score_rules.PROFILE_COLUMNS}
+    key = PREDICTION_CACHE.key(student_id, fingerprint([inputs, bonuses]), MODEL_REGISTRY.version)
+    return key, None if trace.debug else PREDICTION_CACHE.get(key)
+
+
+def store_prediction(key: str, profile: dict, output: dict) -> dict:
+    """
+    Cache `output` and return it with its ETag. Predictions made without the profile
+    analysis (degraded) are neither cached nor given an ETag, so the next request retries it.
+    """
+    if profile["degraded"]:
+        return {**output, "etag": None}
+    output["etag"] = key
+    PREDICTION_CACHE.put(key, output)
+    return output
+
+
+def predict_from_data(student_id: int, data: dict, trace=NULL_TRACE):
+    """
+    Predict scores for a student from already-fetched data
+    (see data_access.SupabaseDataClient.fetch_student).
+    Stage timings (and with a debug trace, the co-curricular inputs) are recorded on `trace`.
+    """
+    # Load model (cached; reloaded only when the artifact changes)
+    try:
+        with trace.stage("load_model"):
+            model = load_model()
+    except FileNotFoundError as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+    # Profile URLs from the student record
+    student = data.get("profile") or {}
+    github_url = student.get("github_url", "") or ""
+    linkedin_url = student.get("linkedin_url", "") or ""
+    portfolio_url = student.get("portfolio_url", "") or ""
     
-    combined = f"{code} {name}"
+    # Analyze profiles if URLs exist (usually a profile-cache hit)
+    with trace.stage("profile"):
+        profile = analyze_profile(github_url, linkedin_url, portfolio_url)
     
-    if any(kw in combined for kw in programming_keywords):
-        categories["is_programming"] = True
+    with trace.stage("cache"):
+        key, cached = cached_prediction(student_id, prediction_inputs(data), profile, trace)
+    if cached is not None:
+        return cached
     
-    if any(kw in combined for kw in design_keywords):
-        categories["is_design"] = True
+    # Build features (plain Python for typical transcripts, DataFrames for very large ones)
+    with trace.stage("features"):
+        X, extended_features = build_student_features(student_id, data["courses"], data["comments"])
     
-    if any(kw in combined for kw in infrastructure_keywords):
-        categories["is_infrastructure"] = True
+    # Predict using base model
+    with trace.stage("model"):
+        base_predictions = model.predict(X)[0]
     
-    if any(kw in combined for kw in soft_skills_keywords):
-        categories["is_soft_skills"] = True
+    # AI-analyzed co-curricular activities
+    activities = data["activities"]
     
-    if any(kw in combined for kw in theory_keywords):
-        categories["is_theory"] = True
+    with trace.stage("scores"):
+        scores, has_degree_courses, has_diploma_courses = calculate_scores(
+            extended_features, activities, profile, trace=trace
+        )
     
-    return categories
+    return store_prediction(key, profile, {
+        "success": True,
+        "student_id": student_id,
+        "scores": scores,
+        "features": summarize_features(X, extended_features, has_degree_courses, has_diploma_courses),
+    })
 
 
-def build_features(student_id: int, df_courses: pd.DataFrame, df_comments: pd.DataFrame):
+def predict_from_store(student_id: int, store, trace=NULL_TRACE):
     """
-    Build comprehensive feature vector based on academic research.
-    
-    Features include:
-    - Overall academic performance (GPA, units)
-    - Domain-specific performance (programming, design, infrastructure)
-    - Course level progression (diploma vs degree performance)
-    - Engagement indicators (comments, course diversity)
-    
-    Based on educational data mining literature (Romero & Ventura, 2010)
+    Predict scores from the incrementally maintained feature store (see feature_store.py)
+    without reading the student's transcript. Returns None if the store does not know the student.
     """
-    
-    # Nilai University Grade Point System (4.0 scale)
-    # Based on official transcript grade points per unit
-    grade_map = {
-        "A+": 4.0,   # 12.000 grade points for 3 units = 4.0 per unit
-        "A": 4.0,    # 12.000 grade points for 3 units = 4.0 per unit
-        "A-": 3.7,   # 11.100 grade points for 3 units = 3.7 per unit
-        "B+": 3.4,   # 10.200 grade points for 3 units = 3.4 per unit
-        "B": 3.1,    # 9.300 grade points for 3 units = 3.1 per unit
-        "B-": 2.7,   # 8.100 grade points for 3 units = 2.7 per unit
-        "C+": 2.4,   # 7.200 grade points for 3 units = 2.4 per unit
-        "C": 2.1,    # 6.300 grade points for 3 units = 2.1 per unit
-        "C-": 1.8,   # 5.400 grade points for 3 units = 1.8 per unit
-        "D+": 1.7,   # 5.100 grade points for 3 units = 1.7 per unit
-        "D": 1.0,    # 3.000 grade points for 3 units = 1.0 per unit
-        "F": 0.0     # 0.000 grade points
-    }
-    
-    # Default features
-    features = {
-        "total_units": 0,
-        "avg_grade_point": 0.0,
-        "num_courses": 0,
-        "comments_count": 0,
-        "comments_total_len": 0,
-        # Domain-specific features
-        "programming_gpa": 0,
-        "programming_courses": 0,
-        "design_gpa": 0,
-        "design_courses": 0,
-        "infrastructure_gpa": 0,
-        "infrastructure_courses": 0,
-        "soft_skills_gpa": 0,
-        "soft_skills_courses": 0,
-        "theory_gpa": 0,
-        "theory_courses": 0,
-        # Level progression
-        "diploma_gpa": 0,
-        "diploma_courses": 0,
-        "degree_gpa": 0,
-        "degree_courses": 0,
-    }
-    
-    if not df_courses.empty:
-        # Normalize grades
-        df_courses["grade_norm"] = df_courses["grade"].fillna("").str.upper().str.strip()
-        df_courses["grade_point"] = df_courses["grade_norm"].map(grade_map)
-        
-        # Categorize each course
-        df_courses["category"] = df_courses.apply(
-            lambda row: categorize_course(row.get("course_code"), row.get("course_name")),
-            axis=1
+    with trace.stage("store"):
+        stored = store.features(student_id)
+    if stored is None:
+        return None
+
+    try:
+        with trace.stage("load_model"):
+            model = load_model()
+    except FileNotFoundError as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+    extended_features = stored["extended"]
+    urls = stored["profile"]
+    with trace.stage("profile"):
+        profile = analyze_profile(
+            urls.get("github_url") or "",
+            urls.get("linkedin_url") or "",
+            urls.get("portfolio_url") or ""
         )
-        
-        # Extract category flags
-        for flag in ["is_programming", "is_design", "is_infrastructure", "is_soft_skills", "is_theory"]:
-            df_courses[flag] = df_courses["category"].apply(lambda x: x.get(flag, False))
-        
-        df_courses["level"] = df_courses["category"].apply(lambda x: x.get("level", 2))
-        
-        # Filter valid grades (exclude CR, SC, EX, etc.)
-        valid_courses = df_courses[df_courses["grade_point"].notna()].copy()
-        
-        if not valid_courses.empty:
-            # Overall metrics
-            features["total_units"] = df_courses["credit_hour"].sum()
-            features["avg_grade_point"] = valid_courses["grade_point"].mean()
-            features["num_courses"] = len(df_courses)
-            
-            # Domain-specific GPAs (weighted by importance in each domain)
-            for domain in ["programming", "design", "infrastructure", "soft_skills", "theory"]:
-                domain_courses = valid_courses[valid_courses[f"is_{domain}"]]
-                if not domain_courses.empty:
-                    features[f"{domain}_gpa"] = domain_courses["grade_point"].mean()
-                    features[f"{domain}_courses"] = len(domain_courses)
-            
-            # Level progression (diploma 2000 vs degree 3000)
-            diploma_courses = valid_courses[valid_courses["level"] == 2]
-            degree_courses = valid_courses[valid_courses["level"] == 3]
-            
-            if not diploma_courses.empty:
-                features["diploma_gpa"] = diploma_courses["grade_point"].mean()
-                features["diploma_courses"] = len(diploma_courses)
-            
-            if not degree_courses.empty:
-                features["degree_gpa"] = degree_courses["grade_point"].mean()
-                features["degree_courses"] = len(degree_courses)
-    
-    # Process comments (engagement indicator)
-    if not df_comments.empty and "content" in df_comments.columns:
-        features["comments_count"] = len(df_comments)
-        features["comments_total_len"] = df_comments["content"].str.len().sum()
-    
-    # Create DataFrame with features (maintain compatibility with basic model)
-    # For backward compatibility, use the original 5 features
-    X = pd.DataFrame({
-        "total_units": [features["total_units"]],
-        "avg_grade_point": [features["avg_grade_point"]],
-        "num_courses": [features["num_courses"]],
-        "comments_count": [features["comments_count"]],
-        "comments_total_len": [features["comments_total_len"]]
+
+    with trace.stage("cache"):
+        # Not stored["profile"]: its label scores are rewritten by every batch write-back
+        key, cached = cached_prediction(student_id, [stored["extended"], stored["activities"]], profile, trace)
+    if cached is not None:
+        return cached
+
+    with trace.stage("model"):
+        X = pd.DataFrame([[extended_features[col] for col in MODEL_FEATURES]], columns=MODEL_FEATURES)
+        base_predictions = model.predict(X)[0]
+
+    with trace.stage("scores"):
+        scores, has_degree_courses, has_diploma_courses = calculate_scores(
+            extended_features, None, profile, trace=trace, activity_totals=stored["activities"]
+        )
+
+    return store_prediction(key, profile, {
+        "success": True,
+        "student_id": student_id,
+        "scores": scores,
+        "features": summarize_features(X, extended_features, has_degree_courses, has_diploma_courses),
     })
-    
-    return X, features
 
 
-def predict_scores(student_id: int):
+def predict_scores(student_id: int, trace=NULL_TRACE):
     """
     Load model, fetch data, predict scores for a student.
     Applies domain expertise to map model predictions to appropriate score ranges.
@@ -373,251 +498,105 @@ def predict_scores(student_id: int):
     """
     
     try:
-        # Check if model exists
-        if not os.path.exists(MODEL_PATH):
-            return {
-                "success": False,
-                "error": f"Model file not found at {MODEL_PATH}. Please train the model first."
-            }
-        
-        # Load model
-        model = joblib.load(MODEL_PATH)
-        
-        # Fetch student data from Supabase
-        courses, comments = fetch_student_data(student_id)
-        
-        # Fetch student record to get profile URLs
-        student_res = supabase.table("students").select("github_url, linkedin_url, portfolio_url").eq("id", student_id).execute()
-        github_url = ""
-        linkedin_url = ""
-        portfolio_url = ""
-        
-        if student_res.data and len(student_res.data) > 0:
-            github_url = student_res.data[0].get("github_url", "") or ""
-            linkedin_url = student_res.data[0].get("linkedin_url", "") or ""
-            portfolio_url = student_res.data[0].get("portfolio_url", "") or ""
-        
-        # Analyze profiles if URLs exist
-        github_bonus = 0
-        portfolio_bonus = 0
-        linkedin_bonus = 0
-        computing_relevance = 0
-        
-        if github_url or linkedin_url or portfolio_url:
-            try:
-                import requests
-                
-                # Call the profile analysis API
-                analysis_res = requests.post(
-                    "http://localhost:3000/api/analyze-profile",
-                    json={
-                        "github_url": github_url,
-                        "linkedin_url": linkedin_url,
-                        "portfolio_url": portfolio_url,
-                    },
-                    timeout=15
-                )
-                
-                if analysis_res.status_code == 200:
-                    analysis = analysis_res.json()
-                    computing_relevance = analysis.get("computingRelevance", 0)
-                    
-                    # GitHub bonus: based on projects and languages
-                    if analysis.get("github"):
-                        github_data = analysis["github"]
-                        num_projects = len(github_data.get("projects", []))
-                        num_languages = len(github_data.get("languages", []))
-                        github_bonus = min(20, num_projects * 3 + num_languages * 2)
-                    
-                    # Portfolio bonus: based on skills detected
-                    if analysis.get("portfolio"):
-                        portfolio_data = analysis["portfolio"]
-                        num_skills = len(portfolio_data.get("skills", []))
-                        portfolio_bonus = min(15, num_skills * 2)
-                    
-                    # LinkedIn bonus: basic presence
-                    if analysis.get("linkedin"):
-                        linkedin_bonus = 15
-                    
-            except Exception as e:
-                print(f"Warning: Profile analysis failed (non-critical): {e}", file=sys.stderr)
-                # Continue without profile data
-        
-        # Build features
-        X, extended_features = build_features(student_id, courses, comments)
-        
-        # Predict using base model
-        base_predictions = model.predict(X)[0]
-        
-        # Determine if student has degree-level courses (3000) or diploma-level (2000)
-        has_degree_courses = extended_features["degree_courses"] > 0
-        has_diploma_courses = extended_features.get("diploma_courses", 0) > 0
-        
-        # Use the appropriate GPA based on student's current level
-        # If they have degree courses, prioritize degree GPA; otherwise use overall or diploma GPA
-        effective_gpa = extended_features["avg_grade_point"]
-        if has_degree_courses and extended_features["degree_gpa"] > 0:
-            effective_gpa = extended_features["degree_gpa"]
-        elif not has_degree_courses and extended_features["diploma_gpa"] > 0:
-            effective_gpa = extended_features["diploma_gpa"]
-        
-        # Apply domain-specific formulas based on academic research
-        # All formulas are research-backed (see header documentation)
-        
-        # === 1. PROGRAMMING SCORE ===
-        # Formula: (Domain_GPA × 25) + (Course_Count × 2.5)
-        # Based on: Liao et al. (2019), Robins et al. (2003)
-        if extended_features["programming_courses"] > 0:
-            prog_gpa = extended_features.get("programming_gpa", effective_gpa)
-            programming_score = (prog_gpa * 25) + (extended_features["programming_courses"] * 2.5)
-        else:
-            # Fallback: use overall GPA if no programming courses
-            programming_score = effective_gpa * 20
-        
-        # === 2. DESIGN SCORE ===
-        # Formula: (Design_GPA × 25) + (Soft_Skills_GPA × 15) + (HCI_Courses × 5)
-        # Based on: Cross (2011), Norman (2013)
-        if extended_features["design_courses"] > 0:
-            design_gpa = extended_features.get("design_gpa", effective_gpa)
-            soft_skills_gpa = extended_features.get("soft_skills_gpa", effective_gpa)
-            design_score = (design_gpa * 25) + (soft_skills_gpa * 15) + (extended_features["design_courses"] * 5)
-        else:
-            design_score = effective_gpa * 20
-        
-        # === 3. IT INFRASTRUCTURE SCORE ===
-        # Formula: (Infrastructure_GPA × 25) + (Theory_GPA × 15) + (Infrastructure_Courses × 3)
-        # Based on: Cisco (2020), CompTIA (2021)
-        if extended_features["infrastructure_courses"] > 0:
-            infra_gpa = extended_features.get("infrastructure_gpa", effective_gpa)
-            theory_gpa = extended_features.get("theory_gpa", effective_gpa)
-            it_infrastructure_score = (infra_gpa * 25) + (theory_gpa * 15) + (extended_features["infrastructure_courses"] * 3)
-        else:
-            it_infrastructure_score = effective_gpa * 20
-        
-        # === 4. CO-CURRICULAR POINTS ===
-        # Formula: AI-analyzed scores + Soft Skills courses
-        # Based on: Malaysian Qualifications Agency (2017), Kuh (2008)
-        
-        # Fetch AI-analyzed co-curricular activities from database
-        cocurricular_res = supabase.table("cocurricular_activities").select(
-            "ai_impact_score, ai_leadership_score, ai_relevance_score"
-        ).eq("student_id", student_id).execute()
-        
-        ai_total_impact = 0
-        ai_total_leadership = 0
-        ai_total_relevance = 0
-        activity_count = 0
-        
-        # Debug logging
-        print(f"\n=== CO-CURRICULAR ACTIVITIES DEBUG ===", file=sys.stderr)
-        print(f"Student ID: {student_id}", file=sys.stderr)
-        print(f"Activities found: {len(cocurricular_res.data) if cocurricular_res.data else 0}", file=sys.stderr)
-        
-        if cocurricular_res.data:
-            activity_count = len(cocurricular_res.data)
-            for activity in cocurricular_res.data:
-                impact = activity.get("ai_impact_score", 0)
-                leadership = activity.get("ai_leadership_score", 0)
-                relevance = activity.get("ai_relevance_score", 0)
-                print(f"Activity: Impact={impact}, Leadership={leadership}, Relevance={relevance}", file=sys.stderr)
-                ai_total_impact += impact
-                ai_total_leadership += leadership
-                ai_total_relevance += relevance
-        
-        print(f"Totals: Impact={ai_total_impact}, Leadership={ai_total_leadership}, Relevance={ai_total_relevance}", file=sys.stderr)
-        print(f"====================================\n", file=sys.stderr)
-        
-        # Average AI scores across all activities (if any)
-        avg_impact = ai_total_impact / activity_count if activity_count > 0 else 0
-        avg_leadership = ai_total_leadership / activity_count if activity_count > 0 else 0
-        avg_relevance = ai_total_relevance / activity_count if activity_count > 0 else 0
-        
-        # Soft skills courses as supplementary indicator
-        soft_skills_count = extended_features.get("soft_skills_courses", 0)
-        soft_skills_gpa = extended_features.get("soft_skills_gpa", effective_gpa)
-        
-        # Weighted formula: 
-        # - AI Impact (30%): Overall significance and achievements
-        # - AI Leadership (25%): Leadership and initiative
-        # - AI Relevance (20%): Computing field relevance
-        # - Activity quantity (10%): Number of activities (up to 10 points per activity)
-        # - Soft skills courses (15%): Academic soft skills development
-        co_curricular_points = (
-            (avg_impact * 0.30) +
-            (avg_leadership * 0.25) +
-            (avg_relevance * 0.20) +
-            (min(activity_count * 10, 100) * 0.10) +
-            ((soft_skills_count * 8) + (soft_skills_gpa * 15)) * 0.15
-        )
-        
-        print(f"\n=== CO-CURRICULAR CALCULATION ===", file=sys.stderr)
-        print(f"Avg Impact: {avg_impact:.2f} * 0.30 = {avg_impact * 0.30:.2f}", file=sys.stderr)
-        print(f"Avg Leadership: {avg_leadership:.2f} * 0.25 = {avg_leadership * 0.25:.2f}", file=sys.stderr)
-        print(f"Avg Relevance: {avg_relevance:.2f} * 0.20 = {avg_relevance * 0.20:.2f}", file=sys.stderr)
-        print(f"Activity Count: {activity_count} * 10 * 0.10 = {min(activity_count * 10, 100) * 0.10:.2f}", file=sys.stderr)
-        print(f"Soft Skills: {soft_skills_count} * 8 + {soft_skills_gpa:.2f} * 15 = {((soft_skills_count * 8) + (soft_skills_gpa * 15)) * 0.15:.2f}", file=sys.stderr)
-        print(f"FINAL CO-CURRICULAR SCORE: {co_curricular_points:.2f}", file=sys.stderr)
-        print(f"=================================\n", file=sys.stderr)
-        
-        # === 5. FEEDBACK SENTIMENT SCORE ===
-        # Formula: MIN(100, 50 + (Comments_Length × 0.05) + (Faculty_Interactions × 10))
-        # Based on: Hattie & Timperley (2007), Tinto (1993)
-        comments_len = extended_features.get("comments_total_len", 0)
-        if comments_len > 0:
-            # More comments = more engagement with faculty
-            feedback_sentiment_score = min(100, 50 + (comments_len * 0.05))
-        else:
-            # Base score from GPA (no interaction data available)
-            feedback_sentiment_score = effective_gpa * 15
+        # Fetch courses, comments, profile URLs and activities concurrently
+        with trace.stage("fetch"):
+            data = data_access.run(lambda client: client.fetch_student(student_id))
+        return predict_from_data(student_id, data, trace)
         
-        # === 6. PROFESSIONAL ENGAGEMENT SCORE ===
-        # Formula: (Portfolio × 15) + (GitHub × 20) + (LinkedIn × 15) + (GPA × 10) + (Comments × 0.1)
-        # Based on: LinkedIn & ACM (2021), GitHub Education (2022), Carnevale et al. (2020)
-        # 
-        # Now includes actual profile analysis bonuses!
-        professional_engagement_score = (comments_len * 0.1) + (effective_gpa * 10)
-        
-        # Add bonuses from profile analysis
-        professional_engagement_score += github_bonus
-        professional_engagement_score += portfolio_bonus
-        professional_engagement_score += linkedin_bonus
-        
-        # Boost all scores slightly based on computing relevance from profile analysis
-        if computing_relevance > 0:
-            relevance_multiplier = 1 + (computing_relevance / 1000)  # Max 10% boost at 100 relevance
-            programming_score *= relevance_multiplier
-            design_score *= relevance_multiplier
-            it_infrastructure_score *= relevance_multiplier
-        
-        # Normalize scores to reasonable ranges (0-100 scale)
-        scores = {
-            "programming_score": round(max(0, min(100, programming_score)), 2),
-            "design_score": round(max(0, min(100, design_score)), 2),
-            "it_infrastructure_score": round(max(0, min(100, it_infrastructure_score)), 2),
-            "co_curricular_points": round(max(0, min(100, co_curricular_points)), 2),
-            "feedback_sentiment_score": round(max(0, min(100, feedback_sentiment_score)), 2),
-            "professional_engagement_score": round(max(0, min(100, professional_engagement_score)), 2)
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
         }
-        
+
+
+def predict_batch_from_data(student_ids, data: dict, trace=NULL_TRACE):
+    """
+    Predict scores for a whole cohort from already-fetched data
+    (see data_access.SupabaseDataClient.fetch_students).
+
+    Features are stacked into one matrix and scored with a single `model.predict` call.
+    """
+    try:
+        with trace.stage("load_model"):
+            model = load_model()
+    except FileNotFoundError as e:
         return {
-            "success": True,
-            "student_id": student_id,
-            "scores": scores,
-            "features": {
-                "total_units": float(X["total_units"].iloc[0]),
-                "avg_grade_point": float(X["avg_grade_point"].iloc[0]),
-                "num_courses": int(X["num_courses"].iloc[0]),
-                "comments_total_len": int(X["comments_total_len"].iloc[0]),
-                "programming_courses": extended_features["programming_courses"],
-                "design_courses": extended_features["design_courses"],
-                "infrastructure_courses": extended_features["infrastructure_courses"],
-                "degree_gpa": extended_features["degree_gpa"],
-                "diploma_gpa": extended_features.get("diploma_gpa", 0),
-                "has_degree_courses": has_degree_courses,
-                "has_diploma_courses": has_diploma_courses,
-            }
+            "success": False,
+            "error": str(e)
         }
-        
+
+    courses = pd.DataFrame(data["courses"])
+    comments = pd.DataFrame(data["comments"])
+    activities = pd.DataFrame(data["activities"])
+    # Plain rows: through a DataFrame, a missing URL next to present ones would become NaN
+    profiles_by_id = {row["id"]: row for row in data["profiles"]}
+
+    # Featurize the whole cohort at once so the model runs over one stacked matrix
+    with trace.stage("features"):
+        X_all, features_by_student = build_features_bulk(student_ids, courses, comments)
+    with trace.stage("model"):
+        base_predictions = model.predict(X_all)
+
+    with trace.stage("profile"):
+        url_triples = {}
+        for sid in student_ids:
+            urls = profiles_by_id.get(sid, {})
+            url_triples[sid] = (urls.get("github_url") or "", urls.get("linkedin_url") or "", urls.get("portfolio_url") or "")
+        analyses = analyze_profiles(set(url_triples.values()))
+        profiles_by_student = {sid: analyses[urls] for sid, urls in url_triples.items()}
+
+    # Same formulas as calculate_scores(), evaluated column-wise over the cohort (see score_rules.py)
+    with trace.stage("scores"):
+        scores_df = score_rules.score_frame(
+            score_rules.cohort_features(features_by_student, activities, profiles_by_student)
+        )
+    scores_by_student = scores_df.to_dict("index")
+
+    results = []
+    for i, sid in enumerate(student_ids):
+        extended_features = features_by_student[sid]
+        results.append({
+            "success": True,
+            "student_id": sid,
+            "scores": scores_by_student[sid],
+            "features": summarize_features(
+                X_all.iloc[[i]], extended_features,
+                extended_features["degree_courses"] > 0, extended_features.get("diploma_courses", 0) > 0
+            )
+        })
+
+    return {
+        "success": True,
+        "count": len(results),
+        "written": 0,
+        "results": results
+    }
+
+
+def predict_batch(student_ids, write_back: bool = True, trace=NULL_TRACE):
+    """
+    Predict scores for a whole cohort.
+
+    Data for all students is fetched in bulk, scored in one pass and
+    (optionally) written back to the students table.
+    """
+    try:
+        student_ids = list(dict.fromkeys(int(sid) for sid in student_ids))
+        if not student_ids:
+            return {"success": True, "count": 0, "written": 0, "results": []}
+
+        async def run_batch(client):
+            with trace.stage("fetch"):
+                data = await client.fetch_students(student_ids)
+            output = predict_batch_from_data(student_ids, data, trace)
+            if output["success"] and write_back:
+                with trace.stage("write"):
+                    output["written"] = await client.update_scores(output["results"])
+            return output
+
+        return data_access.run(run_batch)
+
     except Exception as e:
         return {
             "success": False,
@@ -625,24 +604,59 @@ def predict_scores(student_id: int):
         }
 
 
+def fetch_all_student_ids():
+    """Return every student id in the students table"""
+    return data_access.run(lambda client: client.fetch_all_student_ids())
+
+
+def read_ids_file(path: str):
+    """Read student ids from a file (one per line, or comma separated)"""
+    with open(path, encoding="utf-8") as f:
+        return [int(tok) for tok in re.split(r"[\s,]+", f.read()) if tok]
+
+
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
+    import argparse
+    parser = argparse.ArgumentParser(description="Predict student scores")
+    parser.add_argument("student_id", nargs="?", help="Predict a single student")
+    parser.add_argument("--all", action="store_true", help="Predict every student in the database")
+    parser.add_argument("--ids-file", help="Predict the student ids listed in this file")
+    parser.add_argument("--no-write", action="store_true", help="Batch mode: do not write scores back to Supabase")
+    parser.add_argument("--debug", action="store_true",
+                        help="Record the co-curricular inputs and calculation in the log event (see structured_log.py)")
+    args = parser.parse_args()
+
+    if args.all or args.ids_file:
+        try:
+            student_ids = fetch_all_student_ids() if args.all else read_ids_file(args.ids_file)
+            trace = log.start_trace("predict_batch", debug=args.debug, students=len(student_ids))
+            result = predict_batch(student_ids, write_back=not args.no_write, trace=trace)
+            trace.finish("info" if result.get("success") else "error",
+                         success=result.get("success"), error=result.get("error"))
+            print(json.dumps(result))
+            sys.exit(0 if result.get("success") else 1)
+        except ValueError as e:
+            print(json.dumps({"success": False, "error": f"Invalid student id in {args.ids_file}: {str(e)}"}))
+            sys.exit(1)
+
+    if args.student_id is None:
         print(json.dumps({"success": False, "error": "Missing student_id argument"}))
         sys.exit(1)
     
     try:
-        student_id = int(sys.argv[1])
-        print(f"\n=== STARTING PREDICTION FOR STUDENT {student_id} ===", file=sys.stderr)
-        result = predict_scores(student_id)
-        print(f"\n=== PREDICTION COMPLETE ===", file=sys.stderr)
-        print(json.dumps(result))
+        student_id = int(args.student_id)
     except ValueError as e:
         print(json.dumps({"success": False, "error": f"Invalid student_id (must be an integer): {str(e)}"}), file=sys.stderr)
         sys.exit(1)
+
+    trace = log.start_trace("predict", debug=args.debug, student_id=student_id)
+    try:
+        result = predict_scores(student_id, trace)
+        trace.finish("info" if result.get("success") else "error",
+                     success=result.get("success"), error=result.get("error"))
+        print(json.dumps(result))
     except Exception as e:
         import traceback
-        error_trace = traceback.format_exc()
-        print(f"\n=== PREDICTION ERROR ===", file=sys.stderr)
-        print(error_trace, file=sys.stderr)
+        trace.finish("error", success=False, error=str(e), traceback=traceback.format_exc())
         print(json.dumps({"success": False, "error": f"Prediction failed: {str(e)}"}), file=sys.stderr)
         sys.exit(1)
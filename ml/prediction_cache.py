@@ -0,0 +1,87 @@
+# ml/prediction_cache.py
+"""
+In-memory cache of prediction results.
+
+A student's scores only change when their courses, comments, co-curricular
+activities or profile URLs change, or when a new model is loaded, yet every
+dashboard retrain used to re-run profile analysis, feature building and the
+forest. Results are cached under a key derived from:
+
+- a fingerprint of the values that feed the features, model and score rules:
+  course codes, names, grades and units, comment lengths and activity scores
+  (or the student's feature-store aggregates, without the label scores batch
+  write-back rewrites), together with the profile-analysis bonuses
+- the content hash of the loaded model artifact
+
+so any change to either (including a re-analysed profile) yields a new key and
+stale entries simply age out. A hit saves features, the model and the scores,
+not the reads: the Supabase path still fetches the rows to compute the key;
+with the feature store, no Supabase query is made at all. Predictions made while the profile analysis was
+unavailable are not cached. The key doubles as the ETag of /predict. The table
+is a bounded LRU (PREDICTION_CACHE_SIZE), entries expire after
+PREDICTION_CACHE_TTL seconds (default PROFILE_CACHE_TTL), and get() returns a
+copy so callers cannot change a cached result.
+"""
+
+import os
+import copy
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", 10000))
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", os.environ.get("PROFILE_CACHE_TTL", 24 * 3600)))
+
+
+def fingerprint(inputs) -> str:
+    """Hash of JSON-serializable prediction inputs (rows are expected in a stable order)"""
+    payload = json.dumps(inputs, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class PredictionCache:
+    def __init__(self, max_size: int = PREDICTION_CACHE_SIZE, ttl: float = PREDICTION_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # key -> (stored_at, output)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(student_id: int, inputs_fingerprint: str, model_version: str) -> str:
+        """Cache key of one prediction, also used as its ETag"""
+        return fingerprint([student_id, inputs_fingerprint, model_version])
+
+    def get(self, key: str) -> dict | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, output: dict):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), copy.deepcopy(output))
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,296 @@
+# ml/prefork_server.py
+"""
+Pre-fork serving mode: one master process and SERVER_WORKERS uvicorn workers.
+
+A single uvicorn process caps prediction throughput at one core, and starting
+N independent servers would deserialize the forest N times. Instead the master
+loads the model and the static tables (grade maps, course-category index),
+binds the listening socket and forks the workers, which share those pages
+copy-on-write. gc.freeze() before each fork keeps the collector from touching
+(and so copying) the inherited objects.
+
+The master supervises the workers:
+
+- a worker that exits unexpectedly is restarted (at most once per
+  RESTART_BACKOFF seconds per slot)
+- workers do not hot-reload the model themselves; the master checks the
+  artifact every MODEL_RELOAD_INTERVAL seconds and, when it changed (or on
+  SIGHUP), loads it once and rolls the workers: each is replaced by a fresh
+  fork that shares the new model, and retired with SIGTERM once its
+  replacement is accepting connections, so in-flight requests finish
+- SIGTERM / SIGINT stop every worker gracefully (SIGKILL after
+  WORKER_STOP_TIMEOUT seconds)
+
+Background jobs (job_queue.py) run in one more forked process, the job
+runner: workers only record submitted jobs, and the runner claims queued
+rows every JOB_POLL_INTERVAL seconds and runs them on its pool. It is
+restarted like a worker if it exits, but never rolled, so replacing a
+worker cannot strand or cancel jobs.
+
+Each worker keeps its own prediction pool and caches. Workers write their
+metrics to a shared METRICS_DIR (a temporary directory unless set), so
+/metrics reports the whole server whichever worker answers; see telemetry.py.
+
+Usage:
+    SERVER_WORKERS=4 python api_server.py
+"""
+
+import gc
+import os
+import math
+import time
+import select
+import signal
+import socket
+import shutil
+import sqlite3
+import asyncio
+import tempfile
+import uvicorn
+
+import api_server
+import predict_student
+import structured_log as log
+import telemetry
+from job_queue import JobQueue, JOB_POLL_INTERVAL
+
+WORKER_READY_TIMEOUT = float(os.environ.get("WORKER_READY_TIMEOUT", 60))  # seconds
+WORKER_STOP_TIMEOUT = float(os.environ.get("WORKER_STOP_TIMEOUT", 30))    # seconds
+RESTART_BACKOFF = 1.0   # seconds between restarts of a worker slot
+POLL_INTERVAL = 0.5     # seconds between supervisor checks
+JOB_RUNNER_SLOT = "jobs"
+
+
+def bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket, ready_fd: int):
+    """Forked child: serve on the inherited socket until SIGTERM; writes to ready_fd once started"""
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        signal.signal(signum, signal.SIG_DFL)
+
+    api_server.PRELOADED = True
+    # Submitted jobs are left to the job runner
+    api_server.RUN_JOBS = False
+    # Reloads are rolled out by the master with fresh workers
+    predict_student.MODEL_REGISTRY.check_interval = math.inf
+    # Connections and threads do not survive fork
+    predict_student.PROFILE_CACHE.reopen()
+    if telemetry.EXPORTER is not None:
+        telemetry.EXPORTER.start()
+    telemetry.start_snapshots()
+
+    server = uvicorn.Server(uvicorn.Config(api_server.app, lifespan="on"))
+
+    async def serve():
+        task = asyncio.create_task(server.serve(sockets=[sock]))
+        while not server.started and not task.done():
+            await asyncio.sleep(0.05)
+        if server.started:
+            os.write(ready_fd, b"1")
+        os.close(ready_fd)
+        await task
+
+    asyncio.run(serve())
+
+
+def run_job_runner(sock: socket.socket, ready_fd: int):
+    """Forked child: run the jobs every worker submits until SIGTERM; writes to ready_fd once started"""
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGHUP, signal.SIG_DFL)
+    sock.close()
+
+    # Resumes the jobs interrupted by the last shutdown (or by a crash of the previous runner)
+    queue = JobQueue()
+    queue.start()
+    os.write(ready_fd, b"1")
+    os.close(ready_fd)
+    try:
+        while not stopping:
+            time.sleep(JOB_POLL_INTERVAL)
+            try:
+                claimed = queue.dispatch_queued()
+            except sqlite3.Error as e:
+                log.warning("job_dispatch_failed", error=str(e))
+                continue
+            if claimed:
+                log.info("jobs_claimed", jobs=claimed)
+    finally:
+        queue.shutdown(wait=False)
+
+
+class Supervisor:
+    def __init__(self, workers: int, sock: socket.socket):
+        self.workers = workers
+        self.sock = sock
+        self.slots = {}          # pid -> slot
+        self.started = {}        # slot -> monotonic start time
+        self.retiring = {}       # pid -> SIGKILL deadline
+        self.model_version = predict_student.MODEL_REGISTRY.version
+        self.stopping = False
+        self.roll_requested = False
+
+    def spawn(self, slot) -> bool:
+        """Fork a worker (or the job runner) for `slot`; returns True once it is ready"""
+        r, w = os.pipe()
+        gc.collect()
+        gc.freeze()
+        pid = os.fork()
+        if pid == 0:
+            os.close(r)
+            code = 0
+            try:
+                if slot == JOB_RUNNER_SLOT:
+                    run_job_runner(self.sock, w)
+                else:
+                    run_worker(self.sock, w)
+            except BaseException as e:
+                log.error("worker_crashed", slot=slot, error=str(e))
+                code = 1
+            finally:
+                os._exit(code)
+
+        gc.unfreeze()
+        os.close(w)
+        self.slots[pid] = slot
+        self.started[slot] = time.monotonic()
+        try:
+            readable, _, _ = select.select([r], [], [], WORKER_READY_TIMEOUT)
+            ready = bool(readable) and os.read(r, 1) == b"1"
+        finally:
+            os.close(r)
+        if ready:
+            log.info("worker_started", slot=slot, pid=pid, model=(self.model_version or "none")[:12])
+        else:
+            log.error("worker_not_ready", slot=slot, pid=pid)
+        return ready
+
+    def retire(self, pid: int):
+        self.slots.pop(pid, None)
+        self.retiring[pid] = time.monotonic() + WORKER_STOP_TIMEOUT
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def reap(self):
+        """Collect exited workers and restart the ones that were not asked to stop"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            try:
+                telemetry.retire_snapshot(pid)
+            except OSError as e:
+                log.warning("metrics_retire_failed", pid=pid, error=str(e))
+            if self.retiring.pop(pid, None) is not None:
+                continue
+            slot = self.slots.pop(pid, None)
+            if slot is None:
+                continue
+            log.warning("worker_exited", slot=slot, pid=pid, status=os.waitstatus_to_exitcode(status))
+            if not self.stopping:
+                wait = self.started[slot] + RESTART_BACKOFF - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                self.spawn(slot)
+
+        now = time.monotonic()
+        for pid, deadline in list(self.retiring.items()):
+            if now > deadline:
+                log.warning("worker_killed", pid=pid)
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    self.retiring.pop(pid)
+
+    def model_changed(self) -> bool:
+        try:
+            predict_student.MODEL_REGISTRY.get()
+        except FileNotFoundError:
+            return False
+        return predict_student.MODEL_REGISTRY.version != self.model_version
+
+    def roll(self):
+        """Replace every worker with a fresh fork of the master, one at a time"""
+        self.model_version = predict_student.MODEL_REGISTRY.version
+        log.info("workers_rolling", workers=len(self.slots), model=(self.model_version or "none")[:12])
+        for pid, slot in list(self.slots.items()):
+            if self.stopping:
+                return
+            if slot == JOB_RUNNER_SLOT:
+                # Jobs run in their own spawned processes; replacing the runner would only interrupt them
+                continue
+            if not self.spawn(slot):
+                # Keep the old worker; the new one is reaped (and retried) if it exits
+                log.error("workers_roll_aborted", slot=slot)
+                return
+            self.retire(pid)
+
+    def run(self):
+        def stop(signum, frame):
+            self.stopping = True
+
+        def request_roll(signum, frame):
+            self.roll_requested = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGHUP, request_roll)
+
+        for slot in range(self.workers):
+            self.spawn(slot)
+        self.spawn(JOB_RUNNER_SLOT)
+
+        while not self.stopping:
+            time.sleep(POLL_INTERVAL)
+            self.reap()
+            if self.roll_requested or self.model_changed():
+                self.roll_requested = False
+                self.roll()
+
+        self.shutdown()
+
+    def shutdown(self):
+        log.info("workers_stopping", workers=len(self.slots))
+        for pid in list(self.slots):
+            self.retire(pid)
+        while self.retiring:
+            self.reap()
+            time.sleep(0.1)
+        self.sock.close()
+
+
+def serve(workers: int, host: str = "0.0.0.0", port: int = 8000):
+    if not hasattr(os, "fork"):
+        raise RuntimeError("SERVER_WORKERS > 1 needs os.fork (not available on Windows)")
+    api_server.preload()
+    own_metrics_dir = not telemetry.METRICS_DIR
+    if own_metrics_dir:
+        telemetry.METRICS_DIR = tempfile.mkdtemp(prefix="ml-metrics-")
+    else:
+        # Totals start over with the server
+        telemetry.clear_snapshots()
+    sock = bind(host, port)
+    log.info("prefork_server_listening", host=host, port=port, workers=workers)
+    try:
+        Supervisor(workers, sock).run()
+    finally:
+        if own_metrics_dir:
+            shutil.rmtree(telemetry.METRICS_DIR, ignore_errors=True)
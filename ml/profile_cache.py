@@ -0,0 +1,169 @@
+# ml/profile_cache.py
+"""
+Persistent cache for /api/analyze-profile results.
+
+Profile URLs rarely change, yet every rescore used to call the profile
+analysis API (up to 15 s). Results are stored in a local SQLite file keyed by
+the (github_url, linkedin_url, portfolio_url) triple:
+
+- entries younger than PROFILE_CACHE_TTL are served directly
+- with PROFILE_CACHE_STALE > 0, entries up to TTL + STALE old are served
+  immediately while a background refresh fetches a new result
+- the table is bounded to PROFILE_CACHE_MAX_ENTRIES (least recently used evicted)
+- concurrent requests for the same triple share one in-flight API call
+- pre-forked server workers (prefork_server.py) each reopen the file and share it
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from concurrent.futures import Future
+import structured_log as log
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILE_CACHE_PATH = os.environ.get("PROFILE_CACHE_PATH", os.path.join(SCRIPT_DIR, "profile_cache.sqlite3"))
+PROFILE_CACHE_TTL = float(os.environ.get("PROFILE_CACHE_TTL", 24 * 3600))        # seconds
+PROFILE_CACHE_STALE = float(os.environ.get("PROFILE_CACHE_STALE", 0))            # seconds, 0 = off
+PROFILE_CACHE_MAX_ENTRIES = int(os.environ.get("PROFILE_CACHE_MAX_ENTRIES", 5000))
+
+
+class ProfileAnalysisCache:
+    def __init__(self, path: str = PROFILE_CACHE_PATH, ttl: float = PROFILE_CACHE_TTL,
+                 stale_ttl: float = PROFILE_CACHE_STALE, max_entries: int = PROFILE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._conn = None   # opened on first use, so importing prediction code creates no file
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # Callers hold self._lock
+        if self._conn is None:
+            db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS profile_analysis ("
+                " key TEXT PRIMARY KEY, analysis TEXT NOT NULL,"
+                " fetched_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS idx_profile_last_used ON profile_analysis(last_used)")
+            db.commit()
+            self._conn = db
+        return self._conn
+
+    def reopen(self):
+        """
+        Reconnect in a forked worker process: SQLite connections (and locks
+        held at fork time) must not be shared with the parent.
+        """
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._conn = None
+
+    @staticmethod
+    def key(github_url: str, linkedin_url: str, portfolio_url: str) -> str:
+        return json.dumps([github_url or "", linkedin_url or "", portfolio_url or ""])
+
+    def get(self, github_url: str, linkedin_url: str, portfolio_url: str, fetch):
+        """
+        Return the analysis for a URL triple, calling `fetch(github_url, linkedin_url,
+        portfolio_url)` on a miss. `fetch` returns the analysis dict, or None when
+        the API gave no usable result (not cached). Exceptions from `fetch` propagate.
+        """
+        urls = (github_url, linkedin_url, portfolio_url)
+        key = self.key(*urls)
+        now = time.time()
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT analysis, fetched_at FROM profile_analysis WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                age = now - row[1]
+                if age < self.ttl + self.stale_ttl:
+                    self._db.execute("UPDATE profile_analysis SET last_used = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    if age < self.ttl:
+                        self.hits += 1
+                    else:
+                        self.stale_hits += 1
+                        self._refresh_in_background(key, urls, fetch)
+                    return json.loads(row[0])
+            self.misses += 1
+
+        return self._fetch_once(key, urls, fetch)
+
+    def _fetch_once(self, key: str, urls: tuple, fetch):
+        """Single-flight: only one caller per key runs `fetch`, the rest wait for its result"""
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            analysis = fetch(*urls)
+            if analysis is not None:
+                self._store(key, analysis)
+            future.set_result(analysis)
+            return analysis
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _refresh_in_background(self, key: str, urls: tuple, fetch):
+        # Called with self._lock held
+        if key in self._inflight:
+            return
+
+        def refresh():
+            try:
+                self._fetch_once(key, urls, fetch)
+            except Exception as e:
+                log.warning("profile_refresh_failed", error=str(e))
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def _store(self, key: str, analysis: dict):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO profile_analysis (key, analysis, fetched_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(analysis), now, now)
+            )
+            (count,) = self._db.execute("SELECT COUNT(*) FROM profile_analysis").fetchone()
+            if count > self.max_entries:
+                self._db.execute(
+                    "DELETE FROM profile_analysis WHERE key IN ("
+                    " SELECT key FROM profile_analysis ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            (size,) = self._db.execute("SELECT COUNT(*) FROM profile_analysis").fetchone()
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "size": size,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,354 @@
+# ml/score_rules.py
+"""
+Vectorized rule engine for the six domain scores.
+
+The formulas (see the predict_student.py header for their references) are
+data: WEIGHTS holds every coefficient and RULES says, per score, which feature
+columns are multiplied by which weight, under which condition, with which cap
+and whether the computing-relevance boost applies. score_frame() evaluates
+RULES as NumPy column operations over a whole cohort at once, and score_row()
+evaluates the same table in plain Python for one student (calculate_scores).
+
+Both give the results of the original scalar formulas bit for bit: every
+column operation is the same IEEE-754 double operation, in the same order,
+and the final round(x, 2) is reproduced exactly (see round2).
+
+What-if: score_frame(features, weights={**WEIGHTS, "programming.gpa": 30})
+rescores every student with a changed weight; what_if() returns the old and
+new scores side by side.
+
+Usage:
+    python score_rules.py --what-if programming.gpa=30 feedback.base=40
+"""
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+SCORES = [
+    "programming_score", "design_score", "it_infrastructure_score",
+    "co_curricular_points", "feedback_sentiment_score", "professional_engagement_score",
+]
+
+# Extra input columns next to the build_features() columns
+ACTIVITY_COLUMNS = ["activity_count", "impact", "leadership", "relevance"]
+PROFILE_COLUMNS = ["github_bonus", "portfolio_bonus", "linkedin_bonus", "computing_relevance"]
+
+WEIGHTS = {
+    # 1. Programming: (Domain_GPA × 25) + (Course_Count × 2.5)
+    "programming.gpa": 25,
+    "programming.courses": 2.5,
+    # 2. Design: (Design_GPA × 25) + (Soft_Skills_GPA × 15) + (HCI_Courses × 5)
+    "design.gpa": 25,
+    "design.soft_skills_gpa": 15,
+    "design.courses": 5,
+    # 3. IT infrastructure: (Infrastructure_GPA × 25) + (Theory_GPA × 15) + (Infrastructure_Courses × 3)
+    "infrastructure.gpa": 25,
+    "infrastructure.theory_gpa": 15,
+    "infrastructure.courses": 3,
+    # Scores 1-3 without courses in the domain: effective GPA × 20
+    "fallback.gpa": 20,
+    # 4. Co-curricular: AI activity averages, activity count and soft skills
+    "co_curricular.impact": 0.30,
+    "co_curricular.leadership": 0.25,
+    "co_curricular.relevance": 0.20,
+    "co_curricular.activity_points": 10,
+    "co_curricular.activity_cap": 100,
+    "co_curricular.activities": 0.10,
+    "co_curricular.soft_skills_courses": 8,
+    "co_curricular.soft_skills_gpa": 15,
+    "co_curricular.soft_skills": 0.15,
+    # 5. Feedback sentiment: MIN(100, 50 + Comments_Length × 0.05), else GPA × 15
+    "feedback.base": 50,
+    "feedback.comment_len": 0.05,
+    "feedback.cap": 100,
+    "feedback.fallback_gpa": 15,
+    # 6. Professional engagement: (Comments × 0.1) + (GPA × 10) + profile bonuses
+    "engagement.comment_len": 0.1,
+    "engagement.gpa": 10,
+    # Scores 1-3 × (1 + computing_relevance / 1000) when relevance > 0
+    "relevance.divisor": 1000,
+}
+
+# Per score: `when` column > 0 selects `then`, else `else`. A formula is
+# base + term + term ... (left to right), each term `column × weight` (weight None = the
+# column as is), optionally capped with min(cap, ...). `boost` applies the relevance multiplier.
+RULES = {
+    "programming_score": {
+        "when": "programming_courses",
+        "then": {"terms": [("programming_gpa", "programming.gpa"), ("programming_courses", "programming.courses")]},
+        "else": {"terms": [("effective_gpa", "fallback.gpa")]},
+        "boost": True,
+    },
+    "design_score": {
+        "when": "design_courses",
+        "then": {"terms": [("design_gpa", "design.gpa"), ("soft_skills_gpa", "design.soft_skills_gpa"),
+                           ("design_courses", "design.courses")]},
+        "else": {"terms": [("effective_gpa", "fallback.gpa")]},
+        "boost": True,
+    },
+    "it_infrastructure_score": {
+        "when": "infrastructure_courses",
+        "then": {"terms": [("infrastructure_gpa", "infrastructure.gpa"), ("theory_gpa", "infrastructure.theory_gpa"),
+                           ("infrastructure_courses", "infrastructure.courses")]},
+        "else": {"terms": [("effective_gpa", "fallback.gpa")]},
+        "boost": True,
+    },
+    "co_curricular_points": {
+        "then": {"terms": [("avg_impact", "co_curricular.impact"), ("avg_leadership", "co_curricular.leadership"),
+                           ("avg_relevance", "co_curricular.relevance"), ("activity_points", "co_curricular.activities"),
+                           ("soft_skills_points", "co_curricular.soft_skills")]},
+    },
+    "feedback_sentiment_score": {
+        "when": "comments_total_len",
+        "then": {"base": "feedback.base", "terms": [("comments_total_len", "feedback.comment_len")],
+                 "cap": "feedback.cap"},
+        "else": {"terms": [("effective_gpa", "feedback.fallback_gpa")]},
+    },
+    "professional_engagement_score": {
+        "then": {"terms": [("comments_total_len", "engagement.comment_len"), ("effective_gpa", "engagement.gpa"),
+                           ("github_bonus", None), ("portfolio_bonus", None), ("linkedin_bonus", None)]},
+    },
+}
+
+
+def round2(x: np.ndarray) -> np.ndarray:
+    """
+    Python's round(x, 2) for an array: the exact x × 100 (Dekker product, x = hi + lo)
+    rounded half-to-even, divided by 100. np.round(x, 2) rounds the already-rounded
+    product and differs from round() for some inputs.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    p = x * 100
+    split = x * 134217729.0  # 2**27 + 1
+    hi = split - (split - x)
+    lo = x - hi
+    err = (hi * 100 - p) + lo * 100   # p + err == x * 100 exactly
+    n = np.floor(p)
+    # p - n - 0.5 is exact and, when nonzero, larger than |err|: only exact-looking ties need err
+    d = (p - n) - 0.5
+    up = (d > 0) | ((d == 0) & ((err > 0) | ((err == 0) & (np.fmod(n, 2) != 0))))
+    return np.where(up, n + 1, n) / 100
+
+
+def derive(features: pd.DataFrame, weights: dict) -> dict:
+    """Input columns plus the intermediate columns the rules refer to"""
+    col = {name: features[name].to_numpy() for name in features.columns}
+
+    # Effective GPA: degree GPA if the student has degree courses, else diploma GPA, else overall
+    has_degree = col["degree_courses"] > 0
+    col["effective_gpa"] = np.where(
+        has_degree & (col["degree_gpa"] > 0), col["degree_gpa"],
+        np.where(~has_degree & (col["diploma_gpa"] > 0), col["diploma_gpa"], col["avg_grade_point"])
+    )
+
+    # Average AI activity scores (0 without activities)
+    count = col["activity_count"]
+    for total, avg in (("impact", "avg_impact"), ("leadership", "avg_leadership"), ("relevance", "avg_relevance")):
+        values = col[total].astype(np.float64)
+        col[avg] = np.divide(values, count, out=np.zeros(len(count)), where=count > 0)
+
+    col["activity_points"] = np.minimum(count * weights["co_curricular.activity_points"],
+                                        weights["co_curricular.activity_cap"])
+    col["soft_skills_points"] = ((col["soft_skills_courses"] * weights["co_curricular.soft_skills_courses"])
+                                 + (col["soft_skills_gpa"] * weights["co_curricular.soft_skills_gpa"]))
+    return col
+
+
+def _formula(formula: dict, col: dict, weights: dict, n: int) -> np.ndarray:
+    value = None
+    if formula.get("base") is not None:
+        value = np.full(n, weights[formula["base"]], dtype=np.float64)
+    for column, weight in formula["terms"]:
+        term = col[column] if weight is None else col[column] * weights[weight]
+        value = term if value is None else value + term
+    if formula.get("cap") is not None:
+        value = np.minimum(weights[formula["cap"]], value)
+    return value
+
+
+def score_frame(features: pd.DataFrame, weights: dict | None = None, rules: dict = RULES) -> pd.DataFrame:
+    """
+    Scores for every row of `features`: the build_features() columns (DEFAULT_FEATURES),
+    ACTIVITY_COLUMNS totals and PROFILE_COLUMNS bonuses (see cohort_features). Returns a
+    frame of SCORES on the same index, equal to score_row() row by row.
+    """
+    weights = WEIGHTS if weights is None else {**WEIGHTS, **weights}
+    col = derive(features, weights)
+    n = len(features)
+    relevance = col["computing_relevance"]
+    multiplier = 1 + (relevance / weights["relevance.divisor"])
+
+    out = {}
+    for name in SCORES:
+        rule = rules[name]
+        value = _formula(rule["then"], col, weights, n)
+        if rule.get("when"):
+            value = np.where(col[rule["when"]] > 0, value, _formula(rule["else"], col, weights, n))
+        if rule.get("boost"):
+            value = np.where(relevance > 0, value * multiplier, value)
+        out[name] = round2(np.maximum(0, np.minimum(100, value)))
+    return pd.DataFrame(out, index=features.index)
+
+
+def derive_row(features: dict, weights: dict) -> dict:
+    """derive() for one student, on plain Python numbers"""
+    col = dict(features)
+
+    has_degree = col["degree_courses"] > 0
+    if has_degree and col["degree_gpa"] > 0:
+        col["effective_gpa"] = col["degree_gpa"]
+    elif not has_degree and col["diploma_gpa"] > 0:
+        col["effective_gpa"] = col["diploma_gpa"]
+    else:
+        col["effective_gpa"] = col["avg_grade_point"]
+
+    count = col["activity_count"]
+    for total, avg in (("impact", "avg_impact"), ("leadership", "avg_leadership"), ("relevance", "avg_relevance")):
+        col[avg] = col[total] / count if count > 0 else 0.0
+
+    col["activity_points"] = min(count * weights["co_curricular.activity_points"],
+                                 weights["co_curricular.activity_cap"])
+    col["soft_skills_points"] = ((col["soft_skills_courses"] * weights["co_curricular.soft_skills_courses"])
+                                 + (col["soft_skills_gpa"] * weights["co_curricular.soft_skills_gpa"]))
+    return col
+
+
+def _formula_row(formula: dict, col: dict, weights: dict) -> float:
+    value = None
+    if formula.get("base") is not None:
+        value = float(weights[formula["base"]])
+    for column, weight in formula["terms"]:
+        term = col[column] if weight is None else col[column] * weights[weight]
+        value = term if value is None else value + term
+    if formula.get("cap") is not None:
+        value = min(weights[formula["cap"]], value)
+    return value
+
+
+def _branch(rule: dict, col: dict) -> dict:
+    return rule["then"] if not rule.get("when") or col[rule["when"]] > 0 else rule["else"]
+
+
+def score_row(features: dict, weights: dict | None = None, rules: dict = RULES) -> dict:
+    """
+    Scores of one student: `features` is a build_features() dict with the ACTIVITY_COLUMNS
+    totals and PROFILE_COLUMNS bonuses added. Evaluates the same rules as score_frame()
+    (with the same results) in plain Python, which is much faster than NumPy for one row.
+    """
+    weights = WEIGHTS if weights is None else {**WEIGHTS, **weights}
+    col = derive_row(features, weights)
+    relevance = col["computing_relevance"]
+
+    scores = {}
+    for name in SCORES:
+        rule = rules[name]
+        value = _formula_row(_branch(rule, col), col, weights)
+        if rule.get("boost") and relevance > 0:
+            value = value * (1 + (relevance / weights["relevance.divisor"]))
+        scores[name] = float(round(max(0, min(100, value)), 2))
+    return scores
+
+
+def formula_terms(features: dict, score: str, weights: dict | None = None, rules: dict = RULES) -> dict:
+    """Value of each term of `score` for one student (in the branch its `when` selects), for tracing"""
+    weights = WEIGHTS if weights is None else {**WEIGHTS, **weights}
+    col = derive_row(features, weights)
+    return {column: col[column] if weight is None else col[column] * weights[weight]
+            for column, weight in _branch(rules[score], col)["terms"]}
+
+
+def activity_totals(student_ids, activities: pd.DataFrame) -> pd.DataFrame:
+    """
+    ACTIVITY_COLUMNS per student, summed in record order like calculate_scores()
+    (a grouped sum may add in a different order and differ in the last bit).
+    """
+    totals = {sid: [0, 0, 0, 0] for sid in student_ids}
+    if not activities.empty:
+        for record in activities.to_dict("records"):
+            row = totals.get(record["student_id"])
+            if row is None:
+                continue
+            row[0] += 1
+            row[1] += record.get("ai_impact_score", 0)
+            row[2] += record.get("ai_leadership_score", 0)
+            row[3] += record.get("ai_relevance_score", 0)
+    return pd.DataFrame.from_dict(totals, orient="index", columns=ACTIVITY_COLUMNS)
+
+
+def cohort_features(features_by_student: dict, activities: pd.DataFrame | dict, profiles: dict) -> pd.DataFrame:
+    """
+    score_frame() input: `features_by_student` maps id -> build_features() dict, `activities`
+    is the activity rows (or id -> {"count", "impact", "leadership", "relevance"} totals as
+    the feature store keeps them) and `profiles` maps id -> analyze_profile() result.
+    """
+    ids = list(features_by_student)
+    frame = pd.DataFrame.from_dict(features_by_student, orient="index")
+    if isinstance(activities, dict):
+        totals = pd.DataFrame(
+            [[activities[sid][k] for k in ("count", "impact", "leadership", "relevance")] for sid in ids],
+            index=ids, columns=ACTIVITY_COLUMNS
+        )
+    else:
+        totals = activity_totals(ids, activities)
+    bonuses = pd.DataFrame([[profiles[sid][k] for k in PROFILE_COLUMNS] for sid in ids],
+                           index=ids, columns=PROFILE_COLUMNS)
+    return pd.concat([frame, totals, bonuses], axis=1)
+
+
+def what_if(features: pd.DataFrame, changes: dict, weights: dict | None = None) -> pd.DataFrame:
+    """Scores before and after changing `changes` weights, with the per-score deltas"""
+    base_weights = WEIGHTS if weights is None else {**WEIGHTS, **weights}
+    unknown = set(changes) - set(base_weights)
+    if unknown:
+        raise ValueError(f"Unknown weights: {', '.join(sorted(unknown))}")
+    before = score_frame(features, base_weights)
+    after = score_frame(features, {**base_weights, **changes})
+    return pd.concat({"before": before, "after": after, "delta": after - before}, axis=1)
+
+
+def store_cohort_features(store) -> pd.DataFrame:
+    """score_frame() input for every student in the feature store (cached profile analyses only)"""
+    from predict_student import analyze_profile
+
+    features, activities, profiles = {}, {}, {}
+    for sid in store.student_ids():
+        stored = store.features(sid)
+        urls = stored["profile"]
+        features[sid] = stored["extended"]
+        activities[sid] = stored["activities"]
+        profiles[sid] = analyze_profile(urls.get("github_url") or "", urls.get("linkedin_url") or "",
+                                        urls.get("portfolio_url") or "", fetch=lambda *urls: None)
+    return cohort_features(features, activities, profiles)
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Rescore every student in the feature store with changed weights")
+    p.add_argument("--what-if", nargs="+", required=True, metavar="WEIGHT=VALUE",
+                   help=f"Weights to change, e.g. programming.gpa=30 (known: {', '.join(WEIGHTS)})")
+    args = p.parse_args()
+
+    try:
+        changes = {name: float(value) for name, value in (item.split("=", 1) for item in args.what_if)}
+    except ValueError:
+        p.error("--what-if expects WEIGHT=NUMBER pairs")
+
+    from feature_store import FeatureStore
+    features = store_cohort_features(FeatureStore())
+    start = time.perf_counter()
+    try:
+        result = what_if(features, changes)
+    except ValueError as e:
+        p.error(str(e))
+    elapsed = time.perf_counter() - start
+
+    print(f"Rescored {len(features)} students twice in {elapsed * 1000:.1f} ms", file=sys.stderr)
+    summary = pd.DataFrame({
+        "mean_before": result["before"].mean(),
+        "mean_after": result["after"].mean(),
+        "students_changed": (result["delta"] != 0).sum(),
+        "max_abs_delta": result["delta"].abs().max(),
+    })
+    print(summary.round(3).to_string())
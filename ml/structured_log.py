@@ -0,0 +1,178 @@
+# ml/structured_log.py
+"""
+Structured, level-gated logging for the prediction path.
+
+Events are single JSON lines on stderr ({"ts", "level", "event", ...fields}).
+Prediction used to print multi-line debug blocks (one line per activity) for
+every request; now each request is a Trace that collects per-stage timings and
+emits one event when it finishes.
+
+- LOG_LEVEL (debug / info / warning / error, default info) gates events
+- LOG_SAMPLE_RATE (0-1, default 1) keeps that fraction of request traces;
+  warnings and errors are never sampled out
+- a request that is not logged gets a no-op trace, whose stages and events are
+  no-ops, so disabled logging does no timing or formatting work
+- debug detail (activity scores, the co-curricular calculation) is recorded
+  only for traces started with debug=True (per-request opt-in, e.g.
+  {"debug": true} on /predict) or when LOG_LEVEL=debug
+
+Usage:
+    trace = start_trace("predict", student_id=1, debug=False)
+    with trace.stage("fetch"):
+        ...
+    if trace.debug:
+        trace.event("activity", impact=80)
+    trace.finish(success=True)
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import threading
+from contextlib import nullcontext
+from datetime import datetime, timezone
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "info").lower()
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", 1.0))
+
+_threshold = LEVELS.get(LOG_LEVEL, LEVELS["info"])
+_lock = threading.Lock()
+
+# Set by telemetry.install(): on_stage(trace name, stage, seconds) for every timed stage, logged
+# or not, and on_finish(trace, level, fields, seconds) for every logged trace
+on_stage = None
+on_finish = None
+
+
+def enabled(level: str) -> bool:
+    return LEVELS[level] >= _threshold
+
+
+def emit(level: str, event: str, **fields):
+    """Write one event regardless of LOG_LEVEL (callers check enabled() first)"""
+    record = {"ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"), "level": level, "event": event}
+    record.update(fields)
+    line = json.dumps(record, default=str)
+    with _lock:
+        print(line, file=sys.stderr, flush=True)
+
+
+def log(level: str, event: str, **fields):
+    if LEVELS[level] >= _threshold:
+        emit(level, event, **fields)
+
+
+def debug(event: str, **fields):
+    log("debug", event, **fields)
+
+
+def info(event: str, **fields):
+    log("info", event, **fields)
+
+
+def warning(event: str, **fields):
+    log("warning", event, **fields)
+
+
+def error(event: str, **fields):
+    log("error", event, **fields)
+
+
+class _Stage:
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        trace = self.trace
+        if trace.stages is not None:
+            trace.stages[self.name] = trace.stages.get(self.name, 0) + elapsed * 1000
+            trace.spans.append((self.name, self.start, elapsed, exc[0] is not None))
+        if on_stage is not None:
+            on_stage(trace.name, self.name, elapsed)
+        return False
+
+
+class Trace:
+    """Stage timings and debug events of one request, emitted as one event by finish()"""
+
+    def __init__(self, name: str, debug: bool = False, **fields):
+        self.name = name
+        self.debug = debug
+        self.fields = fields
+        self.stages = {}
+        self.spans = []   # (stage, perf_counter start, seconds, failed)
+        self.events = []
+        self.started_ns = time.time_ns()
+        self._start = time.perf_counter()
+
+    def stage(self, name: str) -> _Stage:
+        return _Stage(self, name)
+
+    def event(self, event: str, **fields):
+        """Debug detail; callers guard expensive fields with `if trace.debug`"""
+        if self.debug:
+            self.events.append({"event": event, **fields})
+
+    def summary(self) -> dict:
+        out = {"ms": round((time.perf_counter() - self._start) * 1000, 3),
+               "stages": {name: round(ms, 3) for name, ms in self.stages.items()}}
+        if self.debug:
+            out["debug"] = self.events
+        return out
+
+    def finish(self, level: str = "info", **fields):
+        summary = self.summary()
+        emit(level, self.name, **self.fields, **fields, **summary)
+        if on_finish is not None:
+            on_finish(self, level, fields, summary["ms"] / 1000)
+
+
+class _NullTrace:
+    """Trace of a request that is not logged: stages and events are no-ops"""
+
+    __slots__ = ("name", "fields")
+    debug = False
+    stages = None
+    _stage = nullcontext()
+
+    def __init__(self, name: str = None, **fields):
+        self.name = name
+        self.fields = fields
+
+    def stage(self, name: str):
+        # Timed only for the stage histograms (see telemetry.py)
+        return self._stage if on_stage is None else _Stage(self, name)
+
+    def event(self, event: str, **fields):
+        pass
+
+    def summary(self):
+        return None
+
+    def finish(self, level: str = "info", **fields):
+        # Failures are logged even when the request was sampled out (without timings)
+        if LEVELS[level] >= max(_threshold, LEVELS["warning"]):
+            emit(level, self.name or "request", **self.fields, **fields)
+
+
+NULL_TRACE = _NullTrace()
+
+
+def start_trace(name: str, debug: bool = False, **fields):
+    """A Trace if the request is logged (debug opt-in, or info enabled and sampled in), else a no-op trace"""
+    if debug:
+        return Trace(name, True, **fields)
+    if _threshold <= LEVELS["info"] and (LOG_SAMPLE_RATE >= 1 or random.random() < LOG_SAMPLE_RATE):
+        return Trace(name, _threshold <= LEVELS["debug"], **fields)
+    return _NullTrace(name, **fields)
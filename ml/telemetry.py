@@ -0,0 +1,468 @@
+# ml/telemetry.py
+"""
+Prometheus metrics and trace export for the ML API.
+
+Metrics live in an in-process registry and are rendered in the Prometheus
+text exposition format by render() (served on GET /metrics):
+
+- ml_stage_duration_seconds{route, stage}: every stage timed with
+  trace.stage() (see structured_log.py): fetch, store, load_model, profile,
+  features, model, scores, write; recorded for every request, sampled or not
+- ml_request_duration_seconds{route} and ml_requests_total{route, outcome}
+  (outcome = success, failure, timeout, or rejected when the worker pool is
+  saturated)
+- ml_requests_in_flight{route} and ml_executor_in_flight (predictions
+  running on the worker pool)
+- ml_profile_analysis_duration_seconds: calls to /api/analyze-profile
+  (cache misses only)
+- ml_cache_hits_total / ml_cache_misses_total / ml_cache_hit_ratio{cache}
+  and model load / reload figures, read from the components' stats() at
+  scrape time
+
+With several pre-forked workers (prefork_server.py) a scrape reaches any one
+of them, so each worker writes its metrics to METRICS_DIR every
+METRICS_FLUSH_INTERVAL seconds and /metrics renders the merge: counters and
+histograms summed over every worker the server has run (the master folds a
+worker's final totals into an archive when it exits, so a roll or restart
+does not make them go backwards), gauges per running worker with a `pid`
+label.
+
+Tracing: with OTEL_EXPORTER_OTLP_ENDPOINT set (e.g. http://localhost:4318 for
+a local OpenTelemetry collector), every logged request trace is exported as a
+span with one child span per stage, in OTLP/HTTP JSON, from a background
+thread. Which requests are traced follows LOG_SAMPLE_RATE.
+"""
+
+import os
+import json
+import time
+import queue
+import secrets
+import threading
+import urllib.request
+import structured_log as log
+
+# Seconds; covers in-memory stages (sub-ms) up to batch rescoring (minutes)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+OTLP_ENDPOINT = os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT", "").rstrip("/")
+SERVICE_NAME = os.environ.get("OTEL_SERVICE_NAME", "student-ml-api")
+EXPORT_INTERVAL = 2.0       # seconds between span batches
+EXPORT_QUEUE_SIZE = 2048    # traces waiting for export; newer ones are dropped when full
+
+# Set by the pre-fork server: workers write their metrics here and /metrics merges them
+METRICS_DIR = os.environ.get("METRICS_DIR", "")
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", 1.0))  # seconds
+ARCHIVE_FILE = "retired.json"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels[name] for name in self.labels)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list:
+        with self._lock:
+            return [(dict(zip(self.labels, key)), value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def track(self, **labels):
+        """Context manager: +1 while the block runs"""
+        return _InFlight(self, labels)
+
+
+class _InFlight:
+    __slots__ = ("gauge", "labels")
+
+    def __init__(self, gauge, labels):
+        self.gauge = gauge
+        self.labels = labels
+
+    def __enter__(self):
+        self.gauge.inc(**self.labels)
+
+    def __exit__(self, *exc):
+        self.gauge.dec(**self.labels)
+        return False
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket (non-cumulative) counts, +Inf last; sum; count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            i = 0
+            while i < len(self.buckets) and value > self.buckets[i]:
+                i += 1
+            state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self) -> list:
+        """(labels, [per-bucket counts, sum, count]) per series"""
+        with self._lock:
+            return [(dict(zip(self.labels, key)), [list(counts), total, n])
+                    for key, (counts, total, n) in self._values.items()]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric: _Metric):
+        self.metrics.append(metric)
+
+    def add_collector(self, collect):
+        """`collect()` returns metric families as (name, kind, help, [(labels dict, value)]) at scrape time"""
+        self.collectors.append(collect)
+
+    def families(self) -> dict:
+        """name -> {"kind", "help", "samples": [(labels, value)], "buckets" (histograms)}"""
+        families = {}
+        for metric in self.metrics:
+            families[metric.name] = {"kind": metric.kind, "help": metric.documentation, "samples": metric.samples()}
+            if metric.kind == "histogram":
+                families[metric.name]["buckets"] = list(metric.buckets)
+        for collect in self.collectors:
+            try:
+                for name, kind, documentation, samples in collect():
+                    family = families.setdefault(name, {"kind": kind, "help": documentation, "samples": []})
+                    family["samples"].extend(samples)
+            except Exception as e:
+                log.warning("metrics_collector_failed", error=str(e))
+        return families
+
+
+def render_families(families: dict) -> str:
+    lines = []
+    for name, family in families.items():
+        lines += [f"# HELP {name} {family['help']}", f"# TYPE {name} {family['kind']}"]
+        for labels, value in family["samples"]:
+            names, values = tuple(labels), tuple(labels.values())
+            if family["kind"] != "histogram":
+                lines.append(f"{name}{_format_labels(names, values)} {_format_value(value)}")
+                continue
+            counts, total, n = value
+            cumulative = 0
+            for bound, count in zip(list(family["buckets"]) + [float("inf")], counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{name}_bucket{_format_labels(names, values, le)} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(names, values)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(names, values)} {n}")
+    return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_SECONDS = Histogram("ml_stage_duration_seconds", "Time spent in each prediction stage", ("route", "stage"))
+REQUEST_SECONDS = Histogram("ml_request_duration_seconds", "End-to-end request time", ("route",))
+REQUESTS = Counter("ml_requests_total", "Requests by outcome (success, failure, timeout, rejected)", ("route", "outcome"))
+IN_FLIGHT = Gauge("ml_requests_in_flight", "Requests being served", ("route",))
+EXECUTOR_IN_FLIGHT = Gauge("ml_executor_in_flight", "Predictions running on the worker pool")
+PROFILE_API_SECONDS = Histogram("ml_profile_analysis_duration_seconds", "Calls to the profile analysis API")
+
+
+def register_cache(name: str, stats):
+    """Export a cache's stats() ({"hits", "misses", optional "stale_hits", "hit_ratio", "size"})"""
+    def collect():
+        s = stats()
+        labels = {"cache": name}
+        return [
+            ("ml_cache_hits_total", "counter", "Cache hits (including stale hits)",
+             [(labels, s["hits"] + s.get("stale_hits", 0))]),
+            ("ml_cache_misses_total", "counter", "Cache misses", [(labels, s["misses"])]),
+            ("ml_cache_hit_ratio", "gauge", "Cache hits / lookups", [(labels, s["hit_ratio"])]),
+            ("ml_cache_entries", "gauge", "Cached entries", [(labels, s["size"])]),
+        ]
+    REGISTRY.add_collector(collect)
+
+
+def register_model(registry):
+    """Export a model_registry.ModelRegistry's load time and reload count"""
+    def collect():
+        info = registry.info()
+        return [
+            ("ml_model_loaded", "gauge", "1 if a model is loaded", [({}, 1 if info["loaded"] else 0)]),
+            ("ml_model_load_seconds", "gauge", "Time the last model load took (hash + load)",
+             [({}, info["load_seconds"] or 0)]),
+            ("ml_model_reloads_total", "counter", "Hot reloads of a changed model artifact", [({}, info["reloads"])]),
+        ]
+    REGISTRY.add_collector(collect)
+
+
+def render() -> str:
+    if METRICS_DIR:
+        write_snapshot()
+        return render_families(merge_snapshots())
+    return render_families(REGISTRY.families())
+
+
+# ── Multi-process metrics ─────────────────────────────────────────────
+
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(METRICS_DIR, f"worker-{pid}.json")
+
+
+def _read_json(path: str, default):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def _write_json(path: str, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def write_snapshot():
+    """Write this process's metrics to METRICS_DIR (atomically replaces its previous snapshot)"""
+    _write_json(_snapshot_path(os.getpid()), REGISTRY.families())
+
+
+def start_snapshots(interval: float = METRICS_FLUSH_INTERVAL):
+    """Write snapshots every `interval` seconds from a daemon thread"""
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                write_snapshot()
+            except OSError as e:
+                log.warning("metrics_snapshot_failed", error=str(e))
+    threading.Thread(target=run, name="metrics-snapshot", daemon=True).start()
+
+
+def _add_family(merged: dict, name: str, family: dict, extra_labels: dict = None):
+    """Add a family's samples into `merged`: counters and histograms are summed per label set"""
+    target = merged.setdefault(name, {**family, "samples": []})
+    if family["kind"] == "gauge":
+        target["samples"] += [({**labels, **(extra_labels or {})}, value) for labels, value in family["samples"]]
+        return
+    series = {tuple(sorted(labels.items())): i for i, (labels, _) in enumerate(target["samples"])}
+    for labels, value in family["samples"]:
+        i = series.get(tuple(sorted(labels.items())))
+        if i is None:
+            series[tuple(sorted(labels.items()))] = len(target["samples"])
+            target["samples"].append((labels, value))
+        elif family["kind"] == "histogram":
+            counts, total, n = target["samples"][i][1]
+            target["samples"][i] = (labels, [[a + b for a, b in zip(counts, value[0])], total + value[1], n + value[2]])
+        else:
+            target["samples"][i] = (labels, target["samples"][i][1] + value)
+
+
+def merge_snapshots() -> dict:
+    """
+    Families of every worker in METRICS_DIR: counters and histograms summed over
+    all workers, including exited ones (see retire_snapshot), and gauges kept
+    per running worker with a `pid` label.
+    """
+    # The archive is read before the snapshots so a worker being retired is counted once
+    archive = _read_json(os.path.join(METRICS_DIR, ARCHIVE_FILE), {"pids": [], "families": {}})
+    merged = {}
+    for name, family in archive["families"].items():
+        _add_family(merged, name, family)
+    for entry in sorted(os.listdir(METRICS_DIR)):
+        if not (entry.startswith("worker-") and entry.endswith(".json")):
+            continue
+        pid = int(entry[len("worker-"):-len(".json")])
+        families = _read_json(os.path.join(METRICS_DIR, entry), None)
+        if pid in archive["pids"] or families is None:
+            continue
+        for name, family in families.items():
+            _add_family(merged, name, family, {"pid": str(pid)})
+    return merged
+
+
+def clear_snapshots():
+    """Remove the snapshots and archive a previous server left in METRICS_DIR"""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    for entry in os.listdir(METRICS_DIR):
+        if entry.startswith(("worker-", ARCHIVE_FILE)):
+            os.remove(os.path.join(METRICS_DIR, entry))
+
+
+def retire_snapshot(pid: int):
+    """
+    Fold an exited worker's counters and histograms into the archive and drop
+    its snapshot, so totals do not go backwards when a worker is replaced.
+    Called by the pre-fork master only.
+    """
+    path = _snapshot_path(pid)
+    families = _read_json(path, None)
+    if families is None:
+        return
+    archive_path = os.path.join(METRICS_DIR, ARCHIVE_FILE)
+    archive = _read_json(archive_path, {"pids": [], "families": {}})
+    for name, family in families.items():
+        # Gauges describe running workers only
+        _add_family(archive["families"], name, family if family["kind"] != "gauge" else {**family, "samples": []})
+    # Pids whose snapshot is already gone cannot be double counted any more
+    archive["pids"] = [p for p in archive["pids"] if os.path.exists(_snapshot_path(p))] + [pid]
+    _write_json(archive_path, archive)
+    os.remove(path)
+
+
+# ── Trace export ──────────────────────────────────────────────────────
+
+def _attributes(fields: dict) -> list:
+    out = []
+    for key, value in fields.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            out.append({"key": key, "value": {"boolValue": value}})
+        elif isinstance(value, int):
+            out.append({"key": key, "value": {"intValue": str(value)}})
+        elif isinstance(value, float):
+            out.append({"key": key, "value": {"doubleValue": value}})
+        else:
+            out.append({"key": key, "value": {"stringValue": str(value)}})
+    return out
+
+
+def trace_spans(trace, level: str, fields: dict, seconds: float) -> list:
+    """OTLP JSON spans of a finished structured_log.Trace: the request and one child per stage"""
+    trace_id, root_id = secrets.token_hex(16), secrets.token_hex(8)
+    start_ns = trace.started_ns
+    spans = [{
+        "traceId": trace_id, "spanId": root_id, "name": trace.name, "kind": 2,
+        "startTimeUnixNano": str(start_ns), "endTimeUnixNano": str(start_ns + int(seconds * 1e9)),
+        "attributes": _attributes({**trace.fields, **fields}),
+        "status": {"code": 2 if log.LEVELS[level] >= log.LEVELS["error"] else 1},
+    }]
+    for stage, started, elapsed, failed in trace.spans:
+        begin = start_ns + int((started - trace._start) * 1e9)
+        spans.append({
+            "traceId": trace_id, "spanId": secrets.token_hex(8), "parentSpanId": root_id,
+            "name": stage, "kind": 1,
+            "startTimeUnixNano": str(begin), "endTimeUnixNano": str(begin + int(elapsed * 1e9)),
+            "status": {"code": 2 if failed else 1},
+        })
+    return spans
+
+
+class SpanExporter:
+    """Batches spans and POSTs them to an OTLP/HTTP collector ({endpoint}/v1/traces) from a daemon thread"""
+
+    def __init__(self, endpoint: str, service_name: str = SERVICE_NAME, interval: float = EXPORT_INTERVAL):
+        self.url = endpoint + "/v1/traces"
+        self.service_name = service_name
+        self.interval = interval
+        self.exported = 0
+        self.dropped = 0
+        self.start()
+
+    def start(self):
+        """Start the export thread (again in a forked worker, which inherits no threads)"""
+        self._queue = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+        threading.Thread(target=self._run, name="span-export", daemon=True).start()
+
+    def submit(self, spans: list):
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            self.dropped += 1
+
+    def _batch(self) -> list:
+        spans = []
+        while True:
+            try:
+                spans += self._queue.get_nowait()
+            except queue.Empty:
+                return spans
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            spans = self._batch()
+            if spans:
+                self.export(spans)
+
+    def export(self, spans: list):
+        body = json.dumps({"resourceSpans": [{
+            "resource": {"attributes": _attributes({"service.name": self.service_name})},
+            "scopeSpans": [{"scope": {"name": "structured_log"}, "spans": spans}],
+        }]}).encode()
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=5):
+                self.exported += len(spans)
+        except Exception as e:
+            self.dropped += len(spans)
+            log.warning("span_export_failed", url=self.url, spans=len(spans), error=str(e))
+
+
+EXPORTER: SpanExporter | None = None
+
+
+def _on_finish(trace, level, fields, seconds):
+    if EXPORTER is not None:
+        EXPORTER.submit(trace_spans(trace, level, fields, seconds))
+
+
+def install(endpoint: str = OTLP_ENDPOINT):
+    """Record trace stages in ml_stage_duration_seconds and, with an OTLP endpoint, export traces"""
+    global EXPORTER
+    log.on_stage = lambda route, stage, seconds: STAGE_SECONDS.observe(seconds, route=route, stage=stage)
+    if endpoint and EXPORTER is None:
+        EXPORTER = SpanExporter(endpoint)
+        log.on_finish = _on_finish
@@ -1,18 +1,21 @@
 # ml/train_and_upload.py
 import os
-import joblib
 import pandas as pd
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.multioutput import MultiOutputRegressor
 from supabase import create_client
 from dotenv import load_dotenv
+from model_registry import save_model
+from flat_forest import export_forest
 
 load_dotenv()  # loads .env
 
 SUPABASE_URL = os.environ["SUPABASE_URL"]
 SERVICE_ROLE_KEY = os.environ["SUPABASE_SERVICE_ROLE_KEY"]
 BUCKET = os.environ.get("SUPABASE_BUCKET", "ml-models")
-MODEL_FILE = os.environ.get("MODEL_FILE_NAME", "model.joblib")
+# "flat" uploads the compact memory-mappable forest (model.forest) instead of the pickle
+MODEL_FORMAT = os.environ.get("MODEL_FORMAT", "joblib")
+MODEL_FILE = os.environ.get("MODEL_FILE_NAME", "model.forest" if MODEL_FORMAT == "flat" else "model.joblib")
 LOCAL_MODEL_PATH = f"ml/{MODEL_FILE}"
 
 supabase = create_client(SUPABASE_URL, SERVICE_ROLE_KEY)
@@ -89,7 +92,10 @@ def train_and_upload():
     model = MultiOutputRegressor(RandomForestRegressor(n_estimators=100, random_state=42))
     model.fit(X, y)
     os.makedirs(os.path.dirname(LOCAL_MODEL_PATH), exist_ok=True)
-    joblib.dump(model, LOCAL_MODEL_PATH)
+    if MODEL_FORMAT == "flat":
+        export_forest(model, LOCAL_MODEL_PATH)
+    else:
+        save_model(model, LOCAL_MODEL_PATH)
     print("Model saved locally:", LOCAL_MODEL_PATH)
 
     # upload to Supabase Storage bucket
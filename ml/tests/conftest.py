@@ -0,0 +1,6 @@
+# ml/tests/conftest.py
+# The ml modules are scripts run from ml/, not an installed package
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,68 @@
+# ml/tests/fake_postgrest.py
+"""In-memory stand-in for the PostgREST endpoint, served through httpx.MockTransport"""
+
+import json
+import httpx
+
+
+class FakePostgrest:
+    """Answers the subset of PostgREST the client uses: eq./in./gt. filters, limit/offset, POST, PATCH"""
+
+    def __init__(self, tables: dict, fail_posts: int = 0):
+        self.tables = tables
+        self.fail_posts = fail_posts
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        table = request.url.path.rsplit("/", 1)[-1]
+        params = dict(request.url.params)
+        rows = self.tables.setdefault(table, [])
+
+        if request.method == "POST":
+            if self.fail_posts:
+                self.fail_posts -= 1
+                return httpx.Response(503)
+            new = json.loads(request.content)
+            next_id = max((r["id"] for r in rows), default=0) + 1
+            for i, row in enumerate(new):
+                rows.append({"id": next_id + i, **row})
+            inserted = rows[-len(new):]
+            if "select" in params:
+                columns = params["select"].split(",")
+                return httpx.Response(201, json=[{c: r[c] for c in columns} for r in inserted])
+            return httpx.Response(201)
+
+        matched = [r for r in rows if self._matches(r, params)]
+        if request.method == "PATCH":
+            for row in matched:
+                row.update(json.loads(request.content))
+            return httpx.Response(204)
+
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", len(matched)))
+        page = sorted(matched, key=lambda r: r["id"])[offset:offset + limit]
+        if params["select"] == "*":
+            return httpx.Response(200, json=[dict(r) for r in page])
+        columns = params["select"].split(",")
+        return httpx.Response(200, json=[{c: r.get(c) for c in columns} for r in page])
+
+    @staticmethod
+    def _matches(row: dict, params: dict) -> bool:
+        for column, value in params.items():
+            if column in ("select", "order", "limit", "offset"):
+                continue
+            op, _, arg = value.partition(".")
+            if op == "eq" and str(row.get(column)) != arg:
+                return False
+            if op == "in" and str(row.get(column)) not in arg.strip("()").split(","):
+                return False
+            if op == "gt" and not row.get(column) > type(row.get(column))(arg):
+                return False
+        return True
+
+    def gets(self, table: str) -> list:
+        return [r for r in self.requests if r.method == "GET" and r.url.path.endswith(f"/{table}")]
+
+    def posts(self, table: str) -> list:
+        return [r for r in self.requests if r.method == "POST" and r.url.path.endswith(f"/{table}")]
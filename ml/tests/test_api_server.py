@@ -0,0 +1,69 @@
+# ml/tests/test_api_server.py
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from fastapi.testclient import TestClient
+
+import api_server
+import predict_student
+from feature_store import FeatureStore
+
+EVENT = {"type": "INSERT", "table": "students", "record": {"id": 7, "github_url": "https://github.com/x"}}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    store = FeatureStore(str(tmp_path / "features.sqlite3"))
+    monkeypatch.setattr(api_server, "feature_store", store)
+    monkeypatch.setattr(api_server, "ML_WORKERS", 1)
+    monkeypatch.setattr(api_server, "ML_MAX_QUEUED", 0)
+    executor = ThreadPoolExecutor(1)
+    monkeypatch.setattr(api_server, "executor", executor)
+    # Without `with`, the lifespan (model, Supabase client, job queue) is not started
+    yield TestClient(api_server.app)
+    executor.shutdown(wait=True)
+
+
+def test_feature_store_events_refused_without_a_secret(client, monkeypatch):
+    monkeypatch.setattr(api_server, "FEATURE_STORE_WEBHOOK_SECRET", None)
+
+    response = client.post("/feature-store/events", json=EVENT)
+
+    assert response.status_code == 503
+    assert api_server.feature_store.features(7) is None
+
+
+def test_feature_store_events_need_the_secret(client, monkeypatch):
+    monkeypatch.setattr(api_server, "FEATURE_STORE_WEBHOOK_SECRET", "s3cret")
+
+    assert client.post("/feature-store/events", json=EVENT).status_code == 401
+    assert client.post("/feature-store/events", json=EVENT, headers={"X-Webhook-Secret": "wrong"}).status_code == 401
+    assert api_server.feature_store.features(7) is None
+
+    response = client.post("/feature-store/events", json=EVENT, headers={"X-Webhook-Secret": "s3cret"})
+
+    assert response.status_code == 200 and response.json()["applied"] == 1
+
+
+def test_timed_out_predictions_hold_the_pool_until_they_finish(client, monkeypatch):
+    release = threading.Event()
+
+    def slow_prediction(student_id, store, trace):
+        release.wait(10)
+        return {"success": True, "scores": {"programming_score": 80}}
+
+    monkeypatch.setattr(predict_student, "predict_from_store", slow_prediction)
+    monkeypatch.setattr(api_server, "PREDICT_TIMEOUT", 0.2)
+
+    assert client.post("/predict", json={"student_id": 1}).status_code == 504
+    # The timed-out prediction still occupies the only worker
+    rejected = client.post("/predict", json={"student_id": 2})
+    assert rejected.status_code == 503 and rejected.headers["Retry-After"] == "1"
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while api_server.pool_pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    response = client.post("/predict", json={"student_id": 3})
+    assert response.status_code == 200 and response.json()["scores"] == {"programming_score": 80}
@@ -0,0 +1,82 @@
+# ml/tests/test_benchmark.py
+"""Small-scale smoke run of every benchmark, and the --compare report"""
+
+import json
+import pytest
+
+import benchmark
+import dataset_io
+import predict_student
+
+pytestmark = pytest.mark.skipif(not dataset_io.PYARROW_AVAILABLE, reason="needs pyarrow")
+
+SCALE = 60
+
+
+@pytest.fixture(scope="module")
+def bench_dir(tmp_path_factory):
+    """A tiny dataset and model under a temporary BENCH_DIR (also seen by spawned benchmark processes)"""
+    with pytest.MonkeyPatch.context() as mp:
+        path = tmp_path_factory.mktemp("benchmarks")
+        mp.setenv("BENCH_DIR", str(path))
+        mp.setattr(benchmark, "BENCH_DIR", path)
+        mp.setattr(benchmark, "MODEL_SCALE", SCALE)
+        benchmark.prepare_dataset(SCALE)
+        model_path = path / "model.joblib"
+        benchmark._train_model(benchmark.dataset_dir(SCALE), model_path)
+        yield path, str(model_path)
+
+
+@pytest.mark.parametrize("name", benchmark.BENCHMARKS)
+def test_each_benchmark_runs(bench_dir, name, monkeypatch):
+    # The prediction benchmarks swap the model registry and result cache
+    monkeypatch.setattr(predict_student, "MODEL_REGISTRY", predict_student.MODEL_REGISTRY)
+    monkeypatch.setattr(predict_student, "PREDICTION_CACHE", predict_student.PREDICTION_CACHE)
+    opts = {"seed": benchmark.SEED, "samples": 8, "batch_rows": 25, "train_trees": 2, "model_path": bench_dir[1]}
+
+    result = benchmark.run_benchmark(name, SCALE, opts)
+
+    single = name in ("categorize", "featurize_single", "predict_single")
+    assert result["calls"] == (8 if single else 3 if name != "train" else 1)
+    assert result["items"] == (8 if single else SCALE)
+    assert result["throughput"] > 0
+    assert 0 <= result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+
+
+def test_dataset_is_generated_once(bench_dir):
+    data = benchmark.OfflineData(benchmark.dataset_dir(SCALE))
+    marker = benchmark.dataset_dir(SCALE) / "complete.json"
+    mtime = marker.stat().st_mtime
+
+    assert benchmark.prepare_dataset(SCALE) == benchmark.dataset_dir(SCALE)
+    assert marker.stat().st_mtime == mtime
+    assert list(data.ids) == list(range(1, SCALE + 1))
+    # A contiguous id range is one slice of each table
+    batch = data.fetch_students(data.ids[10:20])
+    assert {row["student_id"] for row in batch["courses"]} <= set(range(11, 21))
+    assert [p["id"] for p in batch["profiles"]] == list(range(11, 21))
+
+
+def test_run_writes_a_report(bench_dir, tmp_path):
+    output = tmp_path / "run.json"
+
+    report = benchmark.run(scales=[SCALE], benchmarks=["featurize_bulk"], samples=8, batch_rows=25, output=output)
+
+    assert json.loads(output.read_text()) == report
+    [result] = report["results"]
+    assert (result["benchmark"], result["scale"], result["items"]) == ("featurize_bulk", SCALE, SCALE)
+    assert report["options"]["scales"] == [SCALE]
+
+
+def test_compare_flags_regressions_beyond_the_threshold():
+    def report(throughput, p95):
+        return {"results": [{"benchmark": "predict_batch", "scale": 1000, "throughput": throughput,
+                             "p95_ms": p95, "p50_ms": None}]}
+
+    rows = benchmark.compare(report(100.0, 10.0), report(85.0, 10.5), threshold=0.10)
+
+    assert [(r["metric"], r["change"], r["regression"]) for r in rows] == [
+        ("throughput", -0.15, True),
+        ("p95_ms", 0.05, False),
+    ]
+    assert benchmark.compare(report(100.0, 10.0), {"results": []}) == []
@@ -0,0 +1,198 @@
+# ml/tests/test_course_features.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import course_features
+from course_features import (
+    GRADE_POINTS, MODEL_FEATURES, build_features, build_features_bulk, build_student_features,
+    categorize_course, categorize_courses,
+)
+
+COURSES = [
+    ("CS2000", "Programming Fundamentals"), ("CS3000", "Human Computer Interaction"),
+    ("IT3000", "Network Security"), ("MPU2000", "Public Speaking"),
+    ("MA2000", "Discrete Mathematics"), ("CS3000", "Machine Learning"),
+    ("GE1000", "Art Appreciation"), (None, "Cloud Computing"), ("CS3000", None),
+]
+GRADES = list(GRADE_POINTS) + ["CR", "EX", None, " b+ "]
+
+
+def random_cohort(n_students: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    courses, comments = [], []
+    for student_id in range(1, n_students + 1):
+        for _ in range(rng.integers(0, 12)):
+            code, name = COURSES[rng.integers(len(COURSES))]
+            units = [1.0, 2.0, 3.0, 4.0, None][rng.integers(5)]
+            courses.append({"student_id": student_id, "course_code": code, "course_name": name,
+                            "grade": GRADES[rng.integers(len(GRADES))], "credit_hour": units})
+        for _ in range(rng.integers(0, 4)):
+            content = None if rng.random() < 0.2 else "x" * int(rng.integers(1, 200))
+            comments.append({"student_id": student_id, "content": content})
+    return pd.DataFrame(courses), pd.DataFrame(comments)
+
+
+def one_student(df: pd.DataFrame, student_id: int) -> pd.DataFrame:
+    rows = df[df["student_id"] == student_id].drop(columns="student_id")
+    return rows if not rows.empty else pd.DataFrame()
+
+
+def reference_features(df_courses: pd.DataFrame, df_comments: pd.DataFrame) -> dict:
+    """The original row-by-row feature builder"""
+    features = {"total_units": 0, "avg_grade_point": 0.0, "num_courses": 0, "comments_count": 0, "comments_total_len": 0}
+    for group in ["programming", "design", "infrastructure", "soft_skills", "theory", "diploma", "degree"]:
+        features[f"{group}_gpa"] = features[f"{group}_courses"] = 0
+
+    if not df_courses.empty:
+        points = df_courses["grade"].fillna("").str.upper().str.strip().map(GRADE_POINTS)
+        categories = [categorize_course(code, name) for code, name in zip(df_courses["course_code"], df_courses["course_name"])]
+        valid = [(point, category) for point, category in zip(points, categories) if not np.isnan(point)]
+        if valid:
+            features["total_units"] = df_courses["credit_hour"].sum()
+            features["avg_grade_point"] = np.mean([point for point, _ in valid])
+            features["num_courses"] = len(df_courses)
+            groups = {domain: [p for p, c in valid if c[f"is_{domain}"]]
+                      for domain in ["programming", "design", "infrastructure", "soft_skills", "theory"]}
+            groups.update({"diploma": [p for p, c in valid if c["level"] == 2],
+                           "degree": [p for p, c in valid if c["level"] == 3]})
+            for group, group_points in groups.items():
+                if group_points:
+                    features[f"{group}_gpa"] = np.mean(group_points)
+                    features[f"{group}_courses"] = len(group_points)
+
+    if not df_comments.empty and "content" in df_comments.columns:
+        features["comments_count"] = len(df_comments)
+        features["comments_total_len"] = df_comments["content"].str.len().sum()
+    return features
+
+
+def test_all_null_credit_hours_count_as_zero_units():
+    courses = pd.DataFrame([{"course_code": "CS3000", "course_name": "Programming", "grade": "A", "credit_hour": None}])
+
+    X, features = build_features(1, courses, pd.DataFrame())
+
+    assert features["total_units"] == 0
+    assert features["avg_grade_point"] == 4.0
+    assert X["total_units"].dtype == np.float64
+
+
+def test_all_null_comment_content_counts_as_zero_length():
+    courses = pd.DataFrame([{"course_code": "CS3000", "course_name": "Programming", "grade": "A", "credit_hour": 3}])
+    comments = pd.DataFrame([{"content": None}, {"content": None}])
+
+    X, features = build_features(1, courses, comments)
+
+    assert (features["comments_count"], features["comments_total_len"]) == (2, 0)
+    assert X["comments_total_len"].dtype == np.int64
+
+
+def test_categorize_courses_matches_scalar_rules():
+    df = pd.DataFrame(COURSES, columns=["course_code", "course_name"])
+
+    categorize_courses(df)
+
+    for row in df.itertuples():
+        expected = categorize_course(row.course_code, row.course_name)
+        assert {key: getattr(row, key) for key in expected} == expected
+
+
+def test_bulk_matches_row_by_row_build():
+    courses, comments = random_cohort(200)
+    student_ids = list(range(1, 201)) + [999]   # 999 has no rows at all
+
+    X, features = build_features_bulk(student_ids, courses, comments)
+
+    assert list(X.columns) == MODEL_FEATURES and len(X) == len(student_ids)
+    for i, student_id in enumerate(student_ids):
+        expected = reference_features(one_student(courses, student_id), one_student(comments, student_id))
+        assert features[student_id] == pytest.approx(expected)
+        assert X.iloc[i].tolist() == pytest.approx([expected[name] for name in MODEL_FEATURES])
+
+
+def test_single_student_matches_bulk_row():
+    courses, comments = random_cohort(20, seed=1)
+
+    X_all, features = build_features_bulk(range(1, 21), courses, comments)
+
+    for student_id in range(1, 21):
+        X, extended = build_features(student_id, one_student(courses, student_id), one_student(comments, student_id))
+        assert extended == features[student_id]
+        assert X.iloc[0].tolist() == X_all.iloc[student_id - 1].tolist()
+
+
+@pytest.fixture
+def slow_path_calls(monkeypatch):
+    """Students build_student_features() handed to the DataFrame path"""
+    calls = []
+
+    def spy(student_id, df_courses, df_comments):
+        calls.append(student_id)
+        return build_features(student_id, df_courses, df_comments)
+
+    monkeypatch.setattr(course_features, "build_features", spy)
+    return calls
+
+
+def assert_same_features(student_id, courses: list, comments: list):
+    expected_X, expected = build_features(student_id, pd.DataFrame(courses), pd.DataFrame(comments))
+
+    X, features = build_student_features(student_id, courses, comments)
+
+    assert features == expected
+    assert X.columns.tolist() == MODEL_FEATURES
+    assert X.iloc[0].tolist() == expected_X.iloc[0].tolist()
+
+
+def test_fast_path_matches_build_features(slow_path_calls):
+    courses, comments = random_cohort(80, seed=2)
+    # Rows as fetch_student() returns them: plain dicts, None for nulls
+    courses, comments = (df.astype(object).where(df.notna(), None) for df in (courses, comments))
+
+    for student_id in range(1, 81):
+        assert_same_features(student_id, one_student(courses, student_id).to_dict("records"),
+                             one_student(comments, student_id).to_dict("records"))
+
+    assert slow_path_calls == []
+
+
+@pytest.mark.parametrize("courses, comments", [
+    # Sums where naive float addition would differ from pandas'
+    ([{"course_code": "CS3000", "course_name": "Programming", "grade": g, "credit_hour": u}
+      for g, u in [("A", 1e16), ("B", 1.0), ("A-", -1e16), ("C", 0.1), ("B+", 0.2)]], []),
+    ([{"course_code": "CS3000", "course_name": "Programming", "grade": "A", "credit_hour": None}], []),
+    ([{"course_code": "CS3000", "course_name": "Programming", "grade": "CR", "credit_hour": 3}],
+     [{"content": None}, {"content": "good"}]),
+    ([], [{"content": None}, {"content": None}]),
+    ([], [{"id": 1}, {"id": 2}]),
+    ([{"course_code": "CS3000", "course_name": "Programming", "grade": " a ", "credit_hour": float("nan")},
+      {"course_code": "cs3000", "course_name": "network security", "grade": "B", "credit_hour": 2}], []),
+])
+def test_fast_path_matches_build_features_on_edge_cases(courses, comments, slow_path_calls):
+    assert_same_features(1, courses, comments)
+    assert slow_path_calls == []
+
+
+TYPICAL = {"course_code": "IT3000", "course_name": "Network Security", "grade": "B", "credit_hour": 4}
+
+
+@pytest.mark.parametrize("courses", [
+    [TYPICAL, {"course_code": 3000, "course_name": "Programming", "grade": "A", "credit_hour": 3}],
+    [TYPICAL, {"course_code": "CS3000", "course_name": "Programming", "grade": 4, "credit_hour": 3}],
+    [{"course_code": "CS3000", "course_name": "Programming", "grade": "A", "credit_hour": "3"}],
+    [TYPICAL, {"course_code": "CS3000", "course_name": "Programming", "grade": "A", "credit_hour": True}],
+    [TYPICAL, {"course_code": "CS3000", "course_name": "Programming", "grade": "A"}],
+])
+def test_rows_pandas_would_coerce_use_the_dataframe_path(courses, slow_path_calls):
+    build_student_features(1, courses, [])
+
+    assert slow_path_calls == [1]
+
+
+def test_large_transcripts_use_the_dataframe_path(slow_path_calls, monkeypatch):
+    monkeypatch.setattr(course_features, "FAST_PATH_MAX_COURSES", 3)
+    courses = [{"course_code": "CS3000", "course_name": "Programming", "grade": "A", "credit_hour": 3}] * 4
+
+    assert_same_features(1, courses, [])
+    assert_same_features(1, courses[:3], [])
+    assert slow_path_calls == [1]
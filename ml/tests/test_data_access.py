@@ -0,0 +1,142 @@
+# ml/tests/test_data_access.py
+"""SupabaseDataClient against an in-memory PostgREST stand-in (httpx.MockTransport)"""
+
+import asyncio
+import httpx
+import pytest
+
+import data_access
+from data_access import SupabaseDataClient
+from fake_postgrest import FakePostgrest
+
+
+def run(server: FakePostgrest, operation):
+    async def runner():
+        async with SupabaseDataClient("http://supabase.test", "key",
+                                      transport=httpx.MockTransport(server)) as client:
+            return await operation(client)
+
+    return asyncio.run(runner())
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(data_access, "RETRY_BACKOFF", 0)
+
+
+def test_select_all_pages_through_row_limit(monkeypatch):
+    monkeypatch.setattr(data_access, "PAGE_SIZE", 10)
+    server = FakePostgrest({"students": [{"id": i} for i in range(1, 26)]})
+
+    ids = run(server, lambda client: client.fetch_all_student_ids())
+
+    assert ids == list(range(1, 26))
+    assert [r.url.params["offset"] for r in server.gets("students")] == ["0", "10", "20"]
+
+
+def test_select_all_stops_after_a_full_last_page(monkeypatch):
+    monkeypatch.setattr(data_access, "PAGE_SIZE", 5)
+    server = FakePostgrest({"students": [{"id": i} for i in range(1, 11)]})
+
+    assert len(run(server, lambda client: client.fetch_all_student_ids())) == 10
+    # Two full pages and the empty one that ends the scan
+    assert len(server.gets("students")) == 3
+
+
+def test_fetch_students_chunks_in_filters(monkeypatch):
+    monkeypatch.setattr(data_access, "ID_CHUNK_SIZE", 3)
+    courses = [{"id": i, "student_id": i % 7 + 1, "course_code": f"C{i}", "course_name": "x",
+                "grade": "A", "credit_hour": 3} for i in range(1, 30)]
+    server = FakePostgrest({
+        "courses": courses,
+        "student_comments": [{"id": 1, "student_id": 2, "content": "good"}],
+        "students": [{"id": i, "github_url": None, "linkedin_url": None, "portfolio_url": None}
+                     for i in range(1, 9)],
+        "cocurricular_activities": [],
+    })
+
+    data = run(server, lambda client: client.fetch_students([1, 2, 3, 4, 5, 6, 7]))
+
+    filters = sorted(r.url.params["student_id"] for r in server.gets("courses"))
+    assert filters == ["in.(1,2,3)", "in.(4,5,6)", "in.(7)"]
+    assert sorted(r["id"] for r in data["courses"]) == list(range(1, 30))
+    assert sorted(p["id"] for p in data["profiles"]) == [1, 2, 3, 4, 5, 6, 7]
+    assert data["comments"] == [{"id": 1, "student_id": 2, "content": "good"}]
+    assert data["activities"] == []
+
+
+def test_fetch_students_bounds_concurrent_queries(monkeypatch):
+    monkeypatch.setattr(data_access, "ID_CHUNK_SIZE", 2)
+    server = FakePostgrest({"students": [{"id": i} for i in range(1, 101)]})
+    in_flight = peak = 0
+
+    async def slow(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        return server(request)
+
+    async def runner():
+        async with SupabaseDataClient("http://supabase.test", "key", transport=httpx.MockTransport(slow)) as client:
+            return await client.fetch_students(range(1, 101), concurrency=5)
+
+    data = asyncio.run(runner())
+
+    assert len(data["profiles"]) == 100
+    assert len(server.requests) == 4 * 50
+    assert peak == 5
+
+
+def test_insert_rows_retries_transient_failures():
+    server = FakePostgrest({"students": []}, fail_posts=2)
+
+    ids = run(server, lambda client: client.insert_rows("students", [{"name": "a"}, {"name": "b"}],
+                                                         returning="id"))
+
+    assert ids == [{"id": 1}, {"id": 2}]
+    assert len([r for r in server.requests if r.method == "POST"]) == 3
+
+
+def test_insert_rows_gives_up_after_max_retries():
+    server = FakePostgrest({"students": []}, fail_posts=10)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        run(server, lambda client: client.insert_rows("students", [{"name": "a"}], max_retries=2))
+    assert len(server.requests) == 3
+    assert server.tables["students"] == []
+
+
+def test_insert_rows_does_not_retry_client_errors():
+    def reject(request):
+        reject.calls += 1
+        return httpx.Response(400, json={"message": "bad row"})
+    reject.calls = 0
+
+    async def runner():
+        async with SupabaseDataClient("http://supabase.test", "key",
+                                      transport=httpx.MockTransport(reject)) as client:
+            await client.insert_rows("students", [{"name": "a"}])
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(runner())
+    assert reject.calls == 1
+
+
+def test_update_scores_patches_successful_results_only():
+    server = FakePostgrest({"students": [{"id": 1, "ai_score": 0}, {"id": 2, "ai_score": 0},
+                                         {"id": 3, "ai_score": 0}]})
+    results = [
+        {"student_id": 1, "success": True, "scores": {"ai_score": 71.5}},
+        {"student_id": 2, "success": False, "error": "no courses"},
+        {"student_id": 3, "success": True, "scores": {"ai_score": 40.0}},
+    ]
+
+    written = run(server, lambda client: client.update_scores(results, concurrency=2))
+
+    assert written == 2
+    assert [r["ai_score"] for r in server.tables["students"]] == [71.5, 0, 40.0]
+    patches = [r for r in server.requests if r.method == "PATCH"]
+    assert sorted(r.url.params["id"] for r in patches) == ["eq.1", "eq.3"]
+    assert all(r.headers["Prefer"] == "return=minimal" for r in patches)
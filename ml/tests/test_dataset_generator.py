@@ -0,0 +1,106 @@
+# ml/tests/test_dataset_generator.py
+"""Bulk upload of a generated dataset against the PostgREST stand-in"""
+
+import json
+import asyncio
+import functools
+import httpx
+import pandas as pd
+import pytest
+
+import data_access
+import dataset_generator
+from dataset_io import write_table
+from fake_postgrest import FakePostgrest
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(data_access, "RETRY_BACKOFF", 0)
+
+
+def fake_supabase(monkeypatch, server: FakePostgrest):
+    monkeypatch.setattr(data_access, "SupabaseDataClient",
+                        functools.partial(data_access.SupabaseDataClient, transport=httpx.MockTransport(server)))
+    monkeypatch.setenv("SUPABASE_URL", "http://supabase.test")
+    monkeypatch.setenv("SUPABASE_SERVICE_ROLE_KEY", "key")
+
+
+def existing_students(n: int) -> list:
+    # Ids already taken, so the server assigns new student ids n + 1, n + 2, ...
+    return [{"id": i, "name": f"existing {i}"} for i in range(1, n + 1)]
+
+
+def write_dataset(tmp_path, num_students: int, courses_per_student: int):
+    students = pd.DataFrame({"id": range(1, num_students + 1),
+                             "name": [f"student {i}" for i in range(1, num_students + 1)]})
+    courses = pd.DataFrame([
+        {"id": sid * 100 + n, "student_id": sid, "course_code": f"S{sid}", "grade": "A", "credit_hour": 3.0}
+        for sid in students["id"] for n in range(courses_per_student)
+    ])
+    return (write_table(students, "students", "csv", tmp_path),
+            write_table(courses, "courses", "csv", tmp_path))
+
+
+def batch_sizes(server: FakePostgrest, table: str) -> list:
+    return [len(json.loads(r.content)) for r in server.posts(table)]
+
+
+def test_upload_batches_and_maps_student_ids(tmp_path, monkeypatch):
+    server = FakePostgrest({"students": existing_students(100), "courses": []})
+    fake_supabase(monkeypatch, server)
+    students_path, courses_path = write_dataset(tmp_path, num_students=23, courses_per_student=3)
+
+    dataset_generator.upload_to_supabase_if_configured(students_path, courses_path, None,
+                                                       batch_size=10, concurrency=2)
+
+    assert batch_sizes(server, "students") == [10, 10, 3]
+    assert sorted(batch_sizes(server, "courses")) == [9] + [10] * 6
+    # Ids are assigned by the server, never sent from the file
+    assert not any("id" in row for r in server.posts("students") + server.posts("courses")
+                   for row in json.loads(r.content))
+
+    new_ids = {row["name"]: row["id"] for row in server.tables["students"][100:]}
+    assert sorted(new_ids.values()) == list(range(101, 124))
+    assert len(server.tables["courses"]) == 69
+    for course in server.tables["courses"]:
+        assert course["student_id"] == new_ids[f"student {course['course_code'][1:]}"]
+
+
+def test_upload_retries_failed_batch(tmp_path, monkeypatch):
+    server = FakePostgrest({"students": existing_students(10), "courses": []}, fail_posts=2)
+    fake_supabase(monkeypatch, server)
+    students_path, courses_path = write_dataset(tmp_path, num_students=5, courses_per_student=2)
+
+    dataset_generator.upload_to_supabase_if_configured(students_path, courses_path, None,
+                                                       batch_size=2, concurrency=1)
+
+    # The first batch fails twice and is sent again; every row still lands once
+    assert batch_sizes(server, "students") == [2, 2, 2, 2, 1]
+    assert [row["name"] for row in server.tables["students"][10:]] == [f"student {i}" for i in range(1, 6)]
+    assert sorted(c["student_id"] for c in server.tables["courses"]) == [11, 11, 12, 12, 13, 13, 14, 14, 15, 15]
+
+
+def test_bulk_insert_returns_ids_in_input_order():
+    server = FakePostgrest({"students": []})
+    rows = [{"name": f"student {i}"} for i in range(7)]
+
+    async def run():
+        async with data_access.SupabaseDataClient("http://supabase.test", "key",
+                                                  transport=httpx.MockTransport(server)) as client:
+            return await dataset_generator.bulk_insert(client, "students", rows, batch_size=3,
+                                                       concurrency=3, returning="id")
+
+    ids = asyncio.run(run())
+
+    assert batch_sizes(server, "students") == [3, 3, 1]
+    assert [server.tables["students"][i - 1]["name"] for i in ids] == [r["name"] for r in rows]
+
+
+def test_upload_skipped_without_credentials(tmp_path, monkeypatch, capsys):
+    monkeypatch.delenv("SUPABASE_URL", raising=False)
+    students_path, courses_path = write_dataset(tmp_path, num_students=1, courses_per_student=1)
+
+    dataset_generator.upload_to_supabase_if_configured(students_path, courses_path, None)
+
+    assert "skipping upload" in capsys.readouterr().out
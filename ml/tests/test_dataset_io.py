@@ -0,0 +1,40 @@
+# ml/tests/test_dataset_io.py
+import os
+import pandas as pd
+import pytest
+
+import dataset_io
+from dataset_io import find_dataset, read_table, write_table
+
+pytestmark = pytest.mark.skipif(not dataset_io.PYARROW_AVAILABLE, reason="needs pyarrow")
+
+
+def write_both(tmp_path, parquet_mtime: float, csv_mtime: float):
+    write_table(pd.DataFrame({"id": [1], "name": ["parquet"]}), "students", "parquet", tmp_path)
+    write_table(pd.DataFrame({"id": [1], "name": ["csv"]}), "students", "csv", tmp_path)
+    os.utime(tmp_path / "students.parquet", (parquet_mtime, parquet_mtime))
+    os.utime(tmp_path / "students.csv", (csv_mtime, csv_mtime))
+
+
+def test_newer_csv_wins_over_stale_parquet(tmp_path):
+    write_both(tmp_path, parquet_mtime=1_000, csv_mtime=2_000)
+
+    assert find_dataset("students", tmp_path) == tmp_path / "students.csv"
+    assert read_table("students", ["name"], tmp_path)["name"].tolist() == ["csv"]
+
+
+def test_newer_parquet_wins_over_stale_csv(tmp_path):
+    write_both(tmp_path, parquet_mtime=2_000, csv_mtime=1_000)
+
+    assert find_dataset("students", tmp_path) == tmp_path / "students.parquet"
+
+
+def test_parquet_preferred_on_equal_mtime(tmp_path):
+    write_both(tmp_path, parquet_mtime=1_000, csv_mtime=1_000)
+
+    assert find_dataset("students", tmp_path) == tmp_path / "students.parquet"
+
+
+def test_missing_table(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        find_dataset("courses", tmp_path)
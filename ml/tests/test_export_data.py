@@ -0,0 +1,115 @@
+# ml/tests/test_export_data.py
+"""export_from_supabase() against an in-memory PostgREST stand-in (httpx.MockTransport)"""
+
+import httpx
+import pytest
+
+import dataset_io
+import export_data
+from dataset_io import read_table
+from fake_postgrest import FakePostgrest
+
+
+def student(i):
+    return {"id": i, "name": f"s{i}", "feedback_sentiment_score": float(i), "professional_engagement_score": None,
+            "created_at": f"2026-01-{i % 28 + 1:02d}T00:00:00+00:00"}
+
+
+def course(i):
+    return {"id": i, "student_id": i % 5 + 1, "course_code": "CS3000", "course_name": "Programming",
+            "grade": "A", "credit_hour": 3.0, "created_at": f"2026-02-{i % 28 + 1:02d}T00:00:00+00:00"}
+
+
+def comment(i):
+    return {"id": i, "student_id": i % 5 + 1, "content": f"comment {i}",
+            "created_at": f"2026-03-{i % 28 + 1:02d}T00:00:00+00:00"}
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """FakePostgrest wired into export_data, which writes under tmp_path"""
+    server = FakePostgrest({
+        "students": [student(i) for i in range(1, 6)],
+        "courses": [course(i) for i in range(1, 24)],
+        "student_comments": [comment(i) for i in range(1, 8)],
+    })
+    # Tests can swap `server.handler` to inject failures
+    server.handler = server
+    real_client = export_data.SupabaseDataClient
+    monkeypatch.setattr(export_data, "SupabaseDataClient",
+                        lambda url, key: real_client(url, key, transport=httpx.MockTransport(server.handler)))
+    monkeypatch.setattr(export_data, "OUTPUT_DIR", tmp_path)
+    monkeypatch.setattr(export_data, "STATE_PATH", tmp_path / "export_state.json")
+    monkeypatch.setattr(export_data, "SPOOL_DIR", tmp_path / ".export")
+    monkeypatch.setattr(export_data, "PAGE_SIZE", 10)
+    monkeypatch.setenv("SUPABASE_URL", "http://supabase.test")
+    monkeypatch.setenv("SUPABASE_SERVICE_ROLE_KEY", "key")
+    return server
+
+
+def id_filters(server, table):
+    return [r.url.params.get("id") for r in server.gets(table)]
+
+
+def test_full_export_pages_by_id(server, tmp_path):
+    counts = export_data.export_from_supabase(fmt="csv")
+
+    assert counts == {"students": 5, "courses": 23, "student_comments": 7}
+    assert id_filters(server, "courses") == [None, "gt.10", "gt.20"]
+    assert read_table("courses", None, tmp_path)["id"].tolist() == list(range(1, 24))
+    state = export_data.load_state()
+    assert state["courses"]["watermark"] == {"id": 23, "created_at": "2026-02-24T00:00:00+00:00"}
+    assert not (tmp_path / ".export" / "courses").exists()
+
+
+def test_later_runs_fetch_only_new_rows(server, tmp_path):
+    export_data.export_from_supabase(fmt="csv")
+    server.requests.clear()
+    server.tables["courses"] += [course(i) for i in range(24, 27)]
+    server.tables["students"][0]["feedback_sentiment_score"] = 99.0
+
+    counts = export_data.export_from_supabase(fmt="csv")
+
+    assert counts["courses"] == 26
+    assert id_filters(server, "courses") == ["gt.23"]
+    assert read_table("courses", None, tmp_path)["id"].tolist() == list(range(1, 27))
+    # students is re-read in full, so in-place score changes are picked up
+    assert id_filters(server, "students") == [None]
+    assert read_table("students", None, tmp_path)["feedback_sentiment_score"].iloc[0] == 99.0
+    assert export_data.load_state()["courses"]["watermark"]["id"] == 26
+
+
+@pytest.mark.parametrize("rerun", [
+    {"fmt": "csv", "full": True},
+    pytest.param({"fmt": "parquet"}, marks=pytest.mark.skipif(not dataset_io.PYARROW_AVAILABLE,
+                                                                reason="needs pyarrow")),
+])
+def test_full_flag_and_format_switch_reexport_everything(server, tmp_path, rerun):
+    export_data.export_from_supabase(fmt="csv")
+    server.requests.clear()
+
+    counts = export_data.export_from_supabase(**rerun)
+
+    assert counts["courses"] == 23
+    assert id_filters(server, "courses") == [None, "gt.10", "gt.20"]
+    assert read_table("courses", None, tmp_path)["id"].tolist() == list(range(1, 24))
+
+
+def test_interrupted_export_resumes_after_the_last_spooled_page(server, tmp_path):
+    def fail_third_courses_page(request):
+        if request.url.path.endswith("/courses") and request.url.params.get("id") == "gt.20":
+            raise httpx.ConnectError("connection reset")
+        return server(request)
+
+    server.handler = fail_third_courses_page
+    with pytest.raises(httpx.ConnectError):
+        export_data.export_from_supabase(fmt="csv")
+    assert export_data.load_state()["courses"]["run"]["cursor"] == 20
+
+    server.handler = server
+    server.requests.clear()
+    counts = export_data.export_from_supabase(fmt="csv")
+
+    assert counts["courses"] == 23
+    assert id_filters(server, "courses") == ["gt.20"]
+    assert read_table("courses", None, tmp_path)["id"].tolist() == list(range(1, 24))
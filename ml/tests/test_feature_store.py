@@ -0,0 +1,132 @@
+# ml/tests/test_feature_store.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from course_features import build_features_bulk
+from feature_store import FeatureStore, SOURCES
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FeatureStore(str(tmp_path / "features.sqlite3"))
+
+
+def event(kind: str, table: str, record: dict | None = None, old_record: dict | None = None) -> dict:
+    return {"type": kind, "table": table, "record": record, "old_record": old_record}
+
+
+def course(row_id: int, student_id: int, grade: str = "A", credit_hour: int = 3) -> dict:
+    return {"id": row_id, "student_id": student_id, "course_code": "CSC101",
+            "course_name": "Programming", "grade": grade, "credit_hour": credit_hour}
+
+
+def count(store: FeatureStore, table: str, student_id: int) -> int:
+    return store._db.execute(f"SELECT COUNT(*) FROM {table} WHERE student_id = ?", (student_id,)).fetchone()[0]
+
+
+def test_delete_student_removes_all_their_rows(store):
+    for student_id in (1, 2):
+        store.apply_event(event("INSERT", "students", {"id": student_id, "github_url": "https://github.com/x"}))
+        store.apply_event(event("INSERT", "courses", course(student_id * 10, student_id)))
+        store.apply_event(event("INSERT", "student_comments",
+                                {"id": student_id * 10, "student_id": student_id, "content": "good"}))
+        store.apply_event(event("INSERT", "cocurricular_activities",
+                                {"id": student_id * 10, "student_id": student_id, "ai_impact_score": 4}))
+
+    store.apply_event(event("DELETE", "students", old_record={"id": 1}))
+
+    assert store.features(1) is None
+    tables = ["student_profile", "student_features", "student_changes", *(f"contrib_{s}" for s in SOURCES)]
+    assert {table: count(store, table, 1) for table in tables} == {table: 0 for table in tables}
+    assert {table: count(store, table, 2) for table in tables} == {table: 1 for table in tables}
+    assert store.features(2)["extended"]["num_courses"] == 1
+
+
+def test_update_moves_contribution(store):
+    store.apply_event(event("INSERT", "courses", course(1, 1, grade="A")))
+    store.apply_event(event("UPDATE", "courses", course(1, 1, grade="C")))
+
+    features = store.features(1)["extended"]
+    assert features["num_courses"] == 1
+    assert features["avg_grade_point"] < 4
+
+
+@pytest.mark.parametrize("table, record", [
+    ("courses", None),
+    ("courses", "not a record"),
+    ("courses", {"id": 1, "student_id": 1, "grade": "A"}),
+    ("courses", {"id": "abc", "student_id": 1, "grade": "A", "credit_hour": 3}),
+    ("student_comments", {"id": 1, "content": "good"}),
+    ("cocurricular_activities", {"id": 1, "student_id": None}),
+    ("students", {"github_url": "https://github.com/x"}),
+])
+def test_invalid_records_raise_value_error(store, table, record):
+    with pytest.raises(ValueError):
+        store.apply_event(event("INSERT", table, record))
+    assert store.stats()["events"] == 0
+
+
+@pytest.mark.parametrize("payload", [
+    event("DELETE", "courses"),
+    event("DELETE", "courses", old_record={"id": [1]}),
+    event("UPSERT", "courses", course(1, 1)),
+    event("INSERT", "enrolments", {"id": 1}),
+])
+def test_invalid_events_raise_value_error(store, payload):
+    with pytest.raises(ValueError):
+        store.apply_event(payload)
+
+
+def random_tables(n_students: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    names = ["Programming I", "Network Security", "Public Speaking", "Discrete Mathematics", "Art"]
+    grades = ["A", "A-", "B+", "B", "C", "D", "F", "CR", None]
+    tables = {"students": [], "courses": [], "student_comments": [], "cocurricular_activities": []}
+    for sid in range(1, n_students + 1):
+        tables["students"].append({"id": sid, "github_url": f"https://github.com/u{sid}" if sid % 2 else None,
+                                   "feedback_sentiment_score": float(rng.integers(0, 100))})
+        for _ in range(rng.integers(0, 10)):
+            tables["courses"].append({
+                "id": len(tables["courses"]) + 1, "student_id": sid,
+                "course_code": f"CS{rng.choice([2, 3])}000", "course_name": str(rng.choice(names)),
+                "grade": grades[rng.integers(len(grades))], "credit_hour": int(rng.integers(1, 5))})
+        for _ in range(rng.integers(0, 4)):
+            content = "[Comment deleted]" if rng.random() < 0.2 else "x" * int(rng.integers(1, 80))
+            tables["student_comments"].append({"id": len(tables["student_comments"]) + 1, "student_id": sid,
+                                               "content": content})
+        for _ in range(rng.integers(0, 3)):
+            tables["cocurricular_activities"].append({
+                "id": len(tables["cocurricular_activities"]) + 1, "student_id": sid,
+                **{column: round(float(rng.uniform(0, 10)), 2)
+                   for column in ("ai_impact_score", "ai_leadership_score", "ai_relevance_score")}})
+    return tables
+
+
+def test_replayed_events_match_a_rebuild(tmp_path):
+    n = 12
+    tables = random_tables(n)
+    rebuilt = FeatureStore(str(tmp_path / "rebuilt.sqlite3"))
+    rebuilt.rebuild(pd.DataFrame(tables["students"]),
+                    {source: pd.DataFrame(tables[source]) for source in SOURCES})
+
+    replayed = FeatureStore(str(tmp_path / "replayed.sqlite3"))
+    for record in tables["students"]:
+        replayed.apply_event(event("INSERT", "students", record))
+    for source in SOURCES:
+        for record in tables[source]:
+            # Every row first arrives with another student's values, then is corrected
+            wrong = {**record, "student_id": record["student_id"] % n + 1}
+            replayed.apply_event(event("INSERT", source, wrong))
+            replayed.apply_event(event("UPDATE", source, record, old_record=wrong))
+        # A row added and removed again leaves nothing behind
+        extra = {**tables[source][0], "id": 10_000}
+        replayed.apply_event(event("INSERT", source, extra))
+        replayed.apply_event(event("DELETE", source, old_record={"id": 10_000}))
+
+    _, expected = build_features_bulk(range(1, n + 1), pd.DataFrame(tables["courses"]),
+                                               pd.DataFrame(tables["student_comments"]))
+    for sid in range(1, n + 1):
+        assert replayed.features(sid) == rebuilt.features(sid)
+        assert replayed.features(sid)["extended"] == pytest.approx(expected[sid])
+    pd.testing.assert_frame_equal(replayed.training_frame(), rebuilt.training_frame())
@@ -0,0 +1,68 @@
+# ml/tests/test_flat_forest.py
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.multioutput import MultiOutputRegressor
+
+import flat_forest
+from flat_forest import export_forest, load_forest
+from course_features import MODEL_FEATURES
+
+
+def training_data(n: int = 400, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame({
+        "total_units": rng.integers(0, 120, n).astype(float),
+        "avg_grade_point": rng.uniform(0, 4, n),
+        "num_courses": rng.integers(0, 40, n),
+        "comments_count": rng.integers(0, 10, n),
+        "comments_total_len": rng.integers(0, 3000, n),
+    })[MODEL_FEATURES]
+    y = np.column_stack([X["avg_grade_point"] * 20 + rng.normal(0, 5, n) for _ in range(6)])
+    return X, y
+
+
+@pytest.fixture(params=["multi_output", "native"])
+def model(request):
+    X, y = training_data()
+    if request.param == "multi_output":
+        return MultiOutputRegressor(RandomForestRegressor(n_estimators=12, max_depth=8, random_state=0)).fit(X, y)
+    return RandomForestRegressor(n_estimators=12, random_state=0).fit(X, y)
+
+
+def test_predictions_are_bit_identical_to_sklearn(model, tmp_path, monkeypatch):
+    # Several chunks, the last one partial
+    monkeypatch.setattr(flat_forest, "PREDICT_CHUNK_ROWS", 64)
+    forest = load_forest(export_forest(model, str(tmp_path / "model.forest")))
+    X, _ = training_data(300, seed=1)
+
+    assert np.array_equal(forest.predict(X), model.predict(X))
+    assert np.array_equal(forest.predict(X.iloc[[5]]), model.predict(X.iloc[[5]]))
+
+
+def test_dataframe_columns_are_matched_by_name(model, tmp_path):
+    forest = load_forest(export_forest(model, str(tmp_path / "model.forest")))
+    X, _ = training_data(20, seed=2)
+
+    assert np.array_equal(forest.predict(X[MODEL_FEATURES[::-1]]), model.predict(X))
+
+
+def test_invalid_input_rejected(model, tmp_path):
+    forest = load_forest(export_forest(model, str(tmp_path / "model.forest")))
+
+    with pytest.raises(ValueError):
+        forest.predict(np.zeros((1, 3)))
+    with pytest.raises(ValueError):
+        forest.predict(np.full((1, len(MODEL_FEATURES)), np.nan))
+
+
+def test_unsupported_model_and_file(tmp_path):
+    X, y = training_data(20)
+    with pytest.raises(TypeError):
+        export_forest(LinearRegression().fit(X, y), str(tmp_path / "model.forest"))
+
+    (tmp_path / "model.joblib").write_bytes(b"not a forest" * 10)
+    with pytest.raises(ValueError):
+        load_forest(str(tmp_path / "model.joblib"))
@@ -0,0 +1,104 @@
+# ml/tests/test_incremental_model.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from course_features import MODEL_FEATURES
+from feature_store import FeatureStore
+from incremental_model import HOLDOUT_EVERY, train_incremental, update_incremental
+
+GRADES = ["A", "A-", "B+", "B", "C", "D", "F"]
+
+
+def course(row_id: int, student_id: int, grade: str, credit_hour: int = 3) -> dict:
+    return {"id": row_id, "student_id": student_id, "course_code": "CS3000",
+            "course_name": "Programming", "grade": grade, "credit_hour": credit_hour}
+
+
+def event(kind: str, table: str, record: dict, old_record: dict | None = None) -> dict:
+    return {"type": kind, "table": table, "record": record, "old_record": old_record}
+
+
+def default_store(tmp_path, monkeypatch) -> FeatureStore:
+    """Point FeatureStore() (what train_incremental opens) at a file under tmp_path"""
+    path = str(tmp_path / "features.sqlite3")
+    monkeypatch.setattr(FeatureStore.__init__, "__defaults__", (path,))
+    return FeatureStore(path)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """A feature store with 60 students (no AI labels, so the targets follow the features)"""
+    rng = np.random.default_rng(0)
+    students = pd.DataFrame({"id": range(1, 61)})
+    courses = []
+    for sid in range(1, 61):
+        for _ in range(rng.integers(1, 12)):
+            courses.append(course(len(courses) + 1, sid, GRADES[rng.integers(len(GRADES))], int(rng.integers(1, 5))))
+    comments = [{"id": sid, "student_id": sid, "content": "x" * int(rng.integers(1, 200))} for sid in range(1, 61, 2)]
+
+    store = default_store(tmp_path, monkeypatch)
+    store.rebuild(students, {"courses": pd.DataFrame(courses), "student_comments": pd.DataFrame(comments)})
+    return store
+
+
+def test_holdout_students_are_never_trained_on(store):
+    model, X_test, y_test, _, (X_train, y_train) = train_incremental("store", batch_rows=7, epochs=3,
+                                                                      keep_training_rows=True)
+
+    assert list(X_test.index) == list(range(HOLDOUT_EVERY, 61, HOLDOUT_EVERY))
+    assert list(y_test.index) == list(X_test.index)
+    assert not any(sid % HOLDOUT_EVERY == 0 for sid in X_train.index)
+    assert len(X_train) == len(y_train) == 48
+    assert model.samples_seen == 3 * 48
+    assert model.store_seq == store.seq
+    assert model.targets == list(y_test.columns)
+
+
+def test_trained_model_beats_the_mean(store):
+    model, X_test, y_test, _, _ = train_incremental("store", batch_rows=50, epochs=10)
+
+    predicted = model.predict(X_test)
+    baseline = np.broadcast_to(y_test.mean().to_numpy(), y_test.shape)
+
+    assert predicted.shape == y_test.shape
+    assert np.mean((predicted - y_test.to_numpy()) ** 2) < 0.5 * np.mean((baseline - y_test.to_numpy()) ** 2)
+
+
+def test_predict_accepts_arrays_and_reordered_columns(store):
+    model, X_test, _, _, _ = train_incremental("store", epochs=1)
+
+    expected = model.predict(X_test)
+
+    assert np.array_equal(model.predict(X_test[MODEL_FEATURES[::-1]]), expected)
+    assert np.array_equal(model.predict(X_test.to_numpy()), expected)
+
+
+def test_update_reads_only_changed_students(store):
+    model, _, _, _, _ = train_incremental("store", epochs=1)
+    samples, scale = model.samples_seen, model.x_scaler.mean_.copy()
+    old = store._db.execute("SELECT COUNT(*) FROM contrib_courses").fetchone()[0]
+    # One training student and one holdout student get a new course
+    store.apply_event(event("INSERT", "courses", course(old + 1, 3, "A")))
+    store.apply_event(event("INSERT", "courses", course(old + 2, 10, "F")))
+
+    model, X_test, y_test, changed, _ = update_incremental(model, store=store)
+
+    assert changed == 2
+    assert model.samples_seen == samples + 1
+    assert list(X_test.index) == [10] and list(y_test.index) == [10]
+    assert model.store_seq == store.seq and model.updates == 1
+    # Scalers stay as fitted on the first training pass
+    assert np.array_equal(model.x_scaler.mean_, scale)
+
+    model, X_test, _, changed, _ = update_incremental(model, store=store)
+
+    assert (changed, X_test) == (0, None)
+    assert model.samples_seen == samples + 1 and model.updates == 2
+
+
+def test_training_without_training_rows_fails(tmp_path, monkeypatch):
+    default_store(tmp_path, monkeypatch).rebuild(pd.DataFrame({"id": [HOLDOUT_EVERY, 2 * HOLDOUT_EVERY]}), {})
+
+    with pytest.raises(ValueError):
+        train_incremental("store")
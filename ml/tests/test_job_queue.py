@@ -0,0 +1,103 @@
+# ml/tests/test_job_queue.py
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+import job_queue
+from job_queue import JobQueue, QueueFullError
+
+release = threading.Event()
+
+
+def blocking_job(params, progress):
+    release.wait(10)
+    return {"done": params.get("n")}
+
+
+@pytest.fixture
+def jobs_db(tmp_path, monkeypatch):
+    # Jobs run on threads here, so they see the test kind (a spawned pool would re-import JOB_KINDS)
+    monkeypatch.setitem(job_queue.JOB_KINDS, "block", blocking_job)
+    monkeypatch.setattr(JobQueue, "_new_executor",
+                        lambda self: setattr(self, "_executor", ThreadPoolExecutor(self.workers)))
+    release.clear()
+    yield str(tmp_path / "jobs.sqlite3")
+    release.set()
+
+
+def wait_for(queue: JobQueue, job_id: str, status: str, timeout: float = 10) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} is {queue.get(job_id)['status']}, expected {status}")
+
+
+def test_pending_cap_holds_across_queues(jobs_db, monkeypatch):
+    monkeypatch.setattr(JobQueue, "_dispatch", lambda self, job_id, kind, params: None)
+    queues = [JobQueue(jobs_db, max_pending=5) for _ in range(4)]
+    accepted, rejected = [], []
+    start = threading.Barrier(20)
+
+    def submit(queue):
+        start.wait()
+        try:
+            accepted.append(queue.submit("block"))
+        except QueueFullError:
+            rejected.append(queue)
+
+    threads = [threading.Thread(target=submit, args=(queues[i % 4],)) for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert (len(accepted), len(rejected)) == (5, 15)
+    assert queues[0].stats()["queued"] == 5
+
+
+def test_shutdown_requeues_cancelled_jobs(jobs_db):
+    queue = JobQueue(jobs_db, workers=1)
+    queue.start()
+    running, *waiting = [queue.submit("block", {"n": n})["id"] for n in range(3)]
+    wait_for(queue, running, "running")
+
+    queue.shutdown(wait=False)
+
+    for job_id in waiting:
+        job = queue.get(job_id)
+        assert (job["status"], job["message"], job["attempts"]) == ("queued", "interrupted", 0)
+    release.set()
+    wait_for(queue, running, "succeeded")
+
+    # The next start picks them up
+    resumed = JobQueue(jobs_db, workers=1)
+    resumed.start()
+    for job_id in waiting:
+        assert wait_for(resumed, job_id, "succeeded")["attempts"] == 1
+    resumed.shutdown()
+
+
+def test_runner_claims_jobs_recorded_by_other_queues(jobs_db):
+    recorder = JobQueue(jobs_db)
+    recorder.start(dispatch=False)
+    runner = JobQueue(jobs_db, workers=2)
+    runner.start()
+    job_ids = [recorder.submit("block", {"n": n})["id"] for n in range(2)]
+    assert all(recorder.get(job_id)["status"] == "queued" for job_id in job_ids)
+
+    assert runner.dispatch_queued() == 2
+    assert runner.dispatch_queued() == 0   # already running on the runner's pool
+    release.set()
+    for n, job_id in enumerate(job_ids):
+        assert wait_for(runner, job_id, "succeeded")["result"] == {"done": n}
+    runner.shutdown()
+    recorder.shutdown()
+
+
+def test_unknown_kind_rejected(jobs_db):
+    with pytest.raises(ValueError):
+        JobQueue(jobs_db).submit("defragment")
@@ -0,0 +1,93 @@
+# ml/tests/test_predict_student.py
+import time
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+import predict_student
+from course_features import MODEL_FEATURES
+from feature_store import FeatureStore
+from predict_student import analyze_profiles
+from prediction_cache import PredictionCache
+from profile_cache import ProfileAnalysisCache
+
+
+@pytest.fixture
+def profile_api(tmp_path, monkeypatch):
+    """A slow profile analysis API recording its calls and peak concurrency"""
+    monkeypatch.setattr(predict_student, "PROFILE_CACHE", ProfileAnalysisCache(str(tmp_path / "profiles.sqlite3")))
+    lock = threading.Lock()
+    api = {"calls": [], "in_flight": 0, "peak": 0}
+
+    def request(github_url, linkedin_url, portfolio_url):
+        with lock:
+            api["calls"].append(github_url)
+            api["in_flight"] += 1
+            api["peak"] = max(api["peak"], api["in_flight"])
+        time.sleep(0.05)
+        with lock:
+            api["in_flight"] -= 1
+        return {"github": {"projects": [1, 2], "languages": ["py"]}, "computingRelevance": 70}
+
+    monkeypatch.setattr(predict_student, "request_profile_analysis", request)
+    return api
+
+
+@pytest.fixture
+def model(monkeypatch):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.random((50, len(MODEL_FEATURES))), columns=MODEL_FEATURES)
+    forest = RandomForestRegressor(n_estimators=2, random_state=0).fit(X, rng.random((50, 6)))
+    monkeypatch.setattr(predict_student, "load_model", lambda: forest)
+    return forest
+
+
+def test_analyze_profiles_calls_the_api_concurrently(profile_api):
+    triples = [(f"https://github.com/u{i}", "", "") for i in range(8)]
+
+    profiles = analyze_profiles(triples, concurrency=4)
+
+    assert sorted(profile_api["calls"]) == sorted(urls[0] for urls in triples)
+    assert profile_api["peak"] == 4
+    assert all(profiles[urls]["github_bonus"] == 8 and not profiles[urls]["degraded"] for urls in triples)
+
+
+def test_batch_analyzes_each_url_triple_once(profile_api, model):
+    student_ids = list(range(1, 21))
+    data = {
+        "courses": [], "comments": [], "activities": [],
+        "profiles": [{"id": sid, "github_url": f"https://github.com/u{sid % 3}" if sid % 4 else None,
+                      "linkedin_url": None, "portfolio_url": None} for sid in student_ids],
+    }
+
+    output = predict_student.predict_batch_from_data(student_ids, data)
+
+    assert output["success"], output.get("error")
+    assert sorted(profile_api["calls"]) == [f"https://github.com/u{i}" for i in range(3)]
+    assert [r["student_id"] for r in output["results"]] == student_ids
+
+
+def test_store_prediction_key_ignores_label_write_back(profile_api, model, tmp_path, monkeypatch):
+    monkeypatch.setattr(predict_student, "PREDICTION_CACHE", PredictionCache())
+    store = FeatureStore(str(tmp_path / "features.sqlite3"))
+    student = {"id": 1, "github_url": "https://github.com/u1", "feedback_sentiment_score": 50}
+    store.apply_event({"type": "INSERT", "table": "students", "record": student})
+    store.apply_event({"type": "INSERT", "table": "courses", "record": {
+        "id": 10, "student_id": 1, "course_code": "CS3000", "course_name": "Programming", "grade": "A", "credit_hour": 3}})
+
+    first = predict_student.predict_from_store(1, store)
+    # A batch rescore writes new label scores back to the students row
+    store.apply_event({"type": "UPDATE", "table": "students", "record": {**student, "feedback_sentiment_score": 80},
+                       "old_record": student})
+    again = predict_student.predict_from_store(1, store)
+    store.apply_event({"type": "UPDATE", "table": "courses", "record": {
+        "id": 10, "student_id": 1, "course_code": "CS3000", "course_name": "Programming", "grade": "B", "credit_hour": 3},
+        "old_record": {"id": 10, "student_id": 1, "course_code": "CS3000", "course_name": "Programming",
+                       "grade": "A", "credit_hour": 3}})
+    changed = predict_student.predict_from_store(1, store)
+
+    assert again["etag"] == first["etag"] and predict_student.PREDICTION_CACHE.hits == 1
+    assert changed["etag"] != first["etag"]
+    assert changed["scores"] != first["scores"]
@@ -0,0 +1,106 @@
+# ml/tests/test_prediction_cache.py
+"""predict_from_data() / predict_from_store() through the prediction cache"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+import predict_student
+from course_features import MODEL_FEATURES
+from feature_store import FeatureStore
+from prediction_cache import PredictionCache
+from profile_cache import ProfileAnalysisCache
+
+ANALYSIS = {"computingRelevance": 60, "github": {"projects": ["a", "b"], "languages": ["py"]}}
+
+
+class ProfileApi:
+    """Stand-in for request_profile_analysis: returns `analysis`, or raises while `down`"""
+
+    def __init__(self):
+        self.analysis = ANALYSIS
+        self.down = False
+        self.calls = 0
+
+    def __call__(self, github_url, linkedin_url, portfolio_url):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError("profile API unavailable")
+        return self.analysis
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    model = RandomForestRegressor(n_estimators=3, random_state=0).fit(
+        pd.DataFrame(rng.random((20, len(MODEL_FEATURES))), columns=MODEL_FEATURES), rng.random((20, 6)))
+    monkeypatch.setattr(predict_student, "load_model", lambda: model)
+    monkeypatch.setattr(predict_student.MODEL_REGISTRY, "version", "model-v1")
+    monkeypatch.setattr(predict_student, "PREDICTION_CACHE", PredictionCache())
+    # Profile analyses expire immediately, so every prediction asks the API again
+    monkeypatch.setattr(predict_student, "PROFILE_CACHE",
+                        ProfileAnalysisCache(str(tmp_path / "profiles.sqlite3"), ttl=0, stale_ttl=0))
+    api = ProfileApi()
+    monkeypatch.setattr(predict_student, "request_profile_analysis", api)
+    return api
+
+
+@pytest.fixture
+def data():
+    return {
+        "courses": [{"id": 1, "student_id": 7, "course_code": "CSC1001", "course_name": "Programming",
+                     "grade": "A", "credit_hour": 3}],
+        "comments": [{"id": 1, "student_id": 7, "content": "Great work"}],
+        "profile": {"id": 7, "github_url": "https://github.com/s7", "linkedin_url": None, "portfolio_url": None},
+        "activities": [],
+    }
+
+
+def test_degraded_analysis_is_not_cached(api, data):
+    api.down = True
+    degraded = predict_student.predict_from_data(7, data)
+    assert degraded["success"] and degraded["etag"] is None
+    assert predict_student.PREDICTION_CACHE.stats()["size"] == 0
+
+    api.down = False
+    recovered = predict_student.predict_from_data(7, data)
+    assert recovered["etag"] is not None
+    assert recovered["scores"]["professional_engagement_score"] > degraded["scores"]["professional_engagement_score"]
+    assert predict_student.predict_from_data(7, data) == recovered
+    assert predict_student.PREDICTION_CACHE.stats()["hits"] == 1
+
+
+def test_key_changes_with_profile_analysis(api, data):
+    first = predict_student.predict_from_data(7, data)
+    api.analysis = {**ANALYSIS, "linkedin": {"headline": "x"}}
+    second = predict_student.predict_from_data(7, data)
+
+    assert first["etag"] != second["etag"]
+    assert second["scores"]["professional_engagement_score"] > first["scores"]["professional_engagement_score"]
+
+
+def test_cached_result_cannot_be_changed_by_callers(api, data):
+    first = predict_student.predict_from_data(7, data)
+    first["scores"]["programming_score"] = -1
+
+    cached = predict_student.predict_from_data(7, data)
+    cached["features"].clear()
+
+    again = predict_student.predict_from_data(7, data)
+    assert again["scores"]["programming_score"] != -1
+    assert again["features"]
+
+
+def test_store_predictions_follow_the_same_rules(api, tmp_path):
+    store = FeatureStore(str(tmp_path / "features.sqlite3"))
+    store.upsert_students([{"id": 7, "github_url": "https://github.com/s7"}])
+    store.upsert_rows("courses", [{"id": 1, "student_id": 7, "course_code": "CSC1001",
+                                   "course_name": "Programming", "grade": "A", "credit_hour": 3}])
+
+    api.down = True
+    assert predict_student.predict_from_store(7, store)["etag"] is None
+    api.down = False
+    output = predict_student.predict_from_store(7, store)
+    assert output["etag"] is not None
+    assert predict_student.predict_from_store(7, store) == output
@@ -0,0 +1,133 @@
+# ml/tests/test_prefork_server.py
+"""Supervisor against real forked children running stand-in workers"""
+
+import os
+import time
+import signal
+import socket
+import pytest
+
+import prefork_server
+import telemetry
+from prefork_server import JOB_RUNNER_SLOT, Supervisor
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+
+
+def requests_family(n: int) -> dict:
+    return {"ml_requests_total": {"kind": "counter", "help": "Requests",
+                                  "samples": [({"route": "/predict", "outcome": "success"}, n)]}}
+
+
+def stand_in(sock, ready_fd, ready=True, ignore_sigterm=False, requests=3):
+    """A worker that writes a metrics snapshot, reports ready and waits to be stopped"""
+    signal.signal(signal.SIGTERM, signal.SIG_IGN if ignore_sigterm else signal.SIG_DFL)
+    telemetry._write_json(telemetry._snapshot_path(os.getpid()), requests_family(requests))
+    if ready:
+        os.write(ready_fd, b"1")
+    os.close(ready_fd)
+    while True:
+        signal.pause()
+
+
+def alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def reap_until(supervisor: Supervisor, condition, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        supervisor.reap()
+        time.sleep(0.02)
+
+
+def pids(supervisor: Supervisor) -> dict:
+    return {slot: pid for pid, slot in supervisor.slots.items()}
+
+
+def total_requests() -> float:
+    [(_, n)] = telemetry.merge_snapshots()["ml_requests_total"]["samples"]
+    return n
+
+
+@pytest.fixture
+def supervisor(tmp_path, monkeypatch):
+    monkeypatch.setattr(telemetry, "METRICS_DIR", str(tmp_path))
+    monkeypatch.setattr(prefork_server, "RESTART_BACKOFF", 0)
+    monkeypatch.setattr(prefork_server, "WORKER_READY_TIMEOUT", 5)
+    monkeypatch.setattr(prefork_server, "WORKER_STOP_TIMEOUT", 5)
+    monkeypatch.setattr(prefork_server, "run_worker", stand_in)
+    monkeypatch.setattr(prefork_server, "run_job_runner", stand_in)
+    sock = socket.socket()
+    supervisor = Supervisor(2, sock)
+    yield supervisor
+    for pid in list(supervisor.slots) + list(supervisor.retiring):
+        try:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+    sock.close()
+
+
+def start(supervisor: Supervisor) -> dict:
+    for slot in range(supervisor.workers):
+        assert supervisor.spawn(slot)
+    assert supervisor.spawn(JOB_RUNNER_SLOT)
+    return pids(supervisor)
+
+
+def test_crashed_worker_is_restarted_and_its_metrics_kept(supervisor):
+    before = start(supervisor)
+    assert total_requests() == 9
+
+    os.kill(before[0], signal.SIGKILL)
+    reap_until(supervisor, lambda: pids(supervisor).get(0) not in (None, before[0]))
+
+    after = pids(supervisor)
+    assert after[1] == before[1] and after[JOB_RUNNER_SLOT] == before[JOB_RUNNER_SLOT]
+    # The dead worker's count is archived; its replacement adds its own
+    assert total_requests() == 12
+    assert not os.path.exists(telemetry._snapshot_path(before[0]))
+
+
+def test_roll_replaces_workers_but_not_the_job_runner(supervisor):
+    before = start(supervisor)
+
+    supervisor.roll()
+    reap_until(supervisor, lambda: not supervisor.retiring)
+
+    after = pids(supervisor)
+    assert after[JOB_RUNNER_SLOT] == before[JOB_RUNNER_SLOT]
+    assert {after[0], after[1]}.isdisjoint({before[0], before[1]})
+    assert not alive(before[0]) and not alive(before[1])
+    # Totals do not go backwards across the roll
+    assert total_requests() == 15
+
+
+def test_roll_keeps_the_old_worker_when_its_replacement_never_starts(supervisor, monkeypatch):
+    before = start(supervisor)
+    monkeypatch.setattr(prefork_server, "WORKER_READY_TIMEOUT", 0.5)
+    monkeypatch.setattr(prefork_server, "run_worker", lambda sock, fd: stand_in(sock, fd, ready=False))
+
+    supervisor.roll()
+
+    assert not supervisor.retiring
+    assert before[0] in supervisor.slots and alive(before[0])
+    assert pids(supervisor)[1] == before[1]
+
+
+def test_shutdown_kills_workers_that_ignore_sigterm(supervisor, monkeypatch):
+    monkeypatch.setattr(prefork_server, "run_worker", lambda sock, fd: stand_in(sock, fd, ignore_sigterm=True))
+    monkeypatch.setattr(prefork_server, "WORKER_STOP_TIMEOUT", 0.3)
+    before = start(supervisor)
+
+    supervisor.shutdown()
+
+    assert not supervisor.slots and not supervisor.retiring
+    assert not any(alive(pid) for pid in before.values())
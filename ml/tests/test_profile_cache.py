@@ -0,0 +1,136 @@
+# ml/tests/test_profile_cache.py
+import time
+import threading
+import pytest
+
+import profile_cache
+from profile_cache import ProfileAnalysisCache
+
+URLS = ("https://github.com/a", "", "https://a.dev")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(profile_cache.time, "time", clock.time)
+    return clock
+
+
+class Api:
+    """Counts calls; returns a numbered analysis, or what `result` is set to"""
+
+    def __init__(self, delay: float = 0):
+        self.calls = 0
+        self.delay = delay
+        self.result = "numbered"
+        self.lock = threading.Lock()
+
+    def __call__(self, github_url, linkedin_url, portfolio_url):
+        with self.lock:
+            self.calls += 1
+            n = self.calls
+        time.sleep(self.delay)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return {"n": n, "github": github_url} if self.result == "numbered" else self.result
+
+
+def test_results_are_cached_on_disk(tmp_path, clock):
+    path = str(tmp_path / "profiles.sqlite3")
+    api = Api()
+    cache = ProfileAnalysisCache(path, ttl=60)
+
+    assert not (tmp_path / "profiles.sqlite3").exists()   # opened on first use
+    assert cache.get(*URLS, api) == {"n": 1, "github": URLS[0]}
+    assert cache.get(*URLS, api) == {"n": 1, "github": URLS[0]}
+    # Another process (or a restart) reads the same file
+    assert ProfileAnalysisCache(path, ttl=60).get(*URLS, api)["n"] == 1
+    assert api.calls == 1
+    stats = cache.stats()
+    assert (stats["size"], stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 1, 0.5)
+
+
+def test_expired_entries_are_fetched_again(tmp_path, clock):
+    api = Api()
+    cache = ProfileAnalysisCache(str(tmp_path / "profiles.sqlite3"), ttl=60)
+
+    cache.get(*URLS, api)
+    clock.now += 61
+
+    assert cache.get(*URLS, api)["n"] == 2
+
+
+def test_unusable_results_and_errors_are_not_cached(tmp_path, clock):
+    api = Api()
+    cache = ProfileAnalysisCache(str(tmp_path / "profiles.sqlite3"), ttl=60)
+
+    api.result = None
+    assert cache.get(*URLS, api) is None
+    api.result = RuntimeError("analysis API down")
+    with pytest.raises(RuntimeError):
+        cache.get(*URLS, api)
+    api.result = "numbered"
+
+    assert cache.get(*URLS, api)["n"] == 3
+    assert cache.stats()["size"] == 1
+
+
+def test_concurrent_misses_share_one_call(tmp_path):
+    api = Api(delay=0.1)
+    cache = ProfileAnalysisCache(str(tmp_path / "profiles.sqlite3"), ttl=60)
+    results = []
+    start = threading.Barrier(8)
+
+    def lookup():
+        start.wait()
+        results.append(cache.get(*URLS, api))
+
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert api.calls == 1
+    assert results == [{"n": 1, "github": URLS[0]}] * 8
+
+
+def test_stale_entries_are_served_while_refreshing(tmp_path, clock):
+    api = Api()
+    cache = ProfileAnalysisCache(str(tmp_path / "profiles.sqlite3"), ttl=60, stale_ttl=600)
+    cache.get(*URLS, api)
+    clock.now += 120
+
+    assert cache.get(*URLS, api)["n"] == 1   # stale copy, refresh started
+    deadline = time.monotonic() + 5
+    while api.calls < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    while cache._inflight and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert cache.get(*URLS, api)["n"] == 2
+    assert cache.stats()["stale_hits"] == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    api = Api()
+    cache = ProfileAnalysisCache(str(tmp_path / "profiles.sqlite3"), ttl=60, max_entries=2)
+    for name in ("a", "b"):
+        cache.get(f"https://github.com/{name}", "", "", api)
+        clock.now += 1
+    cache.get("https://github.com/a", "", "", api)   # a is now the most recently used
+    clock.now += 1
+
+    cache.get("https://github.com/c", "", "", api)
+
+    assert cache.stats()["size"] == 2
+    assert cache.get("https://github.com/a", "", "", api)["n"] == 1
+    assert cache.get("https://github.com/b", "", "", api)["n"] == 4   # evicted, fetched again
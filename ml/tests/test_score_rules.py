@@ -0,0 +1,127 @@
+# ml/tests/test_score_rules.py
+"""The rule table (score_frame / score_row / calculate_scores) against the original scalar formulas"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import score_rules
+from course_features import DEFAULT_FEATURES
+from predict_student import calculate_scores
+
+
+def reference_scores(f: dict, activities: list, profile: dict) -> dict:
+    """The scalar formulas calculate_scores() applied before they moved into score_rules.RULES"""
+    has_degree = f["degree_courses"] > 0
+    effective_gpa = f["avg_grade_point"]
+    if has_degree and f["degree_gpa"] > 0:
+        effective_gpa = f["degree_gpa"]
+    elif not has_degree and f["diploma_gpa"] > 0:
+        effective_gpa = f["diploma_gpa"]
+
+    if f["programming_courses"] > 0:
+        programming = (f["programming_gpa"] * 25) + (f["programming_courses"] * 2.5)
+    else:
+        programming = effective_gpa * 20
+    if f["design_courses"] > 0:
+        design = (f["design_gpa"] * 25) + (f["soft_skills_gpa"] * 15) + (f["design_courses"] * 5)
+    else:
+        design = effective_gpa * 20
+    if f["infrastructure_courses"] > 0:
+        infrastructure = (f["infrastructure_gpa"] * 25) + (f["theory_gpa"] * 15) + (f["infrastructure_courses"] * 3)
+    else:
+        infrastructure = effective_gpa * 20
+
+    count = len(activities)
+    impact = leadership = relevance = 0
+    for activity in activities:
+        impact += activity.get("ai_impact_score", 0)
+        leadership += activity.get("ai_leadership_score", 0)
+        relevance += activity.get("ai_relevance_score", 0)
+    avg_impact = impact / count if count > 0 else 0
+    avg_leadership = leadership / count if count > 0 else 0
+    avg_relevance = relevance / count if count > 0 else 0
+    co_curricular = (
+        (avg_impact * 0.30) + (avg_leadership * 0.25) + (avg_relevance * 0.20)
+        + (min(count * 10, 100) * 0.10)
+        + ((f["soft_skills_courses"] * 8) + (f["soft_skills_gpa"] * 15)) * 0.15
+    )
+
+    comments_len = f["comments_total_len"]
+    feedback = min(100, 50 + (comments_len * 0.05)) if comments_len > 0 else effective_gpa * 15
+    engagement = (comments_len * 0.1) + (effective_gpa * 10)
+    engagement += profile["github_bonus"]
+    engagement += profile["portfolio_bonus"]
+    engagement += profile["linkedin_bonus"]
+
+    if profile["computing_relevance"] > 0:
+        multiplier = 1 + (profile["computing_relevance"] / 1000)
+        programming *= multiplier
+        design *= multiplier
+        infrastructure *= multiplier
+
+    values = [programming, design, infrastructure, co_curricular, feedback, engagement]
+    return {name: round(max(0, min(100, value)), 2) for name, value in zip(score_rules.SCORES, values)}
+
+
+def random_student(rng: np.random.Generator) -> tuple:
+    features = dict(DEFAULT_FEATURES)
+    for key in features:
+        if key.endswith("_gpa") or key == "avg_grade_point":
+            features[key] = float(rng.choice([0.0, rng.uniform(0, 4), round(rng.uniform(0, 4), 2)]))
+        elif key.endswith("_courses") or key in ("num_courses", "comments_count"):
+            features[key] = int(rng.choice([0, rng.integers(1, 25)]))
+        else:
+            features[key] = int(rng.choice([0, rng.integers(1, 3000)]))
+    activities = [
+        {"ai_impact_score": float(rng.uniform(0, 100)), "ai_leadership_score": int(rng.integers(0, 101)),
+         "ai_relevance_score": float(rng.uniform(0, 100))}
+        for _ in range(int(rng.integers(0, 14)))
+    ]
+    profile = {
+        "github_bonus": float(rng.choice([0, 10, 20, rng.uniform(0, 20)])),
+        "portfolio_bonus": float(rng.choice([0, 15])),
+        "linkedin_bonus": float(rng.choice([0, 15])),
+        "computing_relevance": float(rng.choice([0, rng.uniform(0, 100)])),
+    }
+    return features, activities, profile
+
+
+@pytest.fixture
+def students():
+    rng = np.random.default_rng(7)
+    return {sid: random_student(rng) for sid in range(2000)}
+
+
+def test_calculate_scores_matches_original_formulas(students):
+    for features, activities, profile in students.values():
+        scores, _, _ = calculate_scores(features, activities, profile)
+        assert scores == reference_scores(features, activities, profile)
+
+
+def test_calculate_scores_matches_score_frame(students):
+    frame = score_rules.score_frame(score_rules.cohort_features(
+        {sid: s[0] for sid, s in students.items()},
+        pd.DataFrame([{"student_id": sid, **a} for sid, s in students.items() for a in s[1]]),
+        {sid: s[2] for sid, s in students.items()},
+    ))
+    expected = frame.to_dict("index")
+    for sid, (features, activities, profile) in students.items():
+        assert calculate_scores(features, activities, profile)[0] == expected[sid]
+
+
+def test_activity_totals_match_activity_rows(students):
+    features, activities, profile = next(s for s in students.values() if s[1])
+    totals = {"count": len(activities),
+              **{k: sum(a[f"ai_{k}_score"] for a in activities) for k in ("impact", "leadership", "relevance")}}
+
+    assert (calculate_scores(features, [], profile, activity_totals=totals)[0]
+            == calculate_scores(features, activities, profile)[0])
+
+
+def test_score_row_uses_changed_weights():
+    features = {**DEFAULT_FEATURES, "programming_gpa": 3.0, "programming_courses": 4,
+                **dict.fromkeys(score_rules.ACTIVITY_COLUMNS + score_rules.PROFILE_COLUMNS, 0)}
+
+    assert score_rules.score_row(features)["programming_score"] == 85.0
+    assert score_rules.score_row(features, {"programming.gpa": 20})["programming_score"] == 70.0
@@ -0,0 +1,120 @@
+# ml/tests/test_structured_log.py
+import json
+import pytest
+
+import structured_log
+from structured_log import LEVELS, Trace, start_trace
+
+
+@pytest.fixture
+def logger(monkeypatch, capsys):
+    """Info level, no sampling, no telemetry hooks; returns a reader for the emitted events"""
+    monkeypatch.setattr(structured_log, "_threshold", LEVELS["info"])
+    monkeypatch.setattr(structured_log, "LOG_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(structured_log, "on_stage", None)
+    monkeypatch.setattr(structured_log, "on_finish", None)
+
+    def events():
+        return [json.loads(line) for line in capsys.readouterr().err.splitlines()]
+
+    return events
+
+
+def test_events_below_the_level_are_dropped(logger, monkeypatch):
+    structured_log.debug("hidden")
+    structured_log.info("shown", student_id=1)
+    monkeypatch.setattr(structured_log, "_threshold", LEVELS["error"])
+    structured_log.warning("hidden")
+    structured_log.error("failed", reason="boom")
+
+    events = logger()
+
+    assert [(e["level"], e["event"]) for e in events] == [("info", "shown"), ("error", "failed")]
+    assert events[0]["student_id"] == 1 and events[1]["reason"] == "boom"
+    assert all("ts" in e for e in events)
+
+
+def test_trace_emits_one_event_with_stage_timings(logger):
+    trace = start_trace("predict", student_id=7)
+    with trace.stage("fetch"):
+        pass
+    with trace.stage("model"):
+        pass
+    with trace.stage("fetch"):
+        pass
+    trace.event("activity", impact=80)   # dropped: not a debug trace
+    trace.finish(success=True)
+
+    [event] = logger()
+
+    assert isinstance(trace, Trace) and not trace.debug
+    assert (event["event"], event["student_id"], event["success"]) == ("predict", 7, True)
+    assert set(event["stages"]) == {"fetch", "model"}
+    assert [name for name, *_ in trace.spans] == ["fetch", "model", "fetch"]
+    assert "debug" not in event
+
+
+def test_debug_opt_in_records_detail_at_info_level(logger):
+    trace = start_trace("predict", debug=True, student_id=7)
+    trace.event("activity", impact=80)
+    trace.finish()
+
+    [event] = logger()
+
+    assert event["debug"] == [{"event": "activity", "impact": 80}]
+
+
+def test_debug_level_makes_every_trace_a_debug_trace(logger, monkeypatch):
+    monkeypatch.setattr(structured_log, "_threshold", LEVELS["debug"])
+
+    assert start_trace("predict").debug
+
+
+def test_sampled_out_requests_get_a_no_op_trace(logger, monkeypatch):
+    monkeypatch.setattr(structured_log, "LOG_SAMPLE_RATE", 0.0)
+
+    trace = start_trace("predict", student_id=7)
+    with trace.stage("fetch"):
+        pass
+    trace.event("activity", impact=80)
+    trace.finish(success=True)
+
+    assert trace.stages is None and trace.summary() is None
+    assert logger() == []
+
+    # Failures are still logged, without timings
+    trace = start_trace("predict", student_id=8)
+    trace.finish("error", error="boom")
+
+    [event] = logger()
+    assert (event["level"], event["student_id"], event["error"]) == ("error", 8, "boom")
+    assert "stages" not in event
+
+
+def test_warning_level_disables_request_traces(logger, monkeypatch):
+    monkeypatch.setattr(structured_log, "_threshold", LEVELS["warning"])
+
+    trace = start_trace("predict")
+    trace.finish(success=True)
+
+    assert trace.stages is None
+    assert logger() == []
+
+
+def test_hooks_see_stages_of_unlogged_requests(logger, monkeypatch):
+    stages, finished = [], []
+    monkeypatch.setattr(structured_log, "on_stage", lambda name, stage, seconds: stages.append((name, stage)))
+    monkeypatch.setattr(structured_log, "on_finish", lambda trace, level, fields, seconds: finished.append(level))
+    monkeypatch.setattr(structured_log, "LOG_SAMPLE_RATE", 0.0)
+
+    sampled_out = start_trace("predict")
+    with sampled_out.stage("fetch"):
+        pass
+    sampled_out.finish()
+    logged = start_trace("batch", debug=True)
+    with logged.stage("model"):
+        pass
+    logged.finish("warning")
+
+    assert stages == [("predict", "fetch"), ("batch", "model")]
+    assert finished == ["warning"]
@@ -0,0 +1,204 @@
+# ml/tests/test_telemetry.py
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import pytest
+
+import structured_log
+import telemetry
+from telemetry import (Counter, Gauge, Histogram, Registry, SpanExporter, _snapshot_path, _write_json,
+                       merge_snapshots, register_cache, render_families, retire_snapshot, trace_spans)
+
+
+def worker_families(requests: int, latencies: list, in_flight: int) -> dict:
+    buckets = [0.1, 1.0]
+    counts = [sum(1 for s in latencies if s <= 0.1), sum(1 for s in latencies if 0.1 < s <= 1.0),
+              sum(1 for s in latencies if s > 1.0)]
+    return {
+        "ml_requests_total": {"kind": "counter", "help": "Requests",
+                              "samples": [({"route": "/predict", "outcome": "success"}, requests)]},
+        "ml_request_duration_seconds": {"kind": "histogram", "help": "Request time", "buckets": buckets,
+                                        "samples": [({"route": "/predict"}, [counts, sum(latencies), len(latencies)])]},
+        "ml_requests_in_flight": {"kind": "gauge", "help": "In flight",
+                                  "samples": [({"route": "/predict"}, in_flight)]},
+    }
+
+
+def write_worker(pid: int, *args):
+    _write_json(_snapshot_path(pid), worker_families(*args))
+
+
+def totals(families: dict) -> tuple:
+    [(_, requests)] = families["ml_requests_total"]["samples"]
+    [(_, (counts, total, n))] = families["ml_request_duration_seconds"]["samples"]
+    gauges = {labels["pid"]: value for labels, value in families["ml_requests_in_flight"]["samples"]}
+    return requests, counts, n, gauges
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """A fresh registry for metrics created in the test; render() reads it directly"""
+    registry = Registry()
+    monkeypatch.setattr(telemetry, "REGISTRY", registry)
+    monkeypatch.setattr(telemetry, "METRICS_DIR", "")
+    return registry
+
+
+@pytest.fixture
+def metrics_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(telemetry, "METRICS_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_workers_are_summed(metrics_dir):
+    write_worker(101, 5, [0.05, 2.0], 1)
+    write_worker(102, 2, [0.5], 3)
+
+    requests, counts, n, gauges = totals(merge_snapshots())
+
+    assert (requests, counts, n) == (7, [1, 1, 1], 3)
+    assert gauges == {"101": 1, "102": 3}
+
+
+def test_totals_survive_a_worker_being_replaced(metrics_dir):
+    write_worker(101, 5, [0.05, 2.0], 1)
+    write_worker(102, 2, [0.5], 3)
+    before = totals(merge_snapshots())
+
+    retire_snapshot(101)
+    write_worker(103, 0, [], 0)   # its replacement starts from zero
+    requests, counts, n, gauges = totals(merge_snapshots())
+
+    assert (requests, n) == (before[0], before[2])
+    assert gauges == {"102": 3, "103": 0}
+    assert not (metrics_dir / "worker-101.json").exists()
+
+    retire_snapshot(102)
+    write_worker(103, 4, [0.05], 0)
+    assert totals(merge_snapshots())[:3] == (11, [2, 1, 1], 4)
+
+
+def test_snapshot_being_retired_is_counted_once(metrics_dir):
+    write_worker(101, 5, [0.05], 0)
+    retire_snapshot(101)
+    # The master archived the worker but a reader still finds its snapshot
+    write_worker(101, 5, [0.05], 0)
+
+    assert totals(merge_snapshots())[0] == 5
+
+
+def test_render_merged_histogram(metrics_dir):
+    write_worker(101, 1, [0.05, 2.0], 0)
+    write_worker(102, 1, [0.5], 0)
+
+    text = render_families(merge_snapshots())
+
+    assert 'ml_request_duration_seconds_bucket{route="/predict",le="1.0"} 2' in text
+    assert 'ml_request_duration_seconds_bucket{route="/predict",le="+Inf"} 3' in text
+    assert 'ml_requests_in_flight{route="/predict",pid="102"} 0.0' in text
+
+
+def test_render_exposition_format(registry):
+    requests = Counter("requests_total", "Requests", ("route", "outcome"))
+    in_flight = Gauge("in_flight", "In flight")
+    latency = Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1))
+    requests.inc(route="/predict", outcome="success")
+    requests.inc(2, route='/a"b', outcome="failure")
+    with in_flight.track():
+        in_flight.inc()
+    for seconds in (0.05, 0.1, 0.5, 3):
+        latency.observe(seconds, route="/predict")
+
+    assert telemetry.render().splitlines() == [
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        'requests_total{route="/predict",outcome="success"} 1.0',
+        'requests_total{route="/a\\"b",outcome="failure"} 2.0',
+        "# HELP in_flight In flight",
+        "# TYPE in_flight gauge",
+        "in_flight 1.0",
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/predict",le="0.1"} 2',
+        'latency_seconds_bucket{route="/predict",le="1.0"} 3',
+        'latency_seconds_bucket{route="/predict",le="+Inf"} 4',
+        'latency_seconds_sum{route="/predict"} 3.65',
+        'latency_seconds_count{route="/predict"} 4',
+    ]
+
+
+def test_collectors_are_read_at_scrape_time(registry):
+    stats = {"hits": 3, "stale_hits": 1, "misses": 4, "hit_ratio": 0.5, "size": 2}
+    register_cache("profiles", lambda: stats)
+    registry.add_collector(lambda: 1 / 0)   # a failing collector does not break the scrape
+
+    stats["misses"] = 6
+    families = registry.families()
+
+    assert families["ml_cache_hits_total"]["samples"] == [({"cache": "profiles"}, 4)]
+    assert families["ml_cache_misses_total"]["samples"] == [({"cache": "profiles"}, 6)]
+    assert 'ml_cache_entries{cache="profiles"} 2.0' in render_families(families)
+
+
+def test_install_times_every_stage(monkeypatch):
+    monkeypatch.setattr(structured_log, "on_stage", None)
+    monkeypatch.setattr(structured_log, "LOG_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(telemetry, "STAGE_SECONDS", Histogram("stage_seconds", "Stages", ("route", "stage")))
+    telemetry.install(endpoint="")
+
+    trace = structured_log.start_trace("predict")   # sampled out, still timed
+    with trace.stage("fetch"):
+        pass
+
+    [(labels, (_, _, n))] = telemetry.STAGE_SECONDS.samples()
+    assert (labels, n) == ({"route": "predict", "stage": "fetch"}, 1)
+
+
+def test_trace_spans_nest_stages_under_the_request(monkeypatch):
+    monkeypatch.setattr(structured_log, "on_stage", None)
+    trace = structured_log.Trace("predict", student_id=7)
+    with trace.stage("fetch"):
+        pass
+    with pytest.raises(RuntimeError):
+        with trace.stage("model"):
+            raise RuntimeError("boom")
+
+    root, fetch, model = trace_spans(trace, "error", {"error": "boom"}, 0.01)
+
+    assert root["name"] == "predict" and root["status"] == {"code": 2}
+    assert {"key": "student_id", "value": {"intValue": "7"}} in root["attributes"]
+    assert [fetch["name"], model["name"]] == ["fetch", "model"]
+    assert fetch["parentSpanId"] == model["parentSpanId"] == root["spanId"]
+    assert {fetch["traceId"], model["traceId"]} == {root["traceId"]}
+    assert (fetch["status"], model["status"]) == ({"code": 1}, {"code": 2})
+    assert int(root["startTimeUnixNano"]) <= int(fetch["startTimeUnixNano"]) <= int(model["startTimeUnixNano"])
+
+
+def test_span_exporter_posts_otlp_json():
+    received = []
+
+    class Collector(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append((self.path, json.loads(self.rfile.read(int(self.headers["Content-Length"])))))
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Collector)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        exporter = SpanExporter(f"http://127.0.0.1:{server.server_port}", service_name="test", interval=3600)
+        exporter.export([{"name": "predict"}])
+    finally:
+        server.shutdown()
+    exporter.url = "http://127.0.0.1:1/v1/traces"
+    exporter.export([{"name": "lost"}])
+
+    [(path, body)] = received
+    assert path == "/v1/traces"
+    [resource] = body["resourceSpans"]
+    assert resource["resource"]["attributes"] == [{"key": "service.name", "value": {"stringValue": "test"}}]
+    assert resource["scopeSpans"][0]["spans"] == [{"name": "predict"}]
+    assert (exporter.exported, exporter.dropped) == (1, 1)
@@ -0,0 +1,36 @@
+# ml/tests/test_train_and_upload.py
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from incremental_model import IncrementalModel
+from train_and_upload import ModelArtifactError, build_model, fit_model, load_forest_model
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.random((40, 3)), columns=["a", "b", "c"])
+    y = pd.DataFrame({"t1": X["a"] * 2, "t2": X["b"] + X["c"]})
+    return X, y
+
+
+@pytest.mark.parametrize("kind", ["multi", "native"])
+def test_warm_start_grows_saved_forest(tmp_path, data, kind):
+    X, y = data
+    path = tmp_path / "model.joblib"
+    joblib.dump(build_model(kind, n_estimators=5, n_jobs=None).fit(X, y), path)
+
+    model, timing = fit_model(X, y, kind, n_jobs=None, warm_start=3, base_model=load_forest_model(path))
+
+    per_target = 2 if kind == "multi" else 1
+    assert timing["trees"] == 8 * per_target
+
+
+def test_warm_start_refuses_incremental_model(tmp_path):
+    path = tmp_path / "model.joblib"
+    joblib.dump(IncrementalModel(), path)
+
+    with pytest.raises(ModelArtifactError, match="IncrementalModel, not a random forest"):
+        load_forest_model(path)
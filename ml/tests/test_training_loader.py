@@ -0,0 +1,71 @@
+# ml/tests/test_training_loader.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import dataset_io
+from dataset_io import read_table, write_table
+from course_features import MODEL_FEATURES
+from train_and_upload import TRAINING_COLUMNS, build_targets, build_training_df
+from training_loader import LABEL_COLUMNS, load_training_frame
+
+FORMATS = ["csv", pytest.param("parquet", marks=pytest.mark.skipif(not dataset_io.PYARROW_AVAILABLE,
+                                                                    reason="needs pyarrow"))]
+
+
+def write_dataset(output_dir, fmt: str, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    grades = ["A+", "A", "a-", "B+ ", "B", "C", "D", "F", "CR", "EX", None]
+    students = pd.DataFrame({
+        "id": np.arange(1, 41),
+        "name": [f"s{i}" for i in range(40)],
+        "feedback_sentiment_score": [None if i % 3 else float(i) for i in range(40)],
+        "professional_engagement_score": [None if i % 4 else i / 2 for i in range(40)],
+    })
+    courses = pd.DataFrame({
+        "id": np.arange(1, 301),
+        # Students 39 and 40 have no courses
+        "student_id": rng.integers(1, 39, 300),
+        "course_code": rng.choice(["CS2000", "CS3000", "MPU2000"], 300),
+        "course_name": rng.choice(["Programming", "Networks", "Speaking"], 300),
+        "grade": [grades[i] for i in rng.integers(len(grades), size=300)],
+        "credit_hour": rng.choice([1.0, 2.0, 3.0, 4.0], 300),
+    })
+    comments = pd.DataFrame({
+        "id": np.arange(1, 81),
+        "student_id": rng.integers(1, 41, 80),
+        "content": ["[Comment deleted]" if i % 7 == 0 else "x" * (i + 1) for i in range(80)],
+    })
+    for name, df in (("students", students), ("courses", courses), ("student_comments", comments)):
+        write_table(df, name, fmt, output_dir)
+
+
+def reference(output_dir):
+    """X, y from the in-memory builder on the same files"""
+    tables = [read_table(name, TRAINING_COLUMNS[name], output_dir)
+              for name in ("students", "courses", "student_comments")]
+    return build_training_df(*tables)
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+@pytest.mark.parametrize("chunk_rows", [7, 10_000])
+def test_chunked_loader_matches_build_training_df(tmp_path, fmt, chunk_rows):
+    write_dataset(tmp_path, fmt)
+    X_expected, y_expected = reference(tmp_path)
+
+    frame, throughput = load_training_frame(tmp_path, chunk_rows=chunk_rows)
+    X = frame[MODEL_FEATURES]
+
+    pd.testing.assert_frame_equal(X, X_expected, check_dtype=False, check_names=False)
+    pd.testing.assert_frame_equal(build_targets(X, frame), y_expected, check_dtype=False, check_names=False)
+    assert list(frame.columns) == MODEL_FEATURES + LABEL_COLUMNS
+    assert throughput["courses"]["rows"] == 300
+
+
+def test_result_does_not_depend_on_chunk_boundaries(tmp_path):
+    write_dataset(tmp_path, "csv", seed=3)
+
+    whole, _ = load_training_frame(tmp_path, chunk_rows=10_000)
+    chunked, _ = load_training_frame(tmp_path, chunk_rows=3)
+
+    pd.testing.assert_frame_equal(whole, chunked)
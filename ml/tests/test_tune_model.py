@@ -0,0 +1,53 @@
+# ml/tests/test_tune_model.py
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+import tune_model
+from course_features import MODEL_FEATURES
+
+CONFIGS = [{"estimator": "extra_trees", "n_estimators": 5, "max_depth": depth} for depth in (None, 3)]
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.random((30, len(MODEL_FEATURES))), columns=MODEL_FEATURES)
+    y = pd.DataFrame({"t1": X.iloc[:, 0] * 3, "t2": X.iloc[:, 1]})
+    return X, y
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch, data):
+    monkeypatch.setattr(tune_model, "TUNING_DIR", str(tmp_path))
+    return tune_model.prepare_data(*data, folds=3)
+
+
+def test_folds_do_not_measure_latency(data_dir, data):
+    result = tune_model.run_fold(data_dir, CONFIGS[0], 0, 3, list(data[1].columns))
+
+    assert "latency" not in result
+    assert tune_model._cached(data_dir, CONFIGS[0], "fold-0") == result
+
+
+def test_latency_measured_once_per_config_in_parent(data_dir, data, monkeypatch):
+    calls = []
+    measure = tune_model.measure_latency
+
+    def recording_measure(model, X):
+        calls.append((os.getpid(), model.n_jobs))
+        return measure(model, X, repeats=2)
+
+    monkeypatch.setattr(tune_model, "measure_latency", recording_measure)
+    tune_model.measure_configs(data_dir, CONFIGS, *data)
+    tune_model.measure_configs(data_dir, CONFIGS, *data)
+
+    # One serial measurement per configuration, of the served (n_jobs=None) model, then cached
+    assert calls == [(os.getpid(), None)] * len(CONFIGS)
+    for config in CONFIGS:
+        latency = tune_model._cached(data_dir, config, "latency")
+        assert {"single_ms_p50", "single_ms_p95", "batch_ms"} <= set(latency)
+
+    tune_model.measure_configs(data_dir, CONFIGS[:1], *data, remeasure=True)
+    assert len(calls) == len(CONFIGS) + 1
@@ -1,6 +1,7 @@
 # ml/train_and_upload.py
 
 import os
+import time
 import joblib
 import pandas as pd
 from sklearn.ensemble import RandomForestRegressor
@@ -8,6 +9,10 @@ from sklearn.model_selection import train_test_split
 from sklearn.multioutput import MultiOutputRegressor
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from dotenv import load_dotenv
+from course_features import CATEGORY_INDEX, TRAINING_GRADE_POINTS, MODEL_FEATURES
+from model_registry import save_model
+from flat_forest import export_forest
+from dataset_io import read_table
 
 # ─────────────────────────────────────────────
 # Load environment variables
@@ -18,20 +23,41 @@ SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SERVICE_ROLE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 BUCKET = os.environ.get("SUPABASE_BUCKET", "ml-models")
 MODEL_FILE = os.environ.get("MODEL_FILE_NAME", "model.joblib")
-LOCAL_MODEL_PATH = MODEL_FILE
+# Saved next to predict_student.py so a running API server hot-reloads it
+LOCAL_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), MODEL_FILE)
+# Memory-mappable flat forest export (see flat_forest.py)
+FLAT_MODEL_PATH = os.path.splitext(LOCAL_MODEL_PATH)[0] + ".forest"
+
+# Trees per forest, and training processes (-1 = all cores)
+N_ESTIMATORS = 200
+TRAIN_N_JOBS = int(os.environ.get("TRAIN_N_JOBS", -1))
+# multi: one forest per target (MultiOutputRegressor); native: one multi-output forest for all targets
+MODEL_KINDS = ("multi", "native")
 
 # ─────────────────────────────────────────────
-# Load dataset from ml/output
+# Load dataset from ml/output (Parquet or CSV, see dataset_io.py)
 # ─────────────────────────────────────────────
-df_students = pd.read_csv("ml/output/students.csv")
-df_courses = pd.read_csv("ml/output/courses.csv")
+# Only the columns used by build_training_df
+TRAINING_COLUMNS = {
+    "students": ["id", "feedback_sentiment_score", "professional_engagement_score"],
+    "courses": ["id", "student_id", "grade", "credit_hour"],
+    "student_comments": ["id", "student_id", "content"],
+}
+
+
+def load_dataset(columns=TRAINING_COLUMNS):
+    """Read students, courses and comments, projected to `columns` (per table; None = all)"""
+    df_students = read_table("students", columns.get("students"))
+    df_courses = read_table("courses", columns.get("courses"))
+
+    # Comments file might not exist yet
+    try:
+        df_comments = read_table("student_comments", columns.get("student_comments"), on_bad_lines="skip")
+    except FileNotFoundError:
+        print("⚠️ No student_comments file found. Creating empty DataFrame.")
+        df_comments = pd.DataFrame(columns=["id", "student_id", "content"])
 
-# Comments file might not exist yet
-try:
-    df_comments = pd.read_csv("ml/output/student_comments.csv", on_bad_lines="skip")
-except FileNotFoundError:
-    print("⚠️ No student_comments.csv found. Creating empty DataFrame.")
-    df_comments = pd.DataFrame(columns=["id", "student_id", "content"])
+    return df_students, df_courses, df_comments
 
 
 # ─────────────────────────────────────────────
@@ -39,16 +65,8 @@ except FileNotFoundError:
 # ─────────────────────────────────────────────
 def build_training_df(df_students, df_courses, df_comments):
 
-    grade_map = {
-        "A+": 4.0, "A": 4.0, "A-": 3.67,
-        "B+": 3.33, "B": 3.0, "B-": 2.67,
-        "C+": 2.33, "C": 2.0,
-        "D+": 1.33, "D": 1.0,
-        "F": 0.0
-    }
-
-    df_courses["grade_norm"] = df_courses["grade"].fillna("").str.upper().str.strip()
-    df_courses["grade_point"] = df_courses["grade_norm"].map(grade_map)
+    df_courses["grade_norm"] = df_courses["grade"].astype(object).fillna("").str.upper().str.strip()
+    df_courses["grade_point"] = df_courses["grade_norm"].map(TRAINING_GRADE_POINTS)
 
     course_stats = df_courses.groupby("student_id").agg(
         total_units=("credit_hour", "sum"),
@@ -61,9 +79,11 @@ def build_training_df(df_students, df_courses, df_comments):
         # Filter out deleted comments
         active_comments = df_comments[df_comments["content"] != "[Comment deleted]"]
         
-        comment_stats = active_comments.groupby("student_id").agg(
+        comment_stats = active_comments.assign(
+            content_len=active_comments["content"].str.len()
+        ).groupby("student_id").agg(
             comments_count=("id", "count"),
-            comments_total_len=("content", lambda x: x.str.len().sum())
+            comments_total_len=("content_len", "sum")
         ).reset_index()
     else:
         comment_stats = pd.DataFrame(columns=["student_id", "comments_count", "comments_total_len"])
@@ -88,7 +108,16 @@ def build_training_df(df_students, df_courses, df_comments):
         df["professional_engagement_score"] = None
 
     X = df[["total_units", "avg_grade_point", "num_courses", "comments_count", "comments_total_len"]]
+    y = build_targets(X, df)
+
+    return X, y
 
+
+def build_targets(X, df):
+    """
+    Training targets for feature matrix X; `df` (same index) may carry the
+    AI-analyzed feedback_sentiment_score / professional_engagement_score.
+    """
     # Use actual scores from database where available, synthetic for missing
     y = pd.DataFrame({
         "programming_score": X['avg_grade_point'] * 25 + X['num_courses'] * 0.5,
@@ -101,15 +130,151 @@ def build_training_df(df_students, df_courses, df_comments):
         "professional_engagement_score": df['professional_engagement_score'].fillna(X['comments_total_len'] * 0.1 + X['avg_grade_point'] * 10)
     }, index=X.index)
 
-    return X, y
+    return y
 
 
 # ─────────────────────────────────────────────
 # Train Model
 # ─────────────────────────────────────────────
-def train_local_model():
+def load_training_data(source="csv", chunk_rows=None):
+    """
+    X, y for training. `source="store"` reads the pre-aggregated feature store
+    (see feature_store.py) instead of re-aggregating the full CSVs; with
+    `chunk_rows` the tables are streamed in chunks (see training_loader.py).
+    """
+    if source == "store":
+        from feature_store import FeatureStore
+        frame = FeatureStore().training_frame()
+        X = frame[MODEL_FEATURES]
+        return X, build_targets(X, frame)
+
+    if chunk_rows:
+        from training_loader import load_training_frame
+        CATEGORY_INDEX.load()
+        frame, throughput = load_training_frame(chunk_rows=chunk_rows, category_index=CATEGORY_INDEX)
+        CATEGORY_INDEX.save()
+        print("Course category index saved:", CATEGORY_INDEX.path, CATEGORY_INDEX.stats())
+        X = frame[MODEL_FEATURES]
+        return X, build_targets(X, frame)
+
+    # Course code/name are read only to warm the persisted course-category table
+    columns = dict(TRAINING_COLUMNS, courses=TRAINING_COLUMNS["courses"] + ["course_code", "course_name"])
+    df_students, df_courses, df_comments = load_dataset(columns)
+
+    # Build the persisted course-category table so prediction starts warm
+    CATEGORY_INDEX.load()
+    CATEGORY_INDEX.warm(df_courses)
+    CATEGORY_INDEX.save()
+    print("Course category index saved:", CATEGORY_INDEX.path, CATEGORY_INDEX.stats())
+
+    return build_training_df(df_students, df_courses, df_comments)
+
+
+def build_model(kind="multi", n_estimators=N_ESTIMATORS, n_jobs=TRAIN_N_JOBS, **forest_params):
+    """
+    Untrained model. "multi" fits one forest per target (the original layout; targets in turn,
+    each forest's trees across `n_jobs` cores); "native" fits a single multi-output forest for
+    all targets at once, i.e. n_estimators trees instead of one forest per target.
+    `forest_params` (max_depth, max_features, ...) are passed to RandomForestRegressor.
+    """
+    forest = RandomForestRegressor(n_estimators=n_estimators, random_state=42, n_jobs=n_jobs, **forest_params)
+    if kind == "native":
+        return forest
+    if kind == "multi":
+        return MultiOutputRegressor(forest)
+    raise ValueError(f"Unknown model kind: {kind}")
+
+
+def _model_forests(model):
+    """The fitted (or to-be-fitted) RandomForestRegressor(s) inside a model"""
+    if isinstance(model, MultiOutputRegressor):
+        return getattr(model, "estimators_", [model.estimator])
+    return [model]
+
+
+def set_n_jobs(model, n_jobs):
+    # Training uses every core; a served model predicts one row at a time, where
+    # starting a pool of workers per call costs more than walking the trees
+    if isinstance(model, MultiOutputRegressor):
+        model.estimator.set_params(n_jobs=n_jobs)
+    for forest in _model_forests(model):
+        forest.set_params(n_jobs=n_jobs)
+    return model
+
+
+class ModelArtifactError(ValueError):
+    """The saved model artifact is not of the kind the requested training mode works on"""
+
+
+def load_forest_model(path=LOCAL_MODEL_PATH):
+    """Load a saved random forest model to warm-start; other artifacts (e.g. --model sgd) are refused"""
+    model = joblib.load(path)
+    forests = getattr(model, "estimators_", []) if isinstance(model, MultiOutputRegressor) else [model]
+    if not forests or not all(isinstance(forest, RandomForestRegressor) for forest in forests):
+        raise ModelArtifactError(f"{path} holds a {type(model).__name__}, not a random forest; --warm-start only grows "
+                         "forests (retrain without --warm-start, or use --model sgd --update for the SGD backend)")
+    return model
+
+
+def warm_start_model(model, X, y, extra_trees, n_jobs=TRAIN_N_JOBS):
+    """
+    Grow an already fitted model by `extra_trees` trees per forest, fitted on X, y (new data);
+    the existing trees are kept as they are.
+    """
+    set_n_jobs(model, n_jobs)
+    if isinstance(model, MultiOutputRegressor):
+        # MultiOutputRegressor.fit() would refit clones from scratch; grow each target's forest instead
+        if len(model.estimators_) != y.shape[1]:
+            raise ValueError(f"Model has {len(model.estimators_)} targets, data has {y.shape[1]}")
+        for i, forest in enumerate(model.estimators_):
+            forest.set_params(warm_start=True, n_estimators=len(forest.estimators_) + extra_trees)
+            forest.fit(X, y.iloc[:, i])
+            forest.set_params(warm_start=False)
+    else:
+        model.set_params(warm_start=True, n_estimators=len(model.estimators_) + extra_trees)
+        model.fit(X, y)
+        model.set_params(warm_start=False)
+    return model
 
-    X, y = build_training_df(df_students, df_courses, df_comments)
+
+def fit_model(X_train, y_train, kind="multi", n_jobs=TRAIN_N_JOBS, warm_start=0, compare_serial=False,
+              base_model=None):
+    """
+    Fit (or with `warm_start` > 0, grow the saved model, or `base_model`, by that many trees per
+    forest) and report wall time; with `compare_serial`, also time the original serial fit for the speed-up.
+    """
+    start = time.perf_counter()
+    if warm_start:
+        print(f"Warm start: adding {warm_start} trees per forest to {LOCAL_MODEL_PATH}...")
+        model = base_model if base_model is not None else load_forest_model()
+        model = warm_start_model(model, X_train, y_train, warm_start, n_jobs)
+    else:
+        print(f"Training model ({kind}, n_jobs={n_jobs})...")
+        model = build_model(kind, n_jobs=n_jobs)
+        model.fit(X_train, y_train)
+    kind = "multi" if isinstance(model, MultiOutputRegressor) else "native"
+    timing = {"kind": kind, "n_jobs": n_jobs, "warm_start": warm_start,
+              "trees": sum(len(f.estimators_) for f in _model_forests(model)),
+              "seconds": round(time.perf_counter() - start, 3)}
+    print(f"⏱️ Fitted {timing['trees']} trees in {timing['seconds']:.2f}s")
+
+    if compare_serial:
+        start = time.perf_counter()
+        build_model("multi", n_jobs=None).fit(X_train, y_train)
+        timing["serial_seconds"] = round(time.perf_counter() - start, 3)
+        timing["speedup"] = round(timing["serial_seconds"] / max(timing["seconds"], 1e-9), 2)
+        print(f"⏱️ Serial multi-forest fit: {timing['serial_seconds']:.2f}s → speed-up {timing['speedup']}x")
+
+    return set_n_jobs(model, None), timing
+
+
+def train_local_model(model_format="joblib", source="csv", chunk_rows=None,
+                      kind="multi", n_jobs=TRAIN_N_JOBS, warm_start=0, compare_serial=False):
+
+    # Refuse an unusable saved model before spending time on the data
+    base_model = load_forest_model() if warm_start else None
+
+    X, y = load_training_data(source, chunk_rows)
 
     print("Training dataset shape:", X.shape)
     
@@ -125,24 +290,30 @@ def train_local_model():
             X, y, test_size=0.2, random_state=42
         )
 
-    model = MultiOutputRegressor(
-        RandomForestRegressor(n_estimators=200, random_state=42)
-    )
-
-    print("Training model...")
-    model.fit(X_train, y_train)
+    model, timing = fit_model(X_train, y_train, kind, n_jobs, warm_start, compare_serial, base_model)
 
     # Save model
-    joblib.dump(model, LOCAL_MODEL_PATH)
-    print("Model saved locally:", LOCAL_MODEL_PATH)
+    if model_format in ("joblib", "both"):
+        save_model(model, LOCAL_MODEL_PATH)
+        print("Model saved locally:", LOCAL_MODEL_PATH)
+    if model_format in ("flat", "both"):
+        export_forest(model, FLAT_MODEL_PATH)
+        print("Flat forest saved locally:", FLAT_MODEL_PATH)
 
     # ─────────────────────────────────────────────
     # Evaluation
     # ─────────────────────────────────────────────
+    results = evaluate_model(model, X_test, y_test)
+    results["training"] = timing
+    return model, results
+
+
+def evaluate_model(model, X_test, y_test, verbose=True):
+    """MAE / RMSE / R2 per target column of y_test"""
     y_pred = model.predict(X_test)
     results = {}
 
-    for i, col in enumerate(y.columns):
+    for i, col in enumerate(y_test.columns):
         mae = mean_absolute_error(y_test.iloc[:, i], y_pred[:, i])
         rmse = mean_squared_error(y_test.iloc[:, i], y_pred[:, i]) ** 0.5  # FIXED
         r2 = r2_score(y_test.iloc[:, i], y_pred[:, i])
@@ -153,14 +324,110 @@ def train_local_model():
             "R2 Score": round(r2, 4)
         }
 
-    print("\n────────────── ML Evaluation ──────────────")
-    for col, metrics in results.items():
-        print(f"\n📌 {col}")
-        for m, v in metrics.items():
-            print(f"   {m}: {v}")
+    if verbose:
+        print("\n────────────── ML Evaluation ──────────────")
+        for col, metrics in results.items():
+            print(f"\n📌 {col}")
+            for m, v in metrics.items():
+                print(f"   {m}: {v}")
+
+    return results
+
+
+def _print_comparison(sgd: dict, forest: dict):
+    print("\n──────── SGD (incremental) vs random forest ────────")
+    print(f"{'target':<32}{'SGD MAE':>10}{'SGD R2':>9}{'RF MAE':>10}{'RF R2':>9}")
+    for col in sgd:
+        print(f"{col:<32}{sgd[col]['MAE']:>10}{sgd[col]['R2 Score']:>9}"
+              f"{forest[col]['MAE']:>10}{forest[col]['R2 Score']:>9}")
+
+
+def train_incremental_model(source="store", batch_rows=None, epochs=None, update=False,
+                            compare_forest=False, n_jobs=TRAIN_N_JOBS):
+    """
+    Train (or with `update`, update from the feature store changes) the incremental SGD
+    backend and save it as the deployed model.joblib. With `compare_forest` the random
+    forest is also fitted on the same training rows and both are evaluated on the holdout.
+    """
+    import incremental_model as inc
+    batch_rows = batch_rows or inc.BATCH_ROWS
 
+    if update:
+        model = joblib.load(LOCAL_MODEL_PATH)
+        if not isinstance(model, inc.IncrementalModel):
+            raise ModelArtifactError(f"{LOCAL_MODEL_PATH} is not an incremental model; train one with --model sgd first")
+        model, X_test, y_test, changed, seconds = inc.update_incremental(model, batch_rows)
+        print(f"⏱️ Updated with {changed} changed students in {seconds:.3f}s (store seq {model.store_seq})")
+        timing = {"kind": "sgd", "update": True, "students": changed, "seconds": round(seconds, 3)}
+        training_rows = None
+        if not changed:
+            # Nothing to learn: keep the deployed artifact (and the server's loaded model) as is
+            return model, {"training": timing}
+    else:
+        print(f"Training incremental model (SGD, {batch_rows} rows/batch, source={source})...")
+        model, X_test, y_test, seconds, training_rows = inc.train_incremental(
+            source, batch_rows, epochs or inc.EPOCHS, keep_training_rows=compare_forest)
+        print(f"⏱️ Trained on {model.samples_seen} rows (all epochs) in {seconds:.2f}s")
+        timing = {"kind": "sgd", "update": False, "seconds": round(seconds, 3)}
+
+    save_model(model, LOCAL_MODEL_PATH)
+    print("Model saved locally:", LOCAL_MODEL_PATH)
+
+    if X_test is None:
+        print("No holdout students in this batch of changes; skipping evaluation.")
+        return model, {"training": timing}
+
+    results = evaluate_model(model, X_test, y_test)
+    if compare_forest and training_rows is not None:
+        X_train, y_train = training_rows
+        forest, forest_timing = fit_model(X_train, y_train, "multi", n_jobs)
+        forest_results = evaluate_model(forest, X_test, y_test, verbose=False)
+        _print_comparison(results, forest_results)
+        print(f"⏱️ Time to update: SGD {timing['seconds']:.2f}s (full stream) vs random forest refit "
+              f"{forest_timing['seconds']:.2f}s; `--update` only reads changed students")
+        timing["forest_seconds"] = forest_timing["seconds"]
+        results["forest"] = forest_results
+    results["training"] = timing
     return model, results
 
 
 if __name__ == "__main__":
-    train_local_model()
+    import argparse
+    p = argparse.ArgumentParser()
+    p.add_argument("--format", choices=["joblib", "flat", "both"], default="joblib",
+                   help="Model artifact format: joblib pickle, memory-mappable flat forest, or both")
+    p.add_argument("--source", choices=["csv", "store"], default="csv",
+                   help="Training data: ml/output CSVs or the incremental feature store")
+    p.add_argument("--chunk-size", type=int, default=None,
+                   help="Stream the CSVs in chunks of this many rows (bounded memory for very large exports)")
+    p.add_argument("--model", choices=MODEL_KINDS + ("sgd",), default="multi",
+                   help="One forest per target (multi), a single multi-output forest (native), "
+                        "or the incremental SGD backend (sgd, see incremental_model.py)")
+    p.add_argument("--n-jobs", type=int, default=TRAIN_N_JOBS,
+                   help="Cores used to fit trees (-1 = all; default TRAIN_N_JOBS or -1)")
+    p.add_argument("--warm-start", type=int, default=0, metavar="TREES",
+                   help="Add this many trees per forest to the saved model, fitted on the current data")
+    p.add_argument("--compare-serial", action="store_true",
+                   help="Also time the original serial fit and report the speed-up")
+    p.add_argument("--update", action="store_true",
+                   help="sgd: update the saved model with the students changed in the feature store since its last update")
+    p.add_argument("--batch-size", type=int, default=None, help="sgd: rows per partial_fit mini-batch")
+    p.add_argument("--epochs", type=int, default=None, help="sgd: passes over the training stream")
+    p.add_argument("--compare-forest", action="store_true",
+                   help="sgd: also fit the random forest on the same rows and compare accuracy and time")
+    args = p.parse_args()
+    if args.model == "sgd":
+        if args.format != "joblib":
+            p.error("--model sgd is saved as joblib only (the flat format is for forests)")
+        try:
+            train_incremental_model(source=args.source, batch_rows=args.batch_size, epochs=args.epochs,
+                                    update=args.update, compare_forest=args.compare_forest, n_jobs=args.n_jobs)
+        except ModelArtifactError as e:
+            p.exit(1, f"❌ {e}\n")
+    else:
+        try:
+            train_local_model(model_format=args.format, source=args.source, chunk_rows=args.chunk_size,
+                              kind=args.model, n_jobs=args.n_jobs, warm_start=args.warm_start,
+                              compare_serial=args.compare_serial)
+        except ModelArtifactError as e:
+            p.exit(1, f"❌ {e}\n")
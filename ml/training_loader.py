@@ -0,0 +1,156 @@
+# ml/training_loader.py
+"""
+Streaming, chunked training-data loader.
+
+train_and_upload.build_training_df() needs every course and comment row in
+memory at once. This loader produces the same X / y by reading the tables
+(Parquet row batches or CSV chunks, see dataset_io.py) in fixed-size chunks
+with only the columns it needs and narrow dtypes, folding per-chunk partial
+aggregates into running per-student totals:
+
+    courses   credit-hour sum, row count, graded count, grade-point sum
+    comments  non-deleted comment count and total length
+
+Peak memory is one chunk plus one row of totals per student, independent of
+the number of course rows. Grade points are summed as integer hundredths so
+the result does not depend on the chunk boundaries.
+"""
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from course_features import TRAINING_GRADE_POINTS, MODEL_FEATURES
+from dataset_io import OUTPUT_DIR, iter_table
+
+CHUNK_ROWS = 500_000
+DELETED_COMMENT = "[Comment deleted]"
+LABEL_COLUMNS = ["feedback_sentiment_score", "professional_engagement_score"]
+
+# Only the columns aggregated for training (dtypes come from dataset_io.SCHEMAS;
+# nullable student_id: rows without one are dropped by groupby, as in build_training_df)
+COURSE_COLUMNS = ["student_id", "grade", "credit_hour"]
+COMMENT_COLUMNS = ["student_id", "content"]
+
+# Grade -> integer hundredths of a grade point (-1 = not graded)
+GRADE_HUNDREDTHS = {grade: int(round(points * 100)) for grade, points in TRAINING_GRADE_POINTS.items()}
+
+
+class Throughput:
+    """Rows/sec counter for one input table"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = 0
+        self.start = time.perf_counter()
+
+    def add(self, rows: int):
+        self.rows += rows
+
+    def report(self) -> dict:
+        elapsed = time.perf_counter() - self.start
+        rate = self.rows / elapsed if elapsed > 0 else 0.0
+        print(f"📥 {self.name}: {self.rows:,} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec)", file=sys.stderr)
+        return {"rows": self.rows, "seconds": round(elapsed, 3), "rows_per_sec": round(rate, 1)}
+
+
+def _fold(total: pd.DataFrame | None, partial: pd.DataFrame) -> pd.DataFrame:
+    return partial if total is None else total.add(partial, fill_value=0)
+
+
+def _grade_hundredths(grades: pd.Series) -> np.ndarray:
+    if isinstance(grades.dtype, pd.CategoricalDtype):
+        # Normalize and map the (few) categories once, then broadcast by code
+        categories = pd.Series(grades.cat.categories, dtype=object).str.upper().str.strip()
+        table = np.append(categories.map(GRADE_HUNDREDTHS).fillna(-1).to_numpy(dtype=np.int64), -1)
+        return table[grades.cat.codes.to_numpy()]  # code -1 (missing) hits the appended -1
+    return grades.astype(object).fillna("").astype(str).str.upper().str.strip().map(GRADE_HUNDREDTHS).fillna(-1).to_numpy(dtype=np.int64)
+
+
+def aggregate_courses(output_dir: Path = OUTPUT_DIR, chunk_rows: int = CHUNK_ROWS, category_index=None):
+    """
+    Per-student course totals: units, num_courses, graded, gp_hundredths.
+    With `category_index`, every distinct course seen is also added to it (see CourseCategoryIndex.warm).
+    """
+    total = None
+    meter = Throughput("courses")
+    columns = COURSE_COLUMNS + (["course_code", "course_name"] if category_index is not None else [])
+    for chunk in iter_table("courses", columns, chunk_rows, output_dir):
+        if category_index is not None:
+            category_index.warm(chunk[["course_code", "course_name"]].drop_duplicates())
+        gp = _grade_hundredths(chunk["grade"])
+        graded = gp >= 0
+        partial = pd.DataFrame({
+            "units": chunk["credit_hour"].to_numpy(),
+            "num_courses": 1,
+            "graded": graded.astype(np.int64),
+            "gp_hundredths": np.where(graded, gp, 0),
+        }, index=chunk.index).groupby(chunk["student_id"]).sum()
+        total = _fold(total, partial)
+        meter.add(len(chunk))
+    return total, meter.report()
+
+
+def aggregate_comments(output_dir: Path = OUTPUT_DIR, chunk_rows: int = CHUNK_ROWS):
+    """Per-student totals of non-deleted comments: comments_count, comments_total_len"""
+    total = None
+    meter = Throughput("student_comments")
+    try:
+        for chunk in iter_table("student_comments", COMMENT_COLUMNS, chunk_rows, output_dir, on_bad_lines="skip"):
+            active = chunk[chunk["content"] != DELETED_COMMENT]
+            partial = pd.DataFrame({
+                "comments_count": np.ones(len(active), dtype=np.int64),
+                "comments_total_len": active["content"].str.len().fillna(0).to_numpy(dtype=np.int64),
+            }, index=active.index).groupby(active["student_id"]).sum()
+            total = _fold(total, partial)
+            meter.add(len(chunk))
+    except FileNotFoundError:
+        print("⚠️ No student_comments file found. Using empty comments.")
+    return total, meter.report()
+
+
+def read_students(output_dir: Path = OUTPUT_DIR, chunk_rows: int = CHUNK_ROWS):
+    """Student ids and the AI label columns (if present), skipping the wide text columns"""
+    meter = Throughput("students")
+    parts = []
+    for chunk in iter_table("students", ["id", *LABEL_COLUMNS], chunk_rows, output_dir):
+        parts.append(chunk)
+        meter.add(len(chunk))
+    students = pd.concat(parts, ignore_index=True)
+    for col in LABEL_COLUMNS:
+        if col not in students.columns:
+            students[col] = None
+    return students, meter.report()
+
+
+def load_training_frame(output_dir: Path = OUTPUT_DIR, chunk_rows: int = CHUNK_ROWS, category_index=None):
+    """
+    Stream the dataset tables and return (frame, throughput): `frame` is indexed by
+    student id with MODEL_FEATURES plus the AI label columns, as used by build_targets().
+    """
+    students, students_rate = read_students(output_dir, chunk_rows)
+    courses, courses_rate = aggregate_courses(output_dir, chunk_rows, category_index)
+    comments, comments_rate = aggregate_comments(output_dir, chunk_rows)
+
+    frame = students.set_index("id")[LABEL_COLUMNS]
+    index = frame.index
+    courses = (courses if courses is not None else pd.DataFrame(
+        columns=["units", "num_courses", "graded", "gp_hundredths"], dtype=np.float64)).reindex(index)
+    comments = (comments if comments is not None else pd.DataFrame(
+        columns=["comments_count", "comments_total_len"], dtype=np.float64)).reindex(index)
+
+    graded = courses["graded"].to_numpy(dtype=np.float64)
+    gp = courses["gp_hundredths"].to_numpy(dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg = np.where(graded > 0, gp / 100 / graded, 0.0)
+
+    frame = frame.assign(
+        total_units=courses["units"].fillna(0).astype(np.float64),
+        avg_grade_point=np.nan_to_num(avg),
+        num_courses=courses["num_courses"].fillna(0).astype(np.int64),
+        comments_count=comments["comments_count"].fillna(0).astype(np.int64),
+        comments_total_len=comments["comments_total_len"].fillna(0).astype(np.int64),
+    )
+    throughput = {"students": students_rate, "courses": courses_rate, "comments": comments_rate}
+    return frame[MODEL_FEATURES + LABEL_COLUMNS], throughput
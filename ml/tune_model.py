@@ -0,0 +1,322 @@
+# ml/tune_model.py
+"""
+Hyperparameter search for the score model.
+
+train_and_upload.py fits one fixed configuration on one 80/20 split. This
+runs k-fold cross-validation over SEARCH_SPACE (forest layout, trees, depth,
+max_features, and alternative estimators) and picks the configuration with
+the best mean MAE among those that meet a prediction latency budget.
+
+- The dataset is featurized once and saved as .npy arrays that every worker
+  process memory-maps, so workers share one copy instead of re-reading the
+  tables or receiving pickled frames.
+- Each (configuration, fold) is one task on a process pool; its result is
+  written to ml/tuning/<data hash>/<config key>/fold-<k>.json as soon as it
+  finishes. A rerun on the same data skips every cached fold, so an
+  interrupted search resumes where it stopped.
+- Latency is measured after cross-validation, in this process and one
+  configuration at a time, so no other fit competes for the cores: each
+  configuration is refitted once on all rows, set up as it would be served,
+  and timed with model.predict on a single row (p50 / p95 over repeated
+  calls, as /predict does) and on a batch of LATENCY_BATCH_ROWS rows (as
+  /predict/batch does). The result is cached next to the folds as
+  latency.json (--remeasure-latency measures again, e.g. on another machine).
+
+Usage:
+    python tune_model.py                          # search, report, write ml/tuning/results.json
+    python tune_model.py --folds 3 --jobs 4 --single-budget-ms 20
+    python tune_model.py --save                   # also fit the winner on all data -> model.joblib
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import itertools
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.ensemble import ExtraTreesRegressor, HistGradientBoostingRegressor
+from sklearn.model_selection import KFold
+from sklearn.multioutput import MultiOutputRegressor
+from course_features import MODEL_FEATURES
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+TUNING_DIR = os.environ.get("TUNING_DIR", os.path.join(SCRIPT_DIR, "tuning"))
+
+FOLDS = 5
+SEED = 42
+# Default latency budget: single-row predict p95, and one LATENCY_BATCH_ROWS-row predict
+SINGLE_BUDGET_MS = float(os.environ.get("TUNE_SINGLE_BUDGET_MS", 50))
+BATCH_BUDGET_MS = float(os.environ.get("TUNE_BATCH_BUDGET_MS", 500))
+LATENCY_REPEATS = 30
+LATENCY_BATCH_ROWS = 1000
+
+# Parameter grids per estimator (every combination is one configuration)
+SEARCH_SPACE = {
+    "forest": {
+        "kind": ["multi", "native"],
+        "n_estimators": [100, 200],
+        "max_depth": [None, 12],
+        "max_features": [1.0, "sqrt"],
+    },
+    "extra_trees": {
+        "n_estimators": [200],
+        "max_depth": [None, 12],
+    },
+    "hist_gb": {
+        "max_iter": [200],
+        "max_depth": [None, 6],
+        "learning_rate": [0.1],
+    },
+}
+
+
+def search_configs(space: dict = SEARCH_SPACE, estimators: list | None = None) -> list:
+    configs = []
+    for estimator, grid in space.items():
+        if estimators and estimator not in estimators:
+            continue
+        names = list(grid)
+        for values in itertools.product(*(grid[n] for n in names)):
+            configs.append({"estimator": estimator, **dict(zip(names, values))})
+    return configs
+
+
+def config_key(config: dict) -> str:
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def build_estimator(config: dict, n_jobs=None):
+    """Untrained model for a search configuration"""
+    params = {k: v for k, v in config.items() if k != "estimator"}
+    estimator = config["estimator"]
+    if estimator == "forest":
+        from train_and_upload import build_model
+        return build_model(params.pop("kind"), params.pop("n_estimators"), n_jobs, **params)
+    if estimator == "extra_trees":
+        # Native multi-output
+        return ExtraTreesRegressor(random_state=SEED, n_jobs=n_jobs, **params)
+    if estimator == "hist_gb":
+        # Single-output booster, one per target
+        return MultiOutputRegressor(HistGradientBoostingRegressor(random_state=SEED, **params))
+    raise ValueError(f"Unknown estimator: {estimator}")
+
+
+def measure_latency(model, X: pd.DataFrame, repeats: int = LATENCY_REPEATS) -> dict:
+    """model.predict latency for one row (p50/p95 ms) and one LATENCY_BATCH_ROWS-row batch (ms)"""
+    row = X.iloc[:1]
+    batch = X.iloc[np.arange(LATENCY_BATCH_ROWS) % len(X)]
+    model.predict(row)  # warm-up
+
+    single = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict(row)
+        single.append((time.perf_counter() - start) * 1000)
+    batched = []
+    for _ in range(3):
+        start = time.perf_counter()
+        model.predict(batch)
+        batched.append((time.perf_counter() - start) * 1000)
+    return {
+        "single_ms_p50": round(float(np.percentile(single, 50)), 3),
+        "single_ms_p95": round(float(np.percentile(single, 95)), 3),
+        "batch_ms": round(float(np.median(batched)), 3),
+    }
+
+
+def fit_for_serving(config: dict, X: pd.DataFrame, y, n_jobs=-1):
+    """Fit a configuration on all rows with `n_jobs` cores, then set it up to predict as the server does"""
+    model = build_estimator(config, n_jobs=n_jobs).fit(X, y)
+    if config["estimator"] != "hist_gb":
+        from train_and_upload import set_n_jobs
+        set_n_jobs(model, None)
+    return model
+
+
+def _write_json(path: str, data: dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def run_fold(data_dir: str, config: dict, fold: int, folds: int, targets: list) -> dict:
+    """Fit one configuration on one fold (in a worker process) and cache the result"""
+    X = np.load(os.path.join(data_dir, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(data_dir, "y.npy"), mmap_mode="r")
+    train_idx, test_idx = list(KFold(folds, shuffle=True, random_state=SEED).split(X))[fold]
+    X_train = pd.DataFrame(X[train_idx], columns=MODEL_FEATURES)
+    X_test = pd.DataFrame(X[test_idx], columns=MODEL_FEATURES)
+
+    model = build_estimator(config, n_jobs=1)
+    start = time.perf_counter()
+    model.fit(X_train, y[train_idx])
+    fit_seconds = time.perf_counter() - start
+
+    mae = np.abs(model.predict(X_test) - y[test_idx]).mean(axis=0)
+    result = {
+        "config": config,
+        "fold": fold,
+        "mae": dict(zip(targets, np.round(mae, 6).tolist())),
+        "mean_mae": round(float(mae.mean()), 6),
+        "fit_seconds": round(fit_seconds, 3),
+    }
+
+    key_dir = os.path.join(data_dir, config_key(config))
+    os.makedirs(key_dir, exist_ok=True)
+    _write_json(os.path.join(key_dir, f"fold-{fold}.json"), result)
+    return result
+
+
+def prepare_data(X: pd.DataFrame, y: pd.DataFrame, folds: int) -> str:
+    """Save the featurized arrays once under a directory named by their content hash"""
+    X_arr = np.ascontiguousarray(X[MODEL_FEATURES].to_numpy(dtype=np.float64))
+    y_arr = np.ascontiguousarray(y.to_numpy(dtype=np.float64))
+    h = hashlib.sha256()
+    h.update(X_arr.tobytes())
+    h.update(y_arr.tobytes())
+    h.update(json.dumps({"folds": folds, "seed": SEED, "targets": list(y.columns)}).encode())
+    data_dir = os.path.join(TUNING_DIR, h.hexdigest()[:16])
+    os.makedirs(data_dir, exist_ok=True)
+    for name, arr in (("X.npy", X_arr), ("y.npy", y_arr)):
+        path = os.path.join(data_dir, name)
+        if not os.path.exists(path):
+            np.save(f"{path}.tmp.npy", arr)
+            os.replace(f"{path}.tmp.npy", path)
+    return data_dir
+
+
+def _cached(data_dir: str, config: dict, name: str) -> dict | None:
+    try:
+        with open(os.path.join(data_dir, config_key(config), f"{name}.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def measure_configs(data_dir: str, configs: list, X: pd.DataFrame, y: pd.DataFrame,
+                    jobs=-1, remeasure: bool = False):
+    """Serially refit each configuration on all rows and cache its prediction latency"""
+    pending = [config for config in configs if remeasure or _cached(data_dir, config, "latency") is None]
+    if not pending:
+        return
+    print(f"⏱️ Measuring prediction latency of {len(pending)} configurations (one refit each)")
+    for config in pending:
+        model = fit_for_serving(config, X[MODEL_FEATURES], y, n_jobs=jobs)
+        latency = {**measure_latency(model, X[MODEL_FEATURES]), "repeats": LATENCY_REPEATS,
+                   "batch_rows": LATENCY_BATCH_ROWS}
+        key_dir = os.path.join(data_dir, config_key(config))
+        os.makedirs(key_dir, exist_ok=True)
+        _write_json(os.path.join(key_dir, "latency.json"), latency)
+
+
+def summarize(config: dict, fold_results: list, latency: dict,
+              single_budget_ms: float, batch_budget_ms: float) -> dict:
+    targets = list(fold_results[0]["mae"])
+    return {
+        "key": config_key(config),
+        "config": config,
+        "mean_mae": round(float(np.mean([r["mean_mae"] for r in fold_results])), 6),
+        "mae": {t: round(float(np.mean([r["mae"][t] for r in fold_results])), 6) for t in targets},
+        "fit_seconds": round(float(np.mean([r["fit_seconds"] for r in fold_results])), 3),
+        "latency": latency,
+        "within_budget": latency["single_ms_p95"] <= single_budget_ms and latency["batch_ms"] <= batch_budget_ms,
+    }
+
+
+def tune(X: pd.DataFrame, y: pd.DataFrame, folds=FOLDS, jobs=-1, estimators=None,
+         single_budget_ms=SINGLE_BUDGET_MS, batch_budget_ms=BATCH_BUDGET_MS, remeasure_latency=False):
+    """
+    Run (or resume) the search on featurized X / y (see train_and_upload.load_training_data);
+    returns (leaderboard sorted by MAE, best entry within budget or None)
+    """
+    if len(X) < folds * 2:
+        raise ValueError(f"Need at least {folds * 2} students for {folds}-fold cross-validation, got {len(X)}")
+    data_dir = prepare_data(X, y, folds)
+    targets = list(y.columns)
+    configs = search_configs(estimators=estimators)
+
+    tasks = [(config, fold) for config in configs for fold in range(folds)]
+    pending = [(config, fold) for config, fold in tasks if _cached(data_dir, config, f"fold-{fold}") is None]
+    print(f"🔎 {len(configs)} configurations x {folds} folds on {len(X)} students: "
+          f"{len(tasks) - len(pending)} cached, {len(pending)} to run ({data_dir})")
+
+    start = time.perf_counter()
+    Parallel(n_jobs=jobs, verbose=5 if pending else 0)(
+        delayed(run_fold)(data_dir, config, fold, folds, targets) for config, fold in pending
+    )
+    if pending:
+        print(f"⏱️ Cross-validation finished in {time.perf_counter() - start:.1f}s")
+    measure_configs(data_dir, configs, X, y, jobs, remeasure_latency)
+
+    leaderboard = sorted(
+        (summarize(config, [_cached(data_dir, config, f"fold-{fold}") for fold in range(folds)],
+                   _cached(data_dir, config, "latency"), single_budget_ms, batch_budget_ms)
+         for config in configs),
+        key=lambda entry: entry["mean_mae"]
+    )
+    best = next((entry for entry in leaderboard if entry["within_budget"]), None)
+
+    _write_json(os.path.join(TUNING_DIR, "results.json"), {
+        "data": data_dir,
+        "students": len(X),
+        "folds": folds,
+        "budget": {"single_ms_p95": single_budget_ms, "batch_ms": batch_budget_ms,
+                   "batch_rows": LATENCY_BATCH_ROWS},
+        "best": best,
+        "leaderboard": leaderboard,
+    })
+    return leaderboard, best
+
+
+def print_leaderboard(leaderboard: list, best: dict | None):
+    print(f"\n{'':2}{'configuration':<84}{'MAE':>9}{'fit s':>8}{'1-row p95':>11}{'batch ms':>10}")
+    for entry in leaderboard:
+        params = ", ".join(f"{k}={v}" for k, v in entry["config"].items())
+        mark = "★" if best is not None and entry["key"] == best["key"] else ("✓" if entry["within_budget"] else "✗")
+        latency = entry["latency"]
+        print(f"{mark:<2}{params:<84}{entry['mean_mae']:>9.4f}{entry['fit_seconds']:>8.2f}"
+              f"{latency['single_ms_p95']:>11.2f}{latency['batch_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Cross-validated hyperparameter search for the score model")
+    p.add_argument("--source", choices=["csv", "store"], default="csv",
+                   help="Training data: ml/output tables or the incremental feature store")
+    p.add_argument("--chunk-size", type=int, default=None, help="Stream the tables in chunks of this many rows")
+    p.add_argument("--folds", type=int, default=FOLDS, help="Cross-validation folds")
+    p.add_argument("--jobs", type=int, default=-1, help="Parallel fold fits (-1 = all cores)")
+    p.add_argument("--estimators", default=None,
+                   help=f"Comma-separated subset of: {', '.join(SEARCH_SPACE)}")
+    p.add_argument("--single-budget-ms", type=float, default=SINGLE_BUDGET_MS,
+                   help="Max p95 latency of a single-row model.predict")
+    p.add_argument("--batch-budget-ms", type=float, default=BATCH_BUDGET_MS,
+                   help=f"Max latency of a {LATENCY_BATCH_ROWS}-row model.predict")
+    p.add_argument("--remeasure-latency", action="store_true",
+                   help="Measure latency again instead of using the cached measurements")
+    p.add_argument("--save", action="store_true",
+                   help="Fit the best configuration on all data and save it as model.joblib")
+    args = p.parse_args()
+
+    from train_and_upload import load_training_data, LOCAL_MODEL_PATH
+    X, y = load_training_data(args.source, args.chunk_size)
+
+    estimators = args.estimators.split(",") if args.estimators else None
+    leaderboard, best = tune(X, y, args.folds, args.jobs, estimators,
+                             args.single_budget_ms, args.batch_budget_ms, args.remeasure_latency)
+    print_leaderboard(leaderboard, best)
+    if best is None:
+        print(f"\n❌ No configuration meets the latency budget "
+              f"({args.single_budget_ms} ms single row, {args.batch_budget_ms} ms batch)")
+        sys.exit(1)
+    print(f"\n✅ Best within budget: {best['config']} (MAE {best['mean_mae']:.4f})")
+
+    if args.save:
+        from model_registry import save_model
+        model = fit_for_serving(best["config"], X, y)
+        save_model(model, LOCAL_MODEL_PATH)
+        print("Model saved locally:", LOCAL_MODEL_PATH)